@@ -1,27 +1,69 @@
-import datetime
-import json
+import codecs
+import io
 import os
-import ssl
+import re
 import time
-from dataclasses import dataclass
+from mmap import mmap as MMap
+from dataclasses import dataclass, fields
 from enum import Enum
-from io import StringIO
-from typing import Union, Optional, Callable, IO, TextIO, cast, ClassVar
-from urllib.error import HTTPError
-from urllib.parse import urljoin, urlsplit, urlunsplit, quote
-from urllib.request import Request, urlopen
+from functools import lru_cache
+from operator import attrgetter
+from io import StringIO, BytesIO
+from importlib import import_module
+from typing import Union, Optional, Callable, IO, TextIO, cast, ClassVar, Mapping, Dict, NamedTuple, Iterator, \
+    BinaryIO, Tuple, TYPE_CHECKING
+from urllib.parse import urljoin, urlsplit, urlunsplit, quote, unquote
+
+from hbreader import url_mirror
+from hbreader.archive_reader import ArchiveCache, default_archive_cache, set_default_archive_cache, split_member, \
+    stat_location
+from hbreader.caching_reader import CachingReader
+from hbreader.single_flight import SingleFlight
+from hbreader.compression import detect_compression, is_declared, decompressing_stream, MAGIC_LEN
+from hbreader.mmap_reader import map_file, mapped_stream
+from hbreader.instrumentation import ReadEvent, ReadTimer, LatencyCollector, add_hook, remove_hook, instrumented, \
+    hooks_active, timed_stream, timed_text
+from hbreader.url_mirror import URLMirror, RESOLVER, default_resolver, set_default_resolver, _is_url, _is_file_url
+from hbreader.digest import DIGEST, digest_names, hashing_stream, hashing_text, record_digests
+from hbreader.progress import RateLimiter, PROGRESS, METER, stream_meter, range_meter, metered_text
+from hbreader.data_uri import is_data_uri, decode_data_uri
+
+if TYPE_CHECKING:
+    from hbreader.connection_pool import ConnectionPool
+    from hbreader.http_cache import HTTPCache
+    from hbreader.retry import RetryPolicy
 
 __all__ = ['FileInfo', 'default_str_tester', 'hbopen', 'hbread', 'HB_TYPE', 'HBType', 'detect_type',
-           'default_str_tester']
+           'default_str_tester', 'ConnectionPool', 'default_pool', 'set_default_pool', 'HTTPCache',
+           'CachingReader', 'ReadResult', 'AsyncTextIO', 'hbopen_async', 'hbread_async', 'hbread_many_async',
+           'bounded_gather', 'hbread_many', 'hbiter', 'hblines', 'hbread_buffer', 'hbopen_binary',
+           'hbread_bytes', 'ReadEvent', 'LatencyCollector', 'add_hook', 'remove_hook', 'instrumented', 'hbhead',
+           'SingleFlight', 'RetryPolicy', 'CircuitBreaker', 'CircuitOpenError', 'URLMirror', 'default_resolver',
+           'set_default_resolver', 'ArchiveCache', 'default_archive_cache', 'set_default_archive_cache',
+           'RateLimiter', 'PrefetchingReader']
 
 # Honey Badger reader recognizes all of the below PLUS "Stringifiable" -- any object that can convert into a string
 HB_TYPE = Union[str, bytes, bytearray, IO]
 
+# Unit of reading for streams that are consumed piecemeal
+CHUNK_SIZE = 64 * 1024
+
+# Default number of bytes that hbhead reads
+HEAD_SIZE = 4 * 1024
+
 
 class Pathilizer(str):
+    """ A file name or URL whose str() is relative to FileInfo.rel_offset when that is set """
+    __slots__ = ()
 
     def __str__(self):
-        return self._strifier(self)
+        rel_offset = FileInfo.rel_offset
+        return _relpath(self, rel_offset) if rel_offset else str.__str__(self)
+
+
+@lru_cache(maxsize=64 * 1024)
+def _relpath(path: str, rel_offset: str) -> str:
+    return str(os.path.relpath(path, rel_offset))
 
 
 class HBType(Enum):
@@ -31,6 +73,11 @@ class HBType(Enum):
     FILENAME = "filename"
     IO = "filehandle"
     STRINGABLE = "stringable"
+    DATA_URI = "data uri"
+
+
+# Strings longer than this are taken to be data -- no file name or URL we're going to open is that long
+MAX_LOCATION_LEN = 64 * 1024
 
 
 def default_str_tester(s: str) -> bool:
@@ -39,7 +86,12 @@ def default_str_tester(s: str) -> bool:
     :param s: string to test
     :return: True if this is a vanilla string, otherwise try to treat it as a file name
     """
-    return not s.strip() or any(c in s for c in ['\r', '\n', '\t', '  ', '"', "'"])
+    # data: URIs carry their content, so they can be longer than any file name or URL
+    if is_data_uri(s):
+        return False
+    # Cheapest and most likely first -- each test stops at the first hit, and none of them copies s
+    return len(s) > MAX_LOCATION_LEN or '\n' in s or '\r' in s or '\t' in s or '"' in s or "'" in s or \
+        '  ' in s or not s or s.isspace()
 
 
 def detect_type(source: HB_TYPE,
@@ -54,7 +106,8 @@ def detect_type(source: HB_TYPE,
     """
     if isinstance(source, str):
         return HBType.STRING if is_actual_data(source) else\
-               HBType.URL if '://' in source or (base_path and '://' in base_path) else\
+               HBType.DATA_URI if is_data_uri(source) else\
+               HBType.URL if _is_url(source) or (base_path and _is_url(base_path) and '://' not in source) else\
                HBType.FILENAME
 
     if callable(getattr(source, 'read', None)):
@@ -67,29 +120,85 @@ def detect_type(source: HB_TYPE,
     return HBType.STRINGABLE
 
 
+def _slotted(*path_fields: str) -> Callable[[type], type]:
+    """
+    Give a dataclass __slots__, the way dataclass(slots=True) does from Python 3.10 on: the class is rebuilt with a
+    slot per field and no __dict__.  path_fields are stored behind a property that wraps their values in Pathilizers
+    """
+    def wrap_path(name: str) -> property:
+        slot = '_' + name
+
+        def setter(self, value: Optional[str]) -> None:
+            object.__setattr__(self, slot, value if value is None or type(value) is Pathilizer else Pathilizer(value))
+        return property(attrgetter(slot), setter)
+
+    def slotted(cls: type) -> type:
+        cls_dict = dict(cls.__dict__)
+        names = [f.name for f in fields(cls)]
+        cls_dict['__slots__'] = tuple('_' + name if name in path_fields else name for name in names)
+        for name in names:
+            cls_dict.pop(name, None)
+        cls_dict.pop('__dict__', None)
+        cls_dict.pop('__weakref__', None)
+        for name in path_fields:
+            cls_dict[name] = wrap_path(name)
+        return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    return slotted
+
+
+@_slotted('source_file', 'base_path')
 @dataclass
 class FileInfo:
+    """
+    What we learned about a source in the process of reading it.  Only the attributes below can be assigned -- as
+    it is sort of easy to mistype them, anything else raises an AttributeError.
+    """
     source_file: Optional[str] = None
     source_file_date: Optional[str] = None
     source_file_size: Optional[int] = None
     base_path: Optional[str] = None
+    compression: Optional[str] = None           # gzip, bzip2, xz, zip, ... if the source was compressed
+    uncompressed_size: Optional[int] = None     # Size after decompression.  Set when the end is reached
+    encoding: Optional[str] = None              # Encoding of the bytes returned by hbread_bytes et al.
+    # Recorded by hbopen while an instrumentation hook is registered.  Seconds from the start of the read
+    connect_time: Optional[float] = None        # Connection established (URL) or file opened
+    headers_time: Optional[float] = None        # Response headers (URL) or file metadata available
+    first_byte_time: Optional[float] = None
+    total_time: Optional[float] = None          # End of content reached (or stream closed / failed)
+    bytes_read: Optional[int] = None            # Bytes handed to the decoder.  Characters for text IO unless a
+                                                # digest was asked for
+    # Set by partial reads (offset / length).  source_file_size remains the size of the whole source
+    read_offset: Optional[int] = None
+    read_length: Optional[int] = None           # Number of bytes actually returned
+    # The URL that was asked for, when a resolver sent the read to source_file instead.  base_path is then the base
+    # of this URL, so relative references go through the resolver as well
+    logical_location: Optional[str] = None
+    # Algorithm name to hex digest of the (decompressed) bytes, when hbopen or hbread is asked for them.  Set when
+    # the end of the source is reached
+    digests: Optional[Dict[str, str]] = None
+
+    field_names: ClassVar[Tuple[str, ...]] = (
+        'source_file', 'source_file_date', 'source_file_size', 'base_path', 'compression', 'uncompressed_size',
+        'encoding', 'connect_time', 'headers_time', 'first_byte_time', 'total_time', 'bytes_read', 'read_offset',
+        'read_length', 'logical_location', 'digests')
     rel_offset: ClassVar[Optional[str]] = None      # Used where you don't want full paths showing up
 
-    def __post_init__(self):
-        self._locked = True
+    def values(self) -> tuple:
+        """ Field values, in field_names order """
+        return tuple(getattr(self, name) for name in self.field_names)
 
     def clear(self) -> 'FileInfo':
-        self.source_file = self.source_file_date = self.source_file_size = self.base_path = None
+        for name in self.field_names:
+            setattr(self, name, None)
         return self
 
-    def __setattr__(self, key, value):
-        # As it is sort of easy to mistype some of the variables above, we "lock" the resource
-        if getattr(self, '_locked', False) and key not in self.__dict__:
-            raise AttributeError(f'No {key} variable')
-        if value is not None and key in ('source_file', 'base_path'):
-            value = Pathilizer(value)
-            value._strifier = lambda s: str(os.path.relpath(s, self.rel_offset)) if self.rel_offset else s
-        return super().__setattr__(key, value)
+
+class ReadResult(NamedTuple):
+    """ Outcome of reading one source in a batch """
+    source: HB_TYPE
+    text: Optional[str]
+    info: FileInfo
+    error: Optional[BaseException] = None
 
 
 def _wrapped_close(fp: TextIO) -> None:
@@ -104,33 +213,62 @@ def _wrapped_close(fp: TextIO) -> None:
     fp.close()
 
 
+def _bom_encoding(leading_bytes: bytes) -> str:
+    """ Encoding of a byte string, judging by its BOM or its pattern of nulls -- see json.detect_encoding """
+    from json import detect_encoding
+    return detect_encoding(leading_bytes)
+
+
+class _AutoDecoder:
+    """
+    Incremental bytes to str decoder.  If no codec is supplied, the first four bytes are used to detect the encoding
+    (BOM or null pattern -- see _bom_encoding), defaulting to UTF-8.
+    """
+    def __init__(self, codec: Optional[str] = None) -> None:
+        self._decoder = codecs.getincrementaldecoder(codec)() if codec else None
+        self._pending = b''
+        self.leftover = ''              # Decoded text that has yet to be returned
+
+    def decode(self, data: bytes, final: bool = False) -> str:
+        if self._decoder is None:
+            self._pending += data
+            if len(self._pending) < 4 and not final:
+                return ''
+            data, self._pending = self._pending, b''
+            self._decoder = codecs.getincrementaldecoder(_bom_encoding(data) if len(data) >= 4 else 'utf-8')()
+        return self._decoder.decode(data, final)
+
+
 def _auto_decode(fp: IO, nbytes: Optional[int] = None) -> str:
-    # We have a file opened in binary mode and haven't formally established a decoder.
-    # We may need as many as four bytes to determine the encoding.
-    # TODO: should the BOM (if present) count in nbytes?
-    if not fp.decoder:
-        if nbytes and nbytes < 4:
-            # Nothing we can do if they're asking for less than 4 bytes
-            data = fp.native_reader(nbytes)
-            return data.decode() if data else data
-        # Use the BOM to figure out what is toing on.  If no BOM, we always go to UTF-8
-        bom = fp.native_reader(4)
-        if len(bom) < 4:
-            return bom.decode(fp.decoder if fp.decoder else 'utf-8')
-        fp.decoder = json.detect_encoding(bom)
-        if nbytes is None:
-            return (bom + fp.native_reader()).decode(fp.decoder)
-        else:
-            return (bom + fp.native_reader(nbytes - 4)).decode(fp.decoder)
-    else:
-        return fp.native_reader(nbytes).decode(fp.decoder)
+    # We have a file opened in binary mode.  fp.decoder is an _AutoDecoder that sorts out the encoding from the
+    # first four bytes, and carries partial characters over from one read to the next.
+    if nbytes == 0:
+        # Don't let an empty read settle the encoding before any bytes have been seen
+        return ''
+    decoder = fp.decoder
+    text, decoder.leftover = decoder.leftover, ''
+    if nbytes is None or nbytes < 0:
+        # Decode a chunk at a time rather than materializing the whole body as bytes alongside the result
+        parts = [text]
+        while True:
+            data = fp.native_reader(CHUNK_SIZE)
+            parts.append(decoder.decode(data, not data))
+            if not data:
+                return ''.join(parts)
+    # An empty string means end of file, so keep going if all we got was part of a character (or BOM)
+    while not text:
+        data = fp.native_reader(nbytes)
+        text = decoder.decode(data, not data)
+        if not data:
+            break
+    decoder.leftover = text[nbytes:]
+    return text[:nbytes]
 
 
 def _to_textio(fp: IO, mode: str, read_codec: str) -> TextIO:
     if 'b' in mode:
         fp = cast(TextIO, fp)
-        # TODO: FIx me
-        fp.decoder = read_codec
+        fp.decoder = _AutoDecoder(read_codec)
         fp.native_reader = fp.read
         fp.read = lambda *args: _auto_decode(fp, *args)
     if getattr(fp, 'native_closer', None):
@@ -139,12 +277,240 @@ def _to_textio(fp: IO, mode: str, read_codec: str) -> TextIO:
     return fp
 
 
+def _resolve_url(source: str, base_path: Optional[str]) -> str:
+    """ Absolute, quoted URL for source """
+    url = source if '://' in source else urljoin(base_path + ('' if base_path.endswith('/') else '/'),
+                                                 source, allow_fragments=True)
+    return quote(url, '/:')
+
+
+def _file_path(location: str) -> str:
+    """ File name for location, which may be a file:// URL """
+    return unquote(urlsplit(location).path) if _is_file_url(location) else location
+
+
+def _resolve_filename(source: str, base_path: Optional[str]) -> str:
+    """ Absolute file name for source.  Either may be a file:// URL """
+    source = _file_path(source)
+    if base_path:
+        base_path = _file_path(base_path)
+    if not base_path:
+        return os.path.abspath(source)
+    return source if os.path.isabs(source) else os.path.abspath(os.path.join(base_path, source))
+
+
+def _url_base(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, os.path.dirname(parts.path), parts.query, None))
+
+
+def _set_url_info(open_info: FileInfo, url: str, headers: Mapping[str, str]) -> None:
+    open_info.source_file = url
+    open_info.source_file_date = headers['Last-Modified']
+    if not open_info.source_file_date:
+        open_info.source_file_date = headers['Date']
+    open_info.source_file_size = headers['Content-Length']
+    open_info.base_path = _url_base(url)
+
+
+def _unresolved(_: str) -> None:
+    """ Resolver for locations that have already been through one """
+    return None
+
+
+def _map_url(source: str, base_path: Optional[str], resolver: Optional[RESOLVER]) \
+        -> Optional[Tuple[str, str, HBType]]:
+    """
+    Where to read URL source from, according to resolver (default: default_resolver())
+    :return: logical URL, physical location and its type -- URL or FILENAME -- or None if source isn't mapped
+    """
+    resolver = resolver or url_mirror._default_resolver
+    if resolver is None:
+        return None
+    url = _resolve_url(source, base_path)
+    target = resolver(url)
+    if not target:
+        return None
+    return url, _file_path(target), HBType.URL if _is_url(target) else HBType.FILENAME
+
+
+def _data_uri_source(source: str, read_codec: Optional[str]) -> Tuple[bytes, HBType, Optional[str]]:
+    """ data: URI source as the in-memory bytes it carries, and the codec to read them with """
+    data, charset = decode_data_uri(source)
+    return data, HBType.DECODABLE, read_codec or charset
+
+
+def _data_bytes(source: HB_TYPE, source_type: HBType, text: str) -> bytes:
+    """ The bytes that in-memory source text came from -- source itself if it was bytes, otherwise utf-8 """
+    return bytes(source) if source_type is HBType.DECODABLE else text.encode()
+
+
+def _set_logical_info(open_info: Optional[FileInfo], url: str) -> None:
+    if open_info:
+        open_info.logical_location = url
+        open_info.base_path = _url_base(url)
+
+
+def _url_headers(accept_header: Optional[str]) -> Dict[str, str]:
+    headers = {"Accept-Encoding": "gzip"}
+    if accept_header:
+        headers["Accept"] = accept_header
+    return headers
+
+
+def _peek(fp: IO) -> bytes:
+    """ Leading bytes of binary stream fp for compression detection, if it can be peeked at """
+    peek = getattr(fp, 'peek', None)
+    return peek(MAGIC_LEN)[:MAGIC_LEN] if callable(peek) else b''
+
+
+def _content_length(headers: Mapping[str, str]) -> Optional[int]:
+    try:
+        return int(headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _decompressed(stream: IO, compression: Optional[str], open_info: Optional[FileInfo], fallback: bool,
+                  decompress: bool = True) -> IO:
+    """
+    stream, decompressed if compression is set.  If decompress is False, stream is returned as is and the
+    compression it appears to have is just recorded in open_info
+    """
+    if not compression:
+        return stream
+    if decompress:
+        return decompressing_stream(stream, compression, open_info, fallback)
+    if open_info and not (compression == 'zip' and fallback):
+        open_info.compression = compression
+    return stream
+
+
+def _url_stream(response: IO, open_info: Optional[FileInfo], meter: Optional[METER] = None,
+                decompress: bool = True) -> IO:
+    """
+    Binary stream of the decompressed content of response.  meter, if present, meters the bytes as received.  A
+    Content-Encoding is always undone -- we asked for it -- but with decompress False nothing else is
+    """
+    content_encoding = response.headers.get('Content-Encoding')
+    compression = detect_compression(response.url, _peek(response), content_encoding)
+    stream = meter(response, _content_length(response.headers)) if meter else response
+    return _decompressed(stream, compression, open_info, not is_declared(response.url, content_encoding),
+                         decompress or is_declared(None, content_encoding))
+
+
+def _url_open(url: str, headers: Dict[str, str], pool: Optional['ConnectionPool'],
+              http_cache: Optional['HTTPCache'], on_connect: Optional[Callable[[], None]] = None,
+              retry: Optional['RetryPolicy'] = None) -> IO:
+    """ Open url, going through http_cache if supplied """
+    from urllib.error import HTTPError
+    from hbreader.connection_pool import default_pool
+    key = entry = None
+    if http_cache is not None:
+        key = http_cache.key(url, headers.get('Accept'))
+        entry = http_cache.lookup(key)
+        if entry and entry.is_fresh():
+            return http_cache.open(entry)
+        if entry:
+            headers = dict(headers, **entry.validators())
+    try:
+        response = (pool or default_pool()).urlopen(url, headers, on_connect, retry)
+    except HTTPError as e:
+        # This is here because the message out of urllib doesn't include the file name
+        e.msg = f"{e.filename}"
+        raise e
+    if entry and response.status == 304:
+        response.close()
+        return http_cache.open(http_cache.revalidated(key, entry, response.headers))
+    return http_cache.store(key, response) if http_cache is not None and response.status == 200 else response
+
+
+def _io_size(source: IO) -> Optional[int]:
+    """ Size of the file behind source, if it has one """
+    try:
+        return os.fstat(source.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _set_io_info(open_info: FileInfo, source: IO) -> None:
+    name = getattr(source, 'name', None)
+    open_info.source_file = name
+    try:
+        fstat = os.fstat(source.fileno())
+        open_info.source_file_date = time.ctime(fstat.st_mtime)
+        open_info.source_file_size = fstat.st_size
+    except (AttributeError, OSError, ValueError):
+        # In memory streams (BytesIO, StringIO) have no file behind them
+        from datetime import datetime
+        open_info.source_file_date = str(datetime.now())
+    open_info.base_path = os.path.dirname(name) if isinstance(name, str) else None
+
+
+def _open_binary_file(fname: str, open_info: Optional[FileInfo], mmap: bool = False,
+                      meter: Optional[METER] = None, decompress: bool = True) -> io.BufferedReader:
+    """
+    Open fname as a binary stream -- decompressed and/or memory mapped as appropriate -- and fill open_info.  meter,
+    if present, meters the bytes read from the file (which is then never memory mapped).  decompress False returns
+    the stored bytes
+    """
+    member = split_member(fname)
+    if member:
+        return _open_archive_member(fname, member[0], member[1], open_info, meter, decompress)
+    raw = open(fname, 'rb')
+    try:
+        fstat = os.fstat(raw.fileno())
+        compression = detect_compression(fname, _peek(raw))
+        stream = meter(raw, fstat.st_size) if meter else raw
+        if compression:
+            stream = _decompressed(stream, compression, open_info, not is_declared(fname), decompress)
+        if stream is raw and not meter:
+            stream = (mmap and mapped_stream(raw)) or raw
+    except Exception:
+        raw.close()
+        raise
+    if open_info:
+        open_info.source_file = fname
+        open_info.source_file_date = time.ctime(fstat.st_mtime)
+        open_info.source_file_size = fstat.st_size
+        open_info.base_path = os.path.dirname(fname)
+    return stream
+
+
+def _open_archive_member(fname: str, archive: str, member: str, open_info: Optional[FileInfo],
+                         meter: Optional[METER] = None, decompress: bool = True) -> io.BufferedReader:
+    """ _open_binary_file for archive!/member.  Members are streamed out of an archive in default_archive_cache """
+    raw, date, size = default_archive_cache().open(archive, member, fname)
+    stream = meter(raw, size) if meter else io.BufferedReader(raw)
+    try:
+        compression = detect_compression(member, _peek(stream))
+        stream = _decompressed(stream, compression, open_info, not is_declared(member), decompress)
+    except Exception:
+        stream.close()
+        raise
+    if open_info:
+        open_info.source_file = fname
+        open_info.source_file_date = date
+        open_info.source_file_size = size
+        open_info.base_path = os.path.dirname(fname)
+    return stream
+
+
 def hbopen(source: HB_TYPE,
            open_info: Optional[FileInfo] = None,
            base_path: Optional[str] = None,
            accept_header: Optional[str] = None,
            is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
-           read_codec: str = None) -> TextIO:
+           read_codec: str = None,
+           pool: Optional['ConnectionPool'] = None,
+           http_cache: Optional['HTTPCache'] = None,
+           mmap: bool = False,
+           source_type: Optional[HBType] = None,
+           retry: Optional['RetryPolicy'] = None,
+           resolver: Optional[RESOLVER] = None,
+           digest: Optional[DIGEST] = None,
+           progress: Optional[PROGRESS] = None,
+           rate_limit: Optional[RateLimiter] = None) -> TextIO:
     """
     Return an open IO representation of source
     :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
@@ -153,76 +519,128 @@ def hbopen(source: HB_TYPE,
     :param accept_header: Accept header to use if it turns out to be a URL
     :param is_actual_data: Function to differentiate plain text from URL or file name
     :param read_codec: Name of codec to use if bytes being read. (URL only)
+    :param pool: Connection pool for URL sources (default: default_pool())
+    :param http_cache: On-disk cache for URL sources (default: no caching)
+    :param mmap: Read files through a memory map, decoding lazily as the text is consumed
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param retry: Timeouts, retries and circuit breaker for URL sources (default: the pool's)
+    :param resolver: Maps URLs to the file or URL to read instead, e.g. a URLMirror (default: default_resolver())
+    :param digest: hashlib algorithm name(s), e.g. 'sha256'.  The digests of the bytes read and their number are
+    recorded in open_info.digests and open_info.bytes_read once the end of the source is reached
+    :param progress: Called with the number of bytes transferred so far and the size of the source (Content-Length
+    or file size, None if unknown) as URL, file and IO sources are read
+    :param rate_limit: Bandwidth budget for URL, file and IO sources.  May be shared between reads
     :return: TextIO representation of open file
     """
-    source_type = detect_type(source, base_path, is_actual_data)
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    if source_type is HBType.DATA_URI:
+        source, source_type, read_codec = _data_uri_source(source, read_codec)
+    if source_type is HBType.URL:
+        mapped = _map_url(source, base_path, resolver)
+        if mapped:
+            url, location, location_type = mapped
+            f = hbopen(location, open_info, None, accept_header=accept_header, is_actual_data=is_actual_data,
+                       read_codec=read_codec, pool=pool, http_cache=http_cache, mmap=mmap, source_type=location_type,
+                       retry=retry, resolver=_unresolved, digest=digest, progress=progress, rate_limit=rate_limit)
+            _set_logical_info(open_info, url)
+            return f
     if source_type is HBType.STRINGABLE:
         source_as_string = str(source)
     elif source_type is HBType.DECODABLE:
         # TODO: Tie this into the autodetect machinery
-        source_as_string = source.decode()
+        source_as_string = source.decode(read_codec) if read_codec else source.decode()
     elif source_type is HBType.STRING:
         source_as_string = source
     else:
         source_as_string = None
 
     # source is a URL or a file name
-    if source_as_string:
+    if source_as_string is not None:
         if open_info:
             assert open_info.source_file is None, "source_file parameter not allowed if data is a file or URL"
             assert open_info.source_file_date is None, "source_file_date parameter not allowed if data is a file or URL"
             open_info.source_file_size = len(source_as_string)
+            if digest:
+                record_digests(open_info, _data_bytes(source, source_type, source_as_string), digest)
         return StringIO(source_as_string)
 
+    timer = ReadTimer(source_type.value, open_info) if hooks_active() else None
+    try:
+        return _open_location(source, source_type, open_info, base_path, accept_header=accept_header,
+                              read_codec=read_codec, pool=pool, http_cache=http_cache, mmap=mmap, timer=timer,
+                              retry=retry, digest=digest if open_info else None, progress=progress,
+                              rate_limit=rate_limit)
+    except Exception as e:
+        if timer:
+            timer.error(e)
+        raise
+
+
+def _open_location(source: HB_TYPE, source_type: HBType, open_info: Optional[FileInfo], base_path: Optional[str],
+                   accept_header: Optional[str], read_codec: Optional[str], pool: Optional['ConnectionPool'],
+                   http_cache: Optional['HTTPCache'], mmap: bool, timer: Optional[ReadTimer],
+                   retry: Optional['RetryPolicy'] = None, digest: Optional[DIGEST] = None,
+                   progress: Optional[PROGRESS] = None, rate_limit: Optional[RateLimiter] = None) -> TextIO:
+    """
+    hbopen for a URL, file name or file handle.  timer, if present, is told how things are going.  digest, if
+    present, is computed into open_info.  progress and rate_limit apply to the bytes as they come off the source
+    """
+    meter = stream_meter(progress, rate_limit)
+
+    def wrap(stream: IO) -> IO:
+        if digest:
+            stream = hashing_stream(stream, digest, open_info)
+        return timed_stream(stream, timer) if timer else stream
+
     if source_type is HBType.URL:
-        url = source if '://' in source else urljoin(base_path + ('' if base_path.endswith('/') else '/'),
-                                                     source, allow_fragments=True)
-        req = Request(quote(url, '/:'))
-        if accept_header:
-            req.add_header("Accept", accept_header)
-        try:
-            response = urlopen(req, context=ssl._create_unverified_context())
-        except HTTPError as e:
-            # This is here because the message out of urllib doesn't include the file name
-            e.msg = f"{e.filename}"
-            raise e
+        url = _resolve_url(source, base_path)
+        if timer:
+            timer.resolved(url)
+        response = _url_open(url, _url_headers(accept_header), pool, http_cache, timer and timer.connected, retry)
+        if timer:
+            timer.headers()
         if open_info:
-            open_info.source_file = response.url
-            open_info.source_file_date = response.headers['Last-Modified']
-            if not open_info.source_file_date:
-                open_info.source_file_date = response.headers['Date']
-            open_info.source_file_size = response.headers['Content-Length']
-            parts = urlsplit(response.url)
-            open_info.base_path = urlunsplit((parts.scheme, parts.netloc, os.path.dirname(parts.path),
-                                             parts.query, None))
+            _set_url_info(open_info, response.url, response.headers)
+        stream = _url_stream(response, open_info, meter)
         # Auto convert byte stream to
-        return _to_textio(response, response.fp.mode, read_codec)
+        return _to_textio(wrap(stream), 'rb', read_codec)
 
     if source_type is HBType.FILENAME:
-        if not base_path:
-            fname = os.path.abspath(source)
-        else:
-            fname = source if os.path.isabs(source) else os.path.abspath(os.path.join(base_path, source))
-        f = open(fname, encoding=read_codec if read_codec else 'utf-8')
-        if open_info:
-            open_info.source_file = fname
-            fstat = os.fstat(f.fileno())
-            open_info.source_file_date = time.ctime(fstat.st_mtime)
-            open_info.source_file_size = fstat.st_size
-            open_info.base_path = os.path.dirname(fname)
+        fname = _resolve_filename(source, base_path)
+        if timer:
+            timer.resolved(fname)
+        stream = _open_binary_file(fname, open_info, mmap, meter)
+        if timer:
+            timer.connected()
+            timer.headers()
+        stream = wrap(stream)
+        try:
+            f = io.TextIOWrapper(stream, encoding=read_codec if read_codec else 'utf-8')
+        except Exception:
+            stream.close()
+            raise
+        f.mode = 'r'
         return _to_textio(f, f.mode, read_codec)
 
     if source_type is HBType.IO:
+        if timer:
+            timer.resolved(getattr(source, 'name', None))
         if open_info:
-            open_info.source_file = source.name
-            if getattr(source, 'fileno', None):
-                fstat = os.fstat(source.fileno())
-                open_info.source_file_date = time.ctime(fstat.st_mtime)
-                open_info.source_file_size = fstat.st_size
-            else:
-                open_info.source_file_date = str(datetime.datetime.now())
-            open_info.base_path = os.path.dirname(source.name)
-        return _to_textio(source, source.mode, read_codec)
+            _set_io_info(open_info, source)
+        if not isinstance(source, io.TextIOBase) and 'b' in getattr(source, 'mode', 'b'):
+            name = getattr(source, 'name', None)
+            compression = detect_compression(name, _peek(source))
+            stream = meter(source, _io_size(source)) if meter else source
+            if compression:
+                stream = decompressing_stream(stream, compression, open_info, not is_declared(name))
+            if timer or digest or meter:
+                return _to_textio(wrap(stream), 'rb', read_codec)
+            return _to_textio(stream, 'rb', read_codec)
+        if meter:
+            source = metered_text(source, _io_size(source), progress, rate_limit)
+        if digest:
+            source = hashing_text(source, digest, open_info)
+        return _to_textio(timed_text(source, timer) if timer else source, 'r', read_codec)
 
     raise AssertionError("Programming error in file type detection logic")
 
@@ -232,7 +650,19 @@ def hbread(source: HB_TYPE,
            base_path: Optional[str] = None,
            accept_header: Optional[str] = None,
            is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
-           read_codec: str = None) -> str:
+           read_codec: str = None,
+           pool: Optional['ConnectionPool'] = None,
+           http_cache: Optional['HTTPCache'] = None,
+           cache: Optional[CachingReader] = None,
+           source_type: Optional[HBType] = None,
+           offset: int = 0,
+           length: Optional[int] = None,
+           coalesce: Optional[SingleFlight] = None,
+           retry: Optional['RetryPolicy'] = None,
+           resolver: Optional[RESOLVER] = None,
+           digest: Optional[DIGEST] = None,
+           progress: Optional[PROGRESS] = None,
+           rate_limit: Optional[RateLimiter] = None) -> str:
     """
     Return the string represented by source
     :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
@@ -241,21 +671,615 @@ def hbread(source: HB_TYPE,
     :param accept_header: Accept header to use if it turns out to be a URL
     :param is_actual_data: Function to differentiate plain text from URL or file name
     :param read_codec: decoder to use for non-ascii data
+    :param pool: Connection pool for URL sources (default: default_pool())
+    :param http_cache: On-disk cache for URL sources (default: no caching)
+    :param cache: In-memory cache for file and URL text (default: no caching)
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param offset: Byte offset to start reading at.  See hbread_bytes
+    :param length: Maximum number of bytes to read (default: to the end).  Characters that are cut in two by
+    either end of the range are dropped
+    :param coalesce: Share file and URL reads with concurrent callers that ask for the same thing through the same
+    SingleFlight (default: no sharing)
+    :param retry: Timeouts, retries and circuit breaker for URL sources (default: the pool's)
+    :param resolver: Maps URLs to the file or URL to read instead, e.g. a URLMirror (default: default_resolver())
+    :param digest: hashlib algorithm name(s) to compute over the bytes read.  See hbopen
+    :param progress: Called with the bytes transferred so far and the size of the source.  See hbopen
+    :param rate_limit: Bandwidth budget for URL, file and IO sources.  Cache hits don't draw on it
     :return: String represented by the source
     """
-    source_type = detect_type(source, base_path, is_actual_data)
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    if source_type is HBType.DATA_URI:
+        source, source_type, read_codec = _data_uri_source(source, read_codec)
+    if source_type is HBType.URL:
+        mapped = _map_url(source, base_path, resolver)
+        if mapped:
+            url, location, location_type = mapped
+            text = hbread(location, open_info, None, accept_header=accept_header, is_actual_data=is_actual_data,
+                          read_codec=read_codec, pool=pool, http_cache=http_cache, cache=cache,
+                          source_type=location_type, offset=offset, length=length, coalesce=coalesce, retry=retry,
+                          resolver=_unresolved, digest=digest, progress=progress, rate_limit=rate_limit)
+            _set_logical_info(open_info, url)
+            return text
+    if coalesce is not None and source_type in (HBType.FILENAME, HBType.URL):
+        return _coalesced_read(coalesce, source, source_type, open_info, base_path, accept_header=accept_header,
+                               read_codec=read_codec, pool=pool, http_cache=http_cache, cache=cache, offset=offset,
+                               length=length, retry=retry, digest=digest, progress=progress, rate_limit=rate_limit)
+    if offset or length is not None:
+        codec, head, start = read_codec, b'', offset
+        if not codec and (offset or source_type is HBType.IO):
+            # The encoding is given away by the first few bytes of the source, not of the range
+            head, position = _range_head(source, base_path, accept_header=accept_header,
+                                         is_actual_data=is_actual_data, pool=pool, source_type=source_type, retry=retry)
+            start += position
+            if start:
+                codec = _range_encoding(head)
+        data = _read_bytes_range(source, open_info, base_path, accept_header=accept_header,
+                                 is_actual_data=is_actual_data, read_codec=read_codec, pool=pool,
+                                 source_type=source_type, offset=offset, length=length, retry=retry,
+                                 resolver=_unresolved, decompress=True, meter=range_meter(progress, rate_limit))
+        if open_info and codec:
+            open_info.encoding = codec
+        if digest and open_info:
+            record_digests(open_info, data, digest)
+        return _decode_range(data, codec, start, head)
     if source_type is HBType.STRINGABLE:
         source_as_string = str(source)
     elif source_type is HBType.DECODABLE:
         # TODO: Tie this into the autodetect machinery
-        source_as_string = source.decode()
+        source_as_string = source.decode(read_codec) if read_codec else source.decode()
     elif source_type is HBType.STRING:
         source_as_string = source
     else:
         source_as_string = None
-    if source_as_string:
+    if source_as_string is not None:
         if open_info:
             open_info.source_file_size = len(source)
+            if digest:
+                record_digests(open_info, _data_bytes(source, source_type, source_as_string), digest)
         return source_as_string
-    with hbopen(source, open_info, base_path, accept_header, is_actual_data, read_codec) as f:
+    if cache is not None and source_type in (HBType.FILENAME, HBType.URL):
+        return _cached_read(cache, source_type, source, open_info, base_path, accept_header=accept_header,
+                            read_codec=read_codec, pool=pool, http_cache=http_cache, retry=retry, digest=digest,
+                            progress=progress, rate_limit=rate_limit)
+    with hbopen(source, open_info, base_path, accept_header=accept_header, is_actual_data=is_actual_data,
+                read_codec=read_codec, pool=pool, http_cache=http_cache, source_type=source_type, retry=retry,
+                resolver=_unresolved, digest=digest, progress=progress, rate_limit=rate_limit) as f:
+        return f.read()
+
+
+def _coalesced_read(coalesce: SingleFlight, source: str, source_type: HBType, open_info: Optional[FileInfo],
+                    base_path: Optional[str], accept_header: Optional[str], read_codec: Optional[str],
+                    pool: Optional['ConnectionPool'], http_cache: Optional['HTTPCache'],
+                    cache: Optional[CachingReader], offset: int, length: Optional[int],
+                    retry: Optional['RetryPolicy'], digest: Optional[DIGEST], progress: Optional[PROGRESS],
+                    rate_limit: Optional[RateLimiter]) -> str:
+    """
+    hbread for a file name or URL, sharing the read with concurrent callers of the same source.  Only the caller
+    that does the read sees its progress and draws on its rate_limit
+    """
+    digest_key = digest and digest_names(digest)
+    if source_type is HBType.FILENAME:
+        key = (_resolve_filename(source, base_path), read_codec, offset, length, digest_key)
+    else:
+        key = (_resolve_url(source, base_path), accept_header, read_codec, offset, length, digest_key)
+
+    def read() -> Tuple[str, tuple]:
+        info = FileInfo()
+        text = hbread(source, info, base_path, accept_header=accept_header, read_codec=read_codec, pool=pool,
+                      http_cache=http_cache, cache=cache, source_type=source_type, offset=offset, length=length,
+                      retry=retry, resolver=_unresolved, digest=digest, progress=progress, rate_limit=rate_limit)
+        return text, info.values()
+    (text, info), _ = coalesce.do(key, read)
+    _replay_info(open_info, info)
+    return text
+
+
+def _replay_info(open_info: Optional[FileInfo], info: tuple) -> None:
+    if open_info:
+        for name, v in zip(open_info.field_names, info):
+            setattr(open_info, name, v)
+
+
+def _cached_read(cache: CachingReader, source_type: HBType, source: str, open_info: Optional[FileInfo],
+                 base_path: Optional[str], accept_header: Optional[str], read_codec: Optional[str],
+                 pool: Optional['ConnectionPool'], http_cache: Optional['HTTPCache'],
+                 retry: Optional['RetryPolicy'] = None, digest: Optional[DIGEST] = None,
+                 progress: Optional[PROGRESS] = None, rate_limit: Optional[RateLimiter] = None) -> str:
+    """ hbread for a file name or URL through cache """
+    from hbreader.http_cache import validators
+    info = FileInfo()
+    # Entries read without a digest can't answer a request for one
+    digest_key = digest and digest_names(digest)
+    if source_type is HBType.FILENAME:
+        fname = _resolve_filename(source, base_path)
+        key = (fname, read_codec, digest_key)
+        fstat = stat_location(fname)
+        validator = (fstat.st_mtime_ns, fstat.st_size)
+        entry = cache.get(key, validator)
+        if entry:
+            _replay_info(open_info, entry.info)
+            return entry.text
+        with hbopen(fname, info, read_codec=read_codec, source_type=HBType.FILENAME, digest=digest, progress=progress,
+                    rate_limit=rate_limit) as f:
+            text = f.read()
+    else:
+        url = _resolve_url(source, base_path)
+        key = (url, accept_header, read_codec, digest_key)
+        headers = _url_headers(accept_header)
+        entry = cache.peek(key)
+        if entry:
+            response = _url_open(url, dict(headers, **entry.validator), pool, None, retry=retry)
+            if response.status == 304:
+                response.close()
+                cache.hit(key)
+                _replay_info(open_info, entry.info)
+                return entry.text
+        else:
+            response = _url_open(url, headers, pool, http_cache, retry=retry)
+        cache.miss()
+        _set_url_info(info, response.url, response.headers)
+        validator = validators(response.headers)
+        stream = _url_stream(response, info, stream_meter(progress, rate_limit))
+        with _to_textio(hashing_stream(stream, digest, info) if digest else stream, 'rb', read_codec) as f:
+            text = f.read()
+    # Pathilizer values are stored as plain strings so that rel_offset is applied on replay, not on capture
+    info = tuple(str.__str__(v) if isinstance(v, str) else v for v in info.values())
+    if validator:
+        cache.put(key, validator, text, info)
+    _replay_info(open_info, info)
+    return text
+
+
+def hbiter(source: HB_TYPE, *args, chunk_size: int = CHUNK_SIZE, **kwargs) -> Iterator[str]:
+    """
+    Return the text of source a chunk at a time.  Byte streams are decoded incrementally, so memory use is bounded
+    by chunk_size rather than the size of source.
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param args: additional hbopen arguments
+    :param chunk_size: number of characters (text) or bytes (binary streams) to read at a time
+    :param kwargs: additional hbopen arguments
+    :return: iterator over non-empty chunks of text
+    """
+    with hbopen(source, *args, **kwargs) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def hblines(source: HB_TYPE, *args, chunk_size: int = CHUNK_SIZE, **kwargs) -> Iterator[str]:
+    """
+    Return the text of source a line at a time, including the line ending
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param args: additional hbopen arguments
+    :param chunk_size: read size -- see hbiter
+    :param kwargs: additional hbopen arguments
+    :return: iterator over lines
+    """
+    buf = ''
+    for chunk in hbiter(source, *args, chunk_size=chunk_size, **kwargs):
+        buf = buf + chunk if buf else chunk
+        start = 0
+        while True:
+            end = buf.find('\n', start) + 1
+            if not end:
+                break
+            yield buf[start:end]
+            start = end
+        buf = buf[start:]
+    if buf:
+        yield buf
+
+
+def hbread_buffer(source: HB_TYPE,
+                  open_info: Optional[FileInfo] = None,
+                  base_path: Optional[str] = None,
+                  is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                  read_codec: str = None,
+                  source_type: Optional[HBType] = None,
+                  decompress: bool = False,
+                  **kwargs) -> Union[bytes, memoryview, MMap]:
+    """
+    Return the content of source as a bytes-like object.  Files come back as a read-only mmap (unless they are
+    decompressed), so no private copy is made and processes that read the same file share the page cache.  Close
+    the mmap (or use it in a with statement) when done.  Bytes and bytearrays are returned as a memoryview, anything
+    else as hbread_bytes.
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param open_info: what we learned about source in the process of converting it
+    :param base_path: Base to use if source is a relative URL or file name
+    :param is_actual_data: Function to differentiate plain text from URL or file name
+    :param read_codec: Codec to encode text sources in (default: utf-8).  Reported as is for byte sources
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param decompress: Decompress compressed sources
+    :param kwargs: additional hbread_bytes arguments
+    :return: mmap, memoryview or bytes
+    """
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    if source_type is HBType.DATA_URI:
+        source, source_type, read_codec = _data_uri_source(source, read_codec)
+    if source_type is HBType.FILENAME:
+        with _open_binary_file(_resolve_filename(source, base_path), open_info, decompress=decompress) as f:
+            mapped = map_file(f) if isinstance(getattr(f, 'raw', None), io.FileIO) else None
+            if mapped is None:
+                return f.read()
+            if open_info:
+                open_info.encoding = read_codec if read_codec else _detect_encoding(f)
+            return mapped
+    if source_type is HBType.DECODABLE:
+        if open_info:
+            open_info.source_file_size = len(source)
+            open_info.encoding = read_codec if read_codec else _bom_encoding(bytes(source[:4]))
+        return memoryview(source)
+    return hbread_bytes(source, open_info, base_path, is_actual_data=is_actual_data, read_codec=read_codec,
+                        source_type=source_type, decompress=decompress, **kwargs)
+
+
+def _detect_encoding(fp: IO) -> Optional[str]:
+    """ Encoding of binary stream fp, determined from its first four bytes without consuming them """
+    peek = getattr(fp, 'peek', None)
+    return _bom_encoding(peek(4)[:4]) if callable(peek) else None
+
+
+def hbopen_binary(source: HB_TYPE,
+                  open_info: Optional[FileInfo] = None,
+                  base_path: Optional[str] = None,
+                  accept_header: Optional[str] = None,
+                  is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                  read_codec: str = None,
+                  pool: Optional['ConnectionPool'] = None,
+                  http_cache: Optional['HTTPCache'] = None,
+                  source_type: Optional[HBType] = None,
+                  retry: Optional['RetryPolicy'] = None,
+                  resolver: Optional[RESOLVER] = None,
+                  decompress: bool = False) -> BinaryIO:
+    """
+    Return an open binary stream for source.  Nothing is decoded -- the encoding of the bytes (read_codec if
+    supplied, otherwise the one detected from the BOM) is reported in open_info.encoding instead.  Compressed sources
+    come back as they are stored, with the compression recorded in open_info.compression, unless decompress is set.
+    A Content-Encoding the server applied in transit is always undone.
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param open_info: what we learned about source in the process of converting it
+    :param base_path: Base to use if source is a relative URL or file name
+    :param accept_header: Accept header to use if it turns out to be a URL
+    :param is_actual_data: Function to differentiate plain text from URL or file name
+    :param read_codec: Codec to encode text sources in (default: utf-8).  Reported as is for byte sources
+    :param pool: Connection pool for URL sources (default: default_pool())
+    :param http_cache: On-disk cache for URL sources (default: no caching)
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param retry: Timeouts, retries and circuit breaker for URL sources (default: the pool's)
+    :param resolver: Maps URLs to the file or URL to read instead, e.g. a URLMirror (default: default_resolver())
+    :param decompress: Decompress compressed sources
+    :return: binary stream
+    """
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    if source_type is HBType.DATA_URI:
+        source, source_type, read_codec = _data_uri_source(source, read_codec)
+    if source_type is HBType.URL:
+        mapped = _map_url(source, base_path, resolver)
+        if mapped:
+            url, location, location_type = mapped
+            f = hbopen_binary(location, open_info, None, accept_header=accept_header, is_actual_data=is_actual_data,
+                              read_codec=read_codec, pool=pool, http_cache=http_cache, source_type=location_type,
+                              retry=retry, resolver=_unresolved, decompress=decompress)
+            _set_logical_info(open_info, url)
+            return f
+    codec = read_codec if read_codec else 'utf-8'
+    if source_type in (HBType.STRING, HBType.STRINGABLE):
+        data = (source if source_type is HBType.STRING else str(source)).encode(codec)
+        if open_info:
+            open_info.source_file_size = len(data)
+            open_info.encoding = codec
+        return BytesIO(data)
+
+    if source_type is HBType.DECODABLE:
+        if open_info:
+            open_info.source_file_size = len(source)
+            open_info.encoding = read_codec if read_codec else _bom_encoding(bytes(source[:4]))
+        return BytesIO(source)
+
+    if source_type is HBType.URL:
+        response = _url_open(_resolve_url(source, base_path), _url_headers(accept_header), pool, http_cache,
+                             retry=retry)
+        if open_info:
+            _set_url_info(open_info, response.url, response.headers)
+        stream = _url_stream(response, open_info, decompress=decompress)
+    elif source_type is HBType.FILENAME:
+        stream = _open_binary_file(_resolve_filename(source, base_path), open_info, decompress=decompress)
+    elif source_type is HBType.IO:
+        if open_info:
+            _set_io_info(open_info, source)
+        if isinstance(source, io.TextIOBase) or 'b' not in getattr(source, 'mode', 'b'):
+            # Already text -- all we can do is encode it
+            codec = read_codec if read_codec else getattr(source, 'encoding', None) or 'utf-8'
+            if open_info:
+                open_info.encoding = codec
+            return BytesIO(source.read().encode(codec))
+        name = getattr(source, 'name', None)
+        stream = _decompressed(source, detect_compression(name, _peek(source)), open_info, not is_declared(name),
+                               decompress)
+    else:
+        raise AssertionError("Programming error in file type detection logic")
+    if open_info:
+        open_info.encoding = read_codec if read_codec else _detect_encoding(stream)
+    return stream
+
+
+def hbread_bytes(source: HB_TYPE,
+                 open_info: Optional[FileInfo] = None,
+                 base_path: Optional[str] = None,
+                 accept_header: Optional[str] = None,
+                 is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                 read_codec: str = None,
+                 pool: Optional['ConnectionPool'] = None,
+                 http_cache: Optional['HTTPCache'] = None,
+                 source_type: Optional[HBType] = None,
+                 offset: int = 0,
+                 length: Optional[int] = None,
+                 retry: Optional['RetryPolicy'] = None,
+                 resolver: Optional[RESOLVER] = None,
+                 decompress: bool = False) -> bytes:
+    """
+    Return the bytes represented by source, without decoding them -- or decompressing them, unless decompress is
+    set.  See hbopen_binary.
+
+    offset and length select a byte range.  URLs are fetched with a Range request -- if the server ignores it, the
+    response is read up to the end of the range and then dropped.  Files and seekable file handles are positioned
+    with seek (file handle offsets are relative to the current position).  With decompress, compressed sources are
+    decompressed from the start, and the range applies to the decompressed content.
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param open_info: what we learned about source in the process of converting it
+    :param base_path: Base to use if source is a relative URL or file name
+    :param accept_header: Accept header to use if it turns out to be a URL
+    :param is_actual_data: Function to differentiate plain text from URL or file name
+    :param read_codec: Codec to encode text sources in (default: utf-8).  Reported as is for byte sources
+    :param pool: Connection pool for URL sources (default: default_pool())
+    :param http_cache: On-disk cache for URL sources (default: no caching)
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param offset: Byte offset to start reading at
+    :param length: Maximum number of bytes to read (default: to the end)
+    :param retry: Timeouts, retries and circuit breaker for URL sources (default: the pool's)
+    :param resolver: Maps URLs to the file or URL to read instead, e.g. a URLMirror (default: default_resolver())
+    :param decompress: Decompress compressed sources
+    :return: bytes represented by the source
+    """
+    if offset or length is not None:
+        return _read_bytes_range(source, open_info, base_path, accept_header=accept_header,
+                                 is_actual_data=is_actual_data, read_codec=read_codec, pool=pool,
+                                 source_type=source_type, offset=offset, length=length, retry=retry,
+                                 resolver=resolver, decompress=decompress)
+    if isinstance(source, bytes):
+        if open_info:
+            open_info.source_file_size = len(source)
+            open_info.encoding = read_codec if read_codec else _bom_encoding(source[:4])
+        return source
+    with hbopen_binary(source, open_info, base_path, accept_header=accept_header, is_actual_data=is_actual_data,
+                       read_codec=read_codec, pool=pool, http_cache=http_cache, source_type=source_type, retry=retry,
+                       resolver=resolver, decompress=decompress) as f:
         return f.read()
+
+
+def hbhead(source: HB_TYPE, nbytes: int = HEAD_SIZE, *args, **kwargs) -> str:
+    """
+    Return the beginning of source -- enough to sniff its format -- without reading (or for URLs, transferring) the
+    rest of it
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param nbytes: number of bytes to read
+    :param args: additional hbread arguments
+    :param kwargs: additional hbread arguments
+    :return: text of the first nbytes bytes of source
+    """
+    return hbread(source, *args, offset=0, length=nbytes, **kwargs)
+
+
+def _range_encoding(data: bytes) -> str:
+    """ Encoding of a range at the start of a source.  Ranges too short for _bom_encoding may still hold a BOM """
+    if len(data) >= 4:
+        return _bom_encoding(data)
+    if data.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    return 'utf-8'
+
+
+def _range_head(source: HB_TYPE, base_path: Optional[str], accept_header: Optional[str],
+                is_actual_data: Optional[Callable[[str], bool]], pool: Optional['ConnectionPool'],
+                source_type: HBType, retry: Optional['RetryPolicy']) -> Tuple[bytes, int]:
+    """
+    The first four (decompressed) bytes of source, for encoding detection, and the position in source that range
+    offsets are relative to -- the current position of a file handle, which is left where it is
+    """
+    if source_type is HBType.IO:
+        seekable = getattr(source, 'seekable', None)
+        if isinstance(source, io.TextIOBase) or not (callable(seekable) and seekable()):
+            return b'', 0
+        position = source.tell()
+        source.seek(0)
+        head = source.read(4)
+        source.seek(position)
+        # Offsets into a compressed handle are offsets into its content, not its file
+        return (b'', 0) if detect_compression(getattr(source, 'name', None), head) else (head, position)
+    return hbread_bytes(source, None, base_path, accept_header=accept_header, is_actual_data=is_actual_data,
+                        pool=pool, source_type=source_type, length=4, retry=retry, resolver=_unresolved,
+                        decompress=True), 0
+
+
+def _decode_range(data: bytes, codec: Optional[str], offset: int, head: bytes = b'') -> str:
+    """
+    Decode a byte range that starts offset bytes into a source, dropping any characters that are cut in two by the
+    ends of the range
+    :param data: the range
+    :param codec: encoding of the source (default: detected from data at offset 0, utf-8 elsewhere)
+    :param offset: position of data in the source
+    :param head: first bytes of the source -- the byte order of a BOM-marked UTF-16 or UTF-32 source
+    """
+    if not offset:
+        return codecs.getincrementaldecoder(codec or _range_encoding(data))().decode(data, False)
+    name = codecs.lookup(codec or 'utf-8').name
+    if name == 'utf-8-sig':
+        name = 'utf-8'
+    elif name == 'utf-16':
+        # There's no BOM in the middle of the source to say which way round the bytes are
+        name += '-be' if head.startswith(codecs.BOM_UTF16_BE) else '-le'
+    elif name == 'utf-32':
+        name += '-be' if head.startswith(codecs.BOM_UTF32_BE) else '-le'
+    unit = 4 if name.startswith('utf-32') else 2 if name.startswith('utf-16') else 1
+    # Skip the tail end of a character that started before the range
+    skip = -offset % unit
+    if name == 'utf-8':
+        while skip < min(3, len(data)) and data[skip] & 0xC0 == 0x80:
+            skip += 1
+    elif unit == 2 and len(data) >= skip + 2:
+        # ... including the second half of a surrogate pair
+        if 0xDC <= data[skip if name.endswith('-be') else skip + 1] <= 0xDF:
+            skip += 2
+    return codecs.getincrementaldecoder(name)().decode(data[skip:], False)
+
+
+def _read_range(fp: IO, offset: int, length: Optional[int], meter: Optional[METER] = None,
+                size: Optional[int] = None) -> bytes:
+    """
+    Read length bytes (all of them if None) from binary stream fp, starting offset bytes from its position.  meter, if
+    present, meters the bytes read -- including any read to get to offset, but not those that are seeked past --
+    against size, the size of the source
+    """
+    if offset:
+        seekable = getattr(fp, 'seekable', None)
+        if callable(seekable) and seekable():
+            fp.seek(offset, io.SEEK_CUR)
+            offset = 0
+    if meter:
+        fp = meter(fp, size)
+    while offset:
+        skipped = len(fp.read(min(offset, CHUNK_SIZE)))
+        if not skipped:
+            return b''
+        offset -= skipped
+    if length is None:
+        return fp.read()
+    parts = []
+    while length > 0:
+        data = fp.read(length)
+        if not data:
+            break
+        parts.append(data)
+        length -= len(data)
+    return b''.join(parts)
+
+
+def _content_range(headers: Mapping[str, str]) -> Tuple[Optional[int], Optional[str]]:
+    """ First byte position and complete length (None if unknown) from a 206 Content-Range header """
+    m = re.match(r'\s*bytes\s+(\d+)-\d+/(\d+|\*)', headers.get('Content-Range') or '')
+    if not m:
+        return None, None
+    return int(m.group(1)), None if m.group(2) == '*' else m.group(2)
+
+
+def _read_url_range(url: str, open_info: Optional[FileInfo], accept_header: Optional[str],
+                    read_codec: Optional[str], pool: Optional['ConnectionPool'], offset: int,
+                    length: Optional[int], retry: Optional['RetryPolicy'] = None, decompress: bool = True,
+                    meter: Optional[METER] = None) -> bytes:
+    """
+    Read a byte range of url, with a Range request unless the source is compressed and is to be decompressed.  meter,
+    if present, meters the bytes received against the size of the resource
+    """
+    headers = _url_headers(accept_header)
+    response = None
+    if not (decompress and detect_compression(url)):
+        # Byte ranges of a content-encoded response are ranges of the encoded bytes -- ask for the real thing
+        end = '' if length is None else str(offset + length - 1)
+        response = _url_open(url, dict(headers, **{'Accept-Encoding': 'identity', 'Range': f'bytes={offset}-{end}'}),
+                             pool, None, retry=retry)
+        if response.status == 206:
+            first, total = _content_range(response.headers)
+            encoded = response.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+            # A compressed resource gives itself away by its magic number -- its ranges aren't ranges of the content
+            if first is not None and first <= offset and not encoded and \
+                    not (decompress and first == 0 and detect_compression(None, _peek(response))):
+                if open_info:
+                    _set_url_info(open_info, response.url, response.headers)
+                    open_info.source_file_size = total
+                    open_info.encoding = read_codec if read_codec else _detect_encoding(response) if offset == 0 \
+                        else None
+                with response:
+                    return _read_range(response, offset - first, length, meter, int(total) if total else None)
+            # Not something we can use -- start over without the Range
+            response.close()
+            response = None
+    if response is None:
+        response = _url_open(url, headers, pool, None, retry=retry)
+    if open_info:
+        _set_url_info(open_info, response.url, response.headers)
+    with _url_stream(response, open_info, meter, decompress) as stream:
+        if open_info:
+            open_info.encoding = read_codec if read_codec else _detect_encoding(stream)
+        return _read_range(stream, offset, length)
+
+
+def _read_bytes_range(source: HB_TYPE, open_info: Optional[FileInfo], base_path: Optional[str],
+                      accept_header: Optional[str], is_actual_data: Optional[Callable[[str], bool]],
+                      read_codec: Optional[str], pool: Optional['ConnectionPool'], source_type: Optional[HBType],
+                      offset: int, length: Optional[int], retry: Optional['RetryPolicy'] = None,
+                      resolver: Optional[RESOLVER] = None, decompress: bool = True,
+                      meter: Optional[METER] = None) -> bytes:
+    """ hbread_bytes for a byte range.  meter, if present, meters what is read from URL, file and IO sources """
+    if offset < 0 or (length is not None and length < 0):
+        raise ValueError("offset and length must not be negative")
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    if source_type is HBType.URL:
+        mapped = _map_url(source, base_path, resolver)
+        if mapped:
+            url, location, location_type = mapped
+            data = _read_bytes_range(location, open_info, None, accept_header=accept_header,
+                                     is_actual_data=is_actual_data, read_codec=read_codec, pool=pool,
+                                     source_type=location_type, offset=offset, length=length, retry=retry,
+                                     resolver=_unresolved, decompress=decompress, meter=meter)
+            _set_logical_info(open_info, url)
+            return data
+    if source_type is HBType.URL:
+        data = _read_url_range(_resolve_url(source, base_path), open_info, accept_header=accept_header,
+                               read_codec=read_codec, pool=pool, offset=offset, length=length, retry=retry,
+                               decompress=decompress, meter=meter)
+    else:
+        with hbopen_binary(source, open_info, base_path, accept_header=accept_header, is_actual_data=is_actual_data,
+                           read_codec=read_codec, pool=pool, source_type=source_type, retry=retry,
+                           resolver=_unresolved, decompress=decompress) as f:
+            if source_type in (HBType.FILENAME, HBType.IO):
+                # Decompressed bytes aren't bytes of the file, so they are counted against an unknown size
+                data = _read_range(f, offset, length, meter, _io_size(f) if f is source or f.seekable() else None)
+            else:
+                data = _read_range(f, offset, length)
+    if open_info:
+        open_info.read_offset = offset
+        open_info.read_length = len(data)
+    return data
+
+
+# Names that are imported on first use, keeping the network, TLS and asyncio machinery out of `import hbreader`
+_LAZY_NAMES = {
+    'ConnectionPool': 'hbreader.connection_pool',
+    'default_pool': 'hbreader.connection_pool',
+    'set_default_pool': 'hbreader.connection_pool',
+    'HTTPCache': 'hbreader.http_cache',
+    'RetryPolicy': 'hbreader.retry',
+    'CircuitBreaker': 'hbreader.retry',
+    'CircuitOpenError': 'hbreader.retry',
+    # Extensions that are built on top of the core reader
+    'AsyncTextIO': 'hbreader.async_reader',
+    'hbopen_async': 'hbreader.async_reader',
+    'hbread_async': 'hbreader.async_reader',
+    'hbread_many_async': 'hbreader.async_reader',
+    'bounded_gather': 'hbreader.async_reader',
+    'hbread_many': 'hbreader.batch_reader',
+    'PrefetchingReader': 'hbreader.prefetch'
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,229 @@
+import errno
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any, IO
+
+__all__ = ['ArchiveCache', 'default_archive_cache', 'set_default_archive_cache']
+
+# bundle.zip!/path/inner.yaml names path/inner.yaml in bundle.zip
+ARCHIVE_SEPARATOR = '!/'
+ZIP_EXTENSIONS = ('.zip', '.jar')
+TAR_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_EXTENSIONS = ZIP_EXTENSIONS + TAR_EXTENSIONS
+
+
+def split_member(fname: str) -> Optional[Tuple[str, str]]:
+    """
+    Split an archive member location into the archive file name and the member name
+    :param fname: file name, possibly of the form archive!/member
+    :return: (archive, member) or None if fname isn't in an archive
+    """
+    if '!' not in fname:
+        return None
+    if os.sep != '/':
+        fname = fname.replace(os.sep, '/')
+    start = 0
+    while True:
+        i = fname.find(ARCHIVE_SEPARATOR, start)
+        if i < 0:
+            return None
+        if fname[:i].lower().endswith(ARCHIVE_EXTENSIONS):
+            return fname[:i], fname[i + len(ARCHIVE_SEPARATOR):]
+        start = i + 1
+
+
+def stat_location(fname: str) -> os.stat_result:
+    """ os.stat of fname, or of the archive it is in """
+    member = split_member(fname)
+    return os.stat(member[0] if member else fname)
+
+
+class _MemberStream(io.RawIOBase):
+    """ Raw stream over an archive member.  Keeps the archive open until it is closed """
+    def __init__(self, archive: '_Archive', fp: IO, name: str) -> None:
+        super().__init__()
+        self._archive = archive
+        self._fp = fp
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        lock = self._archive.read_lock
+        if lock is None:
+            return self._fp.readinto(b)
+        with lock:
+            return self._fp.readinto(b)
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                self._fp.close()
+            finally:
+                self._archive.release()
+        super().close()
+
+
+class _Archive:
+    """ An open zip or tar file and the index of its members """
+    def __init__(self, path: str, validator: Tuple[int, int]) -> None:
+        self.path = path
+        self.validator = validator
+        self._refs = 0
+        self._retired = False
+        self._lock = threading.Lock()
+        if path.lower().endswith(ZIP_EXTENSIONS):
+            import zipfile
+            self._archive = zipfile.ZipFile(path)
+            self._members: Dict[str, Any] = {i.filename: i for i in self._archive.infolist() if not i.is_dir()}
+            # Zip members each track their own position in the (shared) file
+            self.read_lock = None
+        else:
+            import tarfile
+            self._archive = tarfile.open(path)
+            self._members = {m.name[2:] if m.name.startswith('./') else m.name: m
+                             for m in self._archive.getmembers() if m.isfile()}
+            # Tar members share the position of the underlying file
+            self.read_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def open(self, member: str, location: str) -> Tuple[io.RawIOBase, str, int]:
+        """
+        Open member, which must have been acquired
+        :return: raw stream, modification date and size of member
+        """
+        info = self._members.get(member)
+        if info is None:
+            raise FileNotFoundError(errno.ENOENT, f"No such member in {self.path}", location)
+        if self.read_lock is None:
+            fp = self._archive.open(info)
+            date = time.ctime(time.mktime(info.date_time + (0, 0, -1)))
+            size = info.file_size
+        else:
+            with self.read_lock:
+                fp = self._archive.extractfile(info)
+            date = time.ctime(info.mtime)
+            size = info.size
+        return _MemberStream(self, fp, location), date, size
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._refs += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._refs -= 1
+            close = self._retired and not self._refs
+        if close:
+            self._archive.close()
+
+    def retire(self) -> None:
+        """ Close the archive once the last open member is closed """
+        with self._lock:
+            self._retired = True
+            close = not self._refs
+        if close:
+            self._archive.close()
+
+
+class ArchiveCache:
+    """
+    Thread-safe LRU of open zip and tar archives, along with the index of their members, so that reading a member
+    of an archive that has been read from before costs neither an open nor a pass over the directory.  Archives are
+    revalidated with os.stat (modification time and size).  Members are streamed -- never extracted to disk.
+
+    Compressed tars (.tar.gz, .tgz, .tar.bz2, .tar.xz) can't be seeked into: every seek backwards decompresses the
+    archive again from the start.  Reading their members in archive order is cheap, reading them in any other order
+    costs a pass over the archive per member, quadratic in the size of the archive.  Prefer zip or plain tar for
+    archives that are read at random, or decompress them first.
+    """
+    def __init__(self, max_open: int = 16) -> None:
+        """
+        :param max_open: maximum number of archives to keep open
+        """
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1")
+        self.max_open = max_open
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._archives: 'OrderedDict[str, _Archive]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._archives)
+
+    def open(self, archive_path: str, member: str, location: str) -> Tuple[io.RawIOBase, str, int]:
+        """
+        Open a member of an archive
+        :param archive_path: absolute archive file name
+        :param member: name of the member in the archive
+        :param location: name for the returned stream
+        :return: raw stream, modification date and size of the member
+        """
+        fstat = os.stat(archive_path)
+        validator = (fstat.st_mtime_ns, fstat.st_size)
+        retired = []
+        with self._lock:
+            archive = self._archives.get(archive_path)
+            if archive is not None and archive.validator != validator:
+                retired.append(self._archives.pop(archive_path))
+                archive = None
+            if archive is None:
+                self.misses += 1
+                archive = self._archives[archive_path] = _Archive(archive_path, validator)
+                while len(self._archives) > self.max_open:
+                    retired.append(self._archives.popitem(last=False)[1])
+            else:
+                self.hits += 1
+                self._archives.move_to_end(archive_path)
+            archive.acquire()
+        for old in retired:
+            old.retire()
+        try:
+            return archive.open(member, location)
+        except BaseException:
+            archive.release()
+            raise
+
+    def clear(self) -> None:
+        """ Close all archives.  Archives with members open are closed when the last of those is closed """
+        with self._lock:
+            archives, self._archives = list(self._archives.values()), OrderedDict()
+        for archive in archives:
+            archive.retire()
+
+    def __enter__(self) -> 'ArchiveCache':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.clear()
+
+
+_default_archive_cache: Optional[ArchiveCache] = None
+_default_archive_cache_lock = threading.Lock()
+
+
+def default_archive_cache() -> ArchiveCache:
+    """ Return the archive cache that archive member reads go through, creating it on first use """
+    global _default_archive_cache
+    with _default_archive_cache_lock:
+        if _default_archive_cache is None:
+            _default_archive_cache = ArchiveCache()
+        return _default_archive_cache
+
+
+def set_default_archive_cache(archive_cache: Optional[ArchiveCache]) -> None:
+    """
+    Replace the default archive cache, closing the previous one
+    :param archive_cache: new cache.  None means create a default-sized one on next use
+    """
+    global _default_archive_cache
+    with _default_archive_cache_lock:
+        old, _default_archive_cache = _default_archive_cache, archive_cache
+    if old is not None and old is not archive_cache:
+        old.clear()
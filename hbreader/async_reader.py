@@ -0,0 +1,415 @@
+import asyncio
+import ssl
+from abc import ABC, abstractmethod
+from functools import partial
+from http.client import HTTPMessage, RemoteDisconnected, parse_headers
+from io import BytesIO, StringIO
+from typing import Optional, Callable, Iterable, List, Awaitable, TextIO, Tuple, Any, Mapping
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit, urljoin
+
+from hbreader import HB_TYPE, HBType, FileInfo, ReadResult, CHUNK_SIZE, detect_type, default_str_tester, hbopen, \
+    hbread, _AutoDecoder, _resolve_url, _set_url_info, _map_url, _url_headers
+from hbreader.compression import detect_compression, is_declared, decompressing_stream, IncrementalDecompressor, \
+    MAGIC_LEN
+from hbreader.connection_pool import ConnectionPool, REDIRECT_CODES, MAX_REDIRECTS, default_pool
+from hbreader.retry import RetryPolicy
+from hbreader.url_mirror import RESOLVER
+
+__all__ = ['AsyncTextIO', 'hbopen_async', 'hbread_async', 'hbread_many_async', 'bounded_gather']
+
+_ssl_context: Optional[ssl.SSLContext] = None
+
+
+def _unverified_context() -> ssl.SSLContext:
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl._create_unverified_context()
+    return _ssl_context
+
+
+class _HTTPBody:
+    """ Non-blocking reader for an HTTP/1.1 response body -- Content-Length, chunked or read-to-close """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: HTTPMessage,
+                 timeout: Optional[float] = None) -> None:
+        self._reader = reader
+        self._timeout = timeout
+        self._writer = writer
+        self._chunked = 'chunked' in (headers.get('Transfer-Encoding') or '').lower()
+        length = headers.get('Content-Length')
+        self._remaining = int(length) if length and not self._chunked else None     # None - unknown
+        self._chunk_left = 0
+        self._eof = False
+
+    async def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            parts = []
+            while True:
+                data = await self.read(CHUNK_SIZE)
+                if not data:
+                    return b''.join(parts)
+                parts.append(data)
+        if self._eof or n == 0:
+            return b''
+        if self._chunked:
+            if not self._chunk_left:
+                size_line = await self._wait(self._reader.readline())
+                self._chunk_left = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+                if not self._chunk_left:
+                    # Trailers, if any, end with a blank line
+                    while (await self._wait(self._reader.readline())) not in (b'\r\n', b'\n', b''):
+                        pass
+                    self._eof = True
+                    return b''
+            data = await self._wait(self._reader.read(min(n, self._chunk_left)))
+            self._chunk_left -= len(data)
+            if not self._chunk_left:
+                await self._wait(self._reader.readline())
+        elif self._remaining is not None:
+            data = await self._wait(self._reader.read(min(n, self._remaining)))
+            self._remaining -= len(data)
+            self._eof = not self._remaining
+        else:
+            data = await self._wait(self._reader.read(n))
+        if not data:
+            self._eof = True
+        return data
+
+    async def _wait(self, aw: Awaitable[bytes]) -> bytes:
+        return await asyncio.wait_for(aw, self._timeout) if self._timeout is not None else await aw
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+async def _http_get(url: str, headers: Mapping[str, str], policy: RetryPolicy) \
+        -> Tuple[str, int, HTTPMessage, _HTTPBody]:
+    """ _http_get_once, with the retries and circuit breaker of policy """
+    breaker = policy.breaker
+    host = ConnectionPool._key(url)
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker:
+            breaker.before(host)
+        try:
+            response = await _http_get_once(url, headers, policy)
+        except URLError as e:
+            if breaker:
+                (breaker.failure if policy.is_failure(e) else breaker.success)(host)
+            delay = policy.retry_delay(attempt, e)
+            if delay is None:
+                raise
+        else:
+            if breaker:
+                breaker.success(host)
+            return response
+        await asyncio.sleep(delay)
+
+
+async def _http_get_once(url: str, headers: Mapping[str, str], policy: RetryPolicy) \
+        -> Tuple[str, int, HTTPMessage, _HTTPBody]:
+    """ GET url, following redirects.  Returns the final url, status, headers and an open body """
+    def timed(aw: Awaitable, timeout: Optional[float]) -> Awaitable:
+        return asyncio.wait_for(aw, timeout) if timeout is not None else aw
+
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        https = parts.scheme.lower() == 'https'
+        port = parts.port or (443 if https else 80)
+        writer = None
+        try:
+            reader, writer = await timed(asyncio.open_connection(parts.hostname, port,
+                                                                 ssl=_unverified_context() if https else None),
+                                         policy.connect_timeout)
+            target = (parts.path or '/') + (('?' + parts.query) if parts.query else '')
+            request = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc}", "Connection: close"] + \
+                      [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(('\r\n'.join(request) + '\r\n\r\n').encode('latin-1'))
+            await timed(writer.drain(), policy.read_timeout)
+            status_line = await timed(reader.readline(), policy.read_timeout)
+            header_lines = []
+            while True:
+                line = await timed(reader.readline(), policy.read_timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                header_lines.append(line)
+        except (OSError, asyncio.TimeoutError) as e:
+            if writer is not None:
+                writer.close()
+            raise URLError(e if isinstance(e, OSError) else TimeoutError("timed out"))
+        if not status_line:
+            writer.close()
+            raise URLError(RemoteDisconnected("Remote end closed connection without response"))
+        status_parts = status_line.decode('latin-1').split(None, 2)
+        if len(status_parts) < 2 or not status_parts[1].isdigit():
+            writer.close()
+            raise URLError(f"Bad status line: {status_line!r}")
+        status = int(status_parts[1])
+        response_headers = parse_headers(BytesIO(b''.join(header_lines) + b'\r\n'))
+        body = _HTTPBody(reader, writer, response_headers, policy.read_timeout)
+        location = response_headers.get('Location')
+        if status in REDIRECT_CODES and location:
+            body.close()
+            url = urljoin(url, location)
+            continue
+        if status >= 400:
+            content = await body.read()
+            body.close()
+            e = HTTPError(url, status, status_parts[2].strip() if len(status_parts) > 2 else '', response_headers,
+                          BytesIO(content))
+            # Match hbopen -- the message includes the file name
+            e.msg = f"{e.filename}"
+            raise e
+        return url, status, response_headers, body
+    raise HTTPError(url, status, "Too many redirects", response_headers, None)
+
+
+class AsyncTextIO(ABC):
+    """ Asynchronous text stream returned by hbopen_async """
+    def __init__(self) -> None:
+        self._buf = ''
+        self._eof = False
+
+    @abstractmethod
+    async def _chunk(self) -> str:
+        """ Return the next piece of decoded text, setting self._eof when there is no more """
+
+    async def read(self, n: int = -1) -> str:
+        if n is None or n < 0:
+            parts = [self._buf]
+            while not self._eof:
+                parts.append(await self._chunk())
+            self._buf = ''
+            return ''.join(parts)
+        while len(self._buf) < n and not self._eof:
+            self._buf += await self._chunk()
+        rval, self._buf = self._buf[:n], self._buf[n:]
+        return rval
+
+    async def readline(self) -> str:
+        while '\n' not in self._buf and not self._eof:
+            self._buf += await self._chunk()
+        end = self._buf.find('\n') + 1 or len(self._buf)
+        rval, self._buf = self._buf[:end], self._buf[end:]
+        return rval
+
+    def __aiter__(self) -> 'AsyncTextIO':
+        return self
+
+    async def __anext__(self) -> str:
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> 'AsyncTextIO':
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+
+class _AsyncHTTPText(AsyncTextIO):
+    def __init__(self, body: _HTTPBody, read_codec: Optional[str], leading_bytes: bytes = b'',
+                 decompressor: Optional[IncrementalDecompressor] = None,
+                 open_info: Optional[FileInfo] = None) -> None:
+        """
+        :param body: response body, less leading_bytes
+        :param read_codec: decoder to use for non-ascii data
+        :param leading_bytes: bytes that were read from body to detect compression
+        :param decompressor: decompressor for the body, if it is compressed
+        :param open_info: FileInfo to record the compression and uncompressed size in
+        """
+        super().__init__()
+        self._body = body
+        self._decoder = _AutoDecoder(read_codec)
+        self._pending = leading_bytes
+        self._decompressor = decompressor
+        self._open_info = open_info if decompressor else None
+        self._uncompressed_size = 0
+        if self._open_info:
+            self._open_info.compression = decompressor.compression
+
+    async def _chunk(self) -> str:
+        data, self._pending = (self._pending, b'') if self._pending else (await self._body.read(CHUNK_SIZE), b'')
+        self._eof = not data
+        if self._decompressor:
+            data = self._decompressor.decompress(data) if data else self._decompressor.flush()
+            self._uncompressed_size += len(data)
+            if self._open_info:
+                if self._decompressor.compression is None:
+                    # Not compressed after all
+                    self._open_info.compression = None
+                    self._open_info = None
+                elif self._eof:
+                    self._open_info.uncompressed_size = self._uncompressed_size
+        return self._decoder.decode(data, self._eof)
+
+    async def close(self) -> None:
+        self._body.close()
+
+
+class _AsyncSyncText(AsyncTextIO):
+    """ Wrapper for a synchronous TextIO.  Reads run in the default executor unless the data is already in memory """
+    def __init__(self, fp: TextIO, offload: bool) -> None:
+        super().__init__()
+        self._fp = fp
+        self._offload = offload
+
+    async def _call(self, f: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, f, *args) if self._offload else f(*args)
+
+    async def _chunk(self) -> str:
+        data = await self._call(self._fp.read, CHUNK_SIZE)
+        self._eof = not data
+        return data
+
+    async def close(self) -> None:
+        await self._call(self._fp.close)
+
+
+async def _http_text(url: str, headers: HTTPMessage, body: _HTTPBody, read_codec: Optional[str],
+                     open_info: Optional[FileInfo]) -> AsyncTextIO:
+    """ Text of the (decompressed) response body """
+    leading_bytes = b''
+    while len(leading_bytes) < MAGIC_LEN:
+        data = await body.read(MAGIC_LEN - len(leading_bytes))
+        if not data:
+            break
+        leading_bytes += data
+    content_encoding = headers.get('Content-Encoding')
+    compression = detect_compression(url, leading_bytes, content_encoding)
+    fallback = not is_declared(url, content_encoding)
+    if compression == 'zip' and fallback:
+        # Only declared zip archives are unwrapped
+        compression = None
+    if compression == 'zip':
+        # zip needs the whole archive
+        content = leading_bytes + await body.read()
+        body.close()
+        with decompressing_stream(BytesIO(content), compression, open_info, fallback) as f:
+            return _AsyncSyncText(StringIO(_AutoDecoder(read_codec).decode(f.read(), True)), False)
+    return _AsyncHTTPText(body, read_codec, leading_bytes,
+                          IncrementalDecompressor(compression, fallback) if compression else None, open_info)
+
+
+def _is_async_url(url: str) -> bool:
+    """ True if url can be fetched natively -- other schemes and proxied hosts go through hbopen in an executor """
+    parts = urlsplit(url)
+    return parts.scheme.lower() in ('http', 'https') and not ConnectionPool._proxied(parts.scheme, parts.netloc)
+
+
+async def hbopen_async(source: HB_TYPE,
+                       open_info: Optional[FileInfo] = None,
+                       base_path: Optional[str] = None,
+                       accept_header: Optional[str] = None,
+                       is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                       read_codec: str = None,
+                       source_type: Optional[HBType] = None,
+                       retry: Optional[RetryPolicy] = None,
+                       resolver: Optional[RESOLVER] = None) -> AsyncTextIO:
+    """
+    Asynchronous hbopen.  http(s) URLs are fetched without blocking the event loop, file and file handle I/O
+    is run in the default executor.
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param open_info: what we learned about source in the process of converting it
+    :param base_path: Base to use if source is a relative URL or file name
+    :param accept_header: Accept header to use if it turns out to be a URL
+    :param is_actual_data: Function to differentiate plain text from URL or file name
+    :param read_codec: Name of codec to use if bytes being read
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param retry: Timeouts, retries and circuit breaker for URL sources (default: the default pool's)
+    :param resolver: Maps URLs to the file or URL to read instead (default: default_resolver())
+    :return: AsyncTextIO representation of open file
+    """
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    if source_type is HBType.URL and not _map_url(source, base_path, resolver):
+        url = _resolve_url(source, base_path)
+        if _is_async_url(url):
+            url, _, headers, body = await _http_get(url, _url_headers(accept_header),
+                                                    retry if retry is not None else default_pool().retry)
+            if open_info:
+                _set_url_info(open_info, url, headers)
+            return await _http_text(url, headers, body, read_codec, open_info)
+    opener = partial(hbopen, source, open_info, base_path, accept_header=accept_header, is_actual_data=is_actual_data,
+                     read_codec=read_codec, source_type=source_type, retry=retry, resolver=resolver)
+    if source_type in (HBType.URL, HBType.FILENAME, HBType.IO):
+        return _AsyncSyncText(await asyncio.get_running_loop().run_in_executor(None, opener), True)
+    return _AsyncSyncText(opener(), False)
+
+
+async def hbread_async(source: HB_TYPE,
+                       open_info: Optional[FileInfo] = None,
+                       base_path: Optional[str] = None,
+                       accept_header: Optional[str] = None,
+                       is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                       read_codec: str = None,
+                       source_type: Optional[HBType] = None,
+                       retry: Optional[RetryPolicy] = None,
+                       resolver: Optional[RESOLVER] = None) -> str:
+    """
+    Asynchronous hbread
+    :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+    :param open_info: what we learned about source in the process of converting it
+    :param base_path: Base to use if source is a relative URL or file name
+    :param accept_header: Accept header to use if it turns out to be a URL
+    :param is_actual_data: Function to differentiate plain text from URL or file name
+    :param read_codec: decoder to use for non-ascii data
+    :param source_type: Type of source if it is already known (default: detect_type)
+    :param retry: Timeouts, retries and circuit breaker for URL sources (default: the default pool's)
+    :param resolver: Maps URLs to the file or URL to read instead (default: default_resolver())
+    :return: String represented by the source
+    """
+    source_type = source_type or detect_type(source, base_path, is_actual_data)
+    reader = partial(hbread, source, open_info, base_path, accept_header=accept_header, is_actual_data=is_actual_data,
+                     read_codec=read_codec, source_type=source_type, retry=retry, resolver=resolver)
+    if source_type is HBType.URL and _is_async_url(_resolve_url(source, base_path)) and \
+            not _map_url(source, base_path, resolver):
+        async with await hbopen_async(source, open_info, base_path, accept_header=accept_header,
+                                      is_actual_data=is_actual_data, read_codec=read_codec, source_type=source_type,
+                                      retry=retry, resolver=resolver) as f:
+            return await f.read()
+    if source_type in (HBType.URL, HBType.FILENAME, HBType.IO):
+        return await asyncio.get_running_loop().run_in_executor(None, reader)
+    return reader()
+
+
+async def bounded_gather(aws: Iterable[Awaitable], limit: int, return_exceptions: bool = False) -> List:
+    """
+    asyncio.gather with at most limit awaitables running at once
+    :param aws: coroutines or futures
+    :param limit: maximum concurrency
+    :param return_exceptions: return exceptions in the result list rather than raising the first one
+    :return: results in the order of aws
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable) -> Any:
+        async with semaphore:
+            return await aw
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
+async def hbread_many_async(sources: Iterable[HB_TYPE],
+                            base_path: Optional[str] = None,
+                            max_concurrency: int = 100,
+                            **kwargs) -> List[ReadResult]:
+    """
+    Read sources concurrently on the running event loop.
+    :param sources: sources to read
+    :param base_path: Base to use for relative URLs or file names
+    :param max_concurrency: maximum number of reads in flight at any one time
+    :param kwargs: additional hbread_async arguments
+    :return: a ReadResult per source, in order.  Failures are reported in ReadResult.error
+    """
+    async def read_one(source: HB_TYPE) -> ReadResult:
+        info = FileInfo()
+        try:
+            return ReadResult(source, await hbread_async(source, info, base_path, **kwargs), info)
+        except Exception as e:
+            return ReadResult(source, None, info, e)
+    return await bounded_gather([read_one(source) for source in sources], max_concurrency)
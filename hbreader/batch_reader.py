@@ -0,0 +1,109 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed as futures_as_completed
+from typing import Iterable, Iterator, Optional, Callable, Dict, List, Union, Deque, Tuple
+from urllib.parse import urlsplit
+
+from hbreader import HB_TYPE, HBType, FileInfo, ReadResult, detect_type, default_str_tester, hbread, _resolve_url
+
+__all__ = ['hbread_many']
+
+
+def _read_one(source: HB_TYPE, source_type: HBType, base_path: Optional[str], is_actual_data: Callable[[str], bool],
+              kwargs: Dict) -> ReadResult:
+    info = FileInfo()
+    try:
+        return ReadResult(source, hbread(source, info, base_path, is_actual_data=is_actual_data,
+                                         source_type=source_type, **kwargs), info)
+    except Exception as e:
+        return ReadResult(source, None, info, e)
+
+
+class _HostGate:
+    """
+    Reads of one host.  At most limit of them are handed to the executor at a time, the rest wait here in order, so
+    reader threads never sit idle waiting for a slot on a busy host while reads from other hosts are queued
+    """
+    def __init__(self, executor: ThreadPoolExecutor, limit: int) -> None:
+        self.executor = executor
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.running = 0
+        self.waiting: Deque[Tuple[Future, tuple]] = deque()
+
+    def submit(self, *args) -> Future:
+        """ Future for _read_one(*args), started as soon as the host has a free slot """
+        result = Future()
+        with self.lock:
+            if self.running >= self.limit:
+                self.waiting.append((result, args))
+                return result
+            self.running += 1
+        self._start(result, args)
+        return result
+
+    def _start(self, result: Future, args: tuple) -> None:
+        try:
+            future = self.executor.submit(_read_one, *args)
+        except RuntimeError:
+            # The executor has been shut down -- the batch was abandoned
+            with self.lock:
+                self.running -= 1
+                abandoned, self.waiting = [result] + [r for r, _ in self.waiting], deque()
+            for r in abandoned:
+                r.cancel()
+            return
+        future.add_done_callback(lambda f: self._done(result, f))
+
+    def _done(self, result: Future, future: Future) -> None:
+        if future.cancelled():
+            result.cancel()
+        else:
+            result.set_result(future.result())
+        with self.lock:
+            if not self.waiting:
+                self.running -= 1
+                return
+            result, args = self.waiting.popleft()
+        self._start(result, args)
+
+
+def hbread_many(sources: Iterable[HB_TYPE],
+                base_path: Optional[str] = None,
+                max_workers: int = 8,
+                per_host_limit: Optional[int] = None,
+                as_completed: bool = False,
+                is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                **kwargs) -> Iterator[ReadResult]:
+    """
+    Read a batch of sources concurrently.  In-memory sources (strings, bytes, stringables) are answered directly,
+    files and URLs are read on a thread pool.
+    :param sources: sources to read
+    :param base_path: Base to use for relative URLs or file names
+    :param max_workers: number of reader threads
+    :param per_host_limit: maximum number of simultaneous reads from any one URL scheme/host/port (default: no limit)
+    :param as_completed: yield results as they complete rather than in source order
+    :param is_actual_data: Function to differentiate plain text from URL or file name
+    :param kwargs: additional hbread arguments
+    :return: a ReadResult per source.  Failures are reported in ReadResult.error rather than raised
+    """
+    host_gates: Dict[str, _HostGate] = {}
+    results: List[Union[ReadResult, Future]] = []
+    with ThreadPoolExecutor(max_workers) as executor:
+        for source in sources:
+            source_type = detect_type(source, base_path, is_actual_data)
+            if per_host_limit and source_type is HBType.URL:
+                parts = urlsplit(_resolve_url(source, base_path))
+                host = f"{parts.scheme}://{parts.netloc}".lower()
+                if host not in host_gates:
+                    host_gates[host] = _HostGate(executor, per_host_limit)
+                results.append(host_gates[host].submit(source, source_type, base_path, is_actual_data, kwargs))
+            elif source_type in (HBType.URL, HBType.FILENAME, HBType.IO):
+                results.append(executor.submit(_read_one, source, source_type, base_path, is_actual_data, kwargs))
+            else:
+                results.append(_read_one(source, source_type, base_path, is_actual_data, kwargs))
+        if as_completed:
+            yield from (r for r in results if isinstance(r, ReadResult))
+            yield from (f.result() for f in futures_as_completed([r for r in results if isinstance(r, Future)]))
+        else:
+            yield from (r.result() if isinstance(r, Future) else r for r in results)
@@ -0,0 +1,101 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Hashable, Any, NamedTuple
+
+__all__ = ['CachingReader']
+
+
+class CachedText(NamedTuple):
+    validator: Any                  # os.stat (mtime, size) for files, conditional GET headers for URLs
+    text: str
+    info: Tuple                     # FileInfo field values
+    size: int
+
+
+class CachingReader:
+    """
+    Bounded, thread-safe, in-process LRU of decoded file and URL text.  Pass one to hbread as cache=... (or call its
+    read method) and repeat reads of an unchanged source are answered from memory, with the FileInfo of the original
+    read replayed.  Files are revalidated with os.stat (mtime and size), URLs with a conditional GET.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        :param max_bytes: memory budget for the cached strings.  Least recently used entries are evicted first
+        """
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, CachedText]' = OrderedDict()
+        self._size = 0
+
+    def read(self, source, *args, **kwargs) -> str:
+        """ hbread(source, ..., cache=self) """
+        from hbreader import hbread
+        return hbread(source, *args, cache=self, **kwargs)
+
+    @property
+    def size(self) -> int:
+        """ Approximate number of bytes held """
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def peek(self, key: Hashable) -> Optional[CachedText]:
+        """ Return the entry for key without validating it """
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key: Hashable, validator: Any) -> Optional[CachedText]:
+        """
+        Return the entry for key if it was stored with validator.  A stale entry is discarded.
+        :param key: resolved source key
+        :param validator: current validator for the source
+        :return: entry or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.validator != validator:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def hit(self, key: Hashable) -> None:
+        """ Record a hit on an entry that was validated externally (e.g. by a 304) """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+    def miss(self) -> None:
+        """ Record a miss on an entry that was validated externally """
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: Hashable, validator: Any, text: str, info: Tuple) -> None:
+        """ Add or replace the entry for key, evicting as needed to stay within the memory budget """
+        size = sys.getsizeof(text)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = CachedText(validator, text, info, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
@@ -0,0 +1,218 @@
+import io
+import os
+import zlib
+from importlib import import_module
+from typing import Optional, IO, Callable, Dict, List, Any
+
+__all__ = ['detect_compression', 'is_declared', 'decompressing_stream', 'IncrementalDecompressor']
+
+# Leading bytes that identify a compressed stream
+MAGIC_LEN = 6
+MAGIC_NUMBERS = ((b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'), (b'PK\x03\x04', 'zip'))
+
+EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.bz2': 'bzip2', '.xz': 'xz', '.lzma': 'xz', '.zip': 'zip'}
+
+CONTENT_ENCODINGS = {'gzip': 'gzip', 'x-gzip': 'gzip', 'deflate': 'deflate', 'bzip2': 'bzip2', 'xz': 'xz'}
+
+# Factories for incremental decompressors.  Every one of them has decompress(), eof and unused_data.  bz2 and lzma
+# are only imported when they are needed
+DECOMPRESSORS: Dict[str, Callable[[], Any]] = {
+    'gzip': lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    'deflate': lambda: zlib.decompressobj(32 + zlib.MAX_WBITS),      # zlib or gzip header, whichever is there
+    'bzip2': lambda: import_module('bz2').BZ2Decompressor(),
+    'xz': lambda: import_module('lzma').LZMADecompressor()
+}
+
+
+def detect_compression(name: Optional[str] = None, leading_bytes: bytes = b'',
+                       content_encoding: Optional[str] = None) -> Optional[str]:
+    """
+    Determine how a source is compressed
+    :param name: file name or URL -- checked for a compressed file extension
+    :param leading_bytes: first few bytes of the source -- checked for a magic number
+    :param content_encoding: HTTP Content-Encoding header
+    :return: 'gzip', 'deflate', 'bzip2', 'xz', 'zip' or None if not compressed
+    """
+    if content_encoding:
+        encoding = CONTENT_ENCODINGS.get(content_encoding.strip().lower())
+        if encoding:
+            return encoding
+    for magic, compression in MAGIC_NUMBERS:
+        if leading_bytes.startswith(magic):
+            return compression
+    if leading_bytes[:3] == b'BZh' and leading_bytes[3:4].isdigit():
+        return 'bzip2'
+    if name and not leading_bytes:
+        return _extension_compression(name)
+    return None
+
+
+def _extension_compression(name: str) -> Optional[str]:
+    return EXTENSIONS.get(os.path.splitext(name.split('?', 1)[0])[1].lower())
+
+
+def is_declared(name: Optional[str] = None, content_encoding: Optional[str] = None) -> bool:
+    """
+    Determine whether a source says it is compressed, by its extension or Content-Encoding.  Compression detected
+    in sources that don't rests on the magic number alone, and may be a coincidence
+    """
+    return bool((content_encoding and CONTENT_ENCODINGS.get(content_encoding.strip().lower())) or
+                (name and _extension_compression(name)))
+
+
+class IncrementalDecompressor:
+    """ Piecewise decompressor.  Concatenated members (e.g. cat a.gz b.gz) are decompressed one after the other """
+    def __init__(self, compression: str, fallback: bool = False) -> None:
+        """
+        :param compression: key in DECOMPRESSORS
+        :param fallback: if the input turns out not to be compressed after all, pass it through as is.  compression
+        is set to None when that happens
+        """
+        self.compression = compression
+        self._new_decompressor = DECOMPRESSORS[compression]
+        self._decompressor = self._new_decompressor()
+        # Input held back until the decompressor has produced something, in case we have to fall back to it
+        self._held: Optional[List[bytes]] = [] if fallback else None
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._decompressor is None:
+            return data
+        if self._held is None:
+            return self._decompress(data)
+        self._held.append(data)
+        try:
+            rval = self._decompress(data)
+        except Exception:
+            return self._fall_back()
+        if rval:
+            self._held = None
+        return rval
+
+    def flush(self) -> bytes:
+        """ Return what is left once the input is exhausted """
+        if self._decompressor is None:
+            return b''
+        try:
+            if self._held is not None and not self._decompressor.eof:
+                raise EOFError("Compressed data ended before the end-of-stream marker")
+            return self._decompressor.flush() if hasattr(self._decompressor, 'flush') else b''
+        except Exception:
+            if self._held is None:
+                raise
+            return self._fall_back()
+
+    def _decompress(self, data: bytes) -> bytes:
+        parts = [self._decompressor.decompress(data)]
+        while self._decompressor.eof and self._decompressor.unused_data:
+            unused = self._decompressor.unused_data
+            self._decompressor = self._new_decompressor()
+            parts.append(self._decompressor.decompress(unused))
+        return b''.join(parts)
+
+    def _fall_back(self) -> bytes:
+        # The magic number was a coincidence -- this is plain data
+        data = b''.join(self._held)
+        self._held = self._decompressor = self.compression = None
+        return data
+
+
+class _DecompressingReader(io.RawIOBase):
+    """ Raw stream of the decompressed content of fp.  Compressed and uncompressed byte counts are kept as we go """
+    def __init__(self, fp: IO, compression: Optional[str], open_info: Optional[Any] = None,
+                 closers: Optional[List[IO]] = None, fallback: bool = False) -> None:
+        """
+        :param fp: compressed input
+        :param compression: key in DECOMPRESSORS.  None means that fp is already decompressed
+        :param open_info: FileInfo to record the uncompressed size in once the end is reached
+        :param closers: additional streams to close along with fp
+        :param fallback: if fp turns out not to be compressed after all, return its bytes as they are
+        """
+        super().__init__()
+        self._fp = fp
+        self._decompressor = IncrementalDecompressor(compression, fallback) if compression else None
+        self._open_info = open_info
+        self._closers = [fp] + (closers or [])
+        self._buf = b''
+        self._eof = False
+        self.name = getattr(closers[-1] if closers else fp, 'name', None)
+        self.compressed_size = self.uncompressed_size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf and not self._eof:
+            self._fill()
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def _fill(self) -> None:
+        data = self._fp.read(io.DEFAULT_BUFFER_SIZE * 8)
+        self.compressed_size += len(data)
+        self._eof = not data
+        if self._decompressor is None:
+            self._buf = data
+        else:
+            self._buf = self._decompressor.decompress(data) if data else self._decompressor.flush()
+            if self._decompressor.compression is None:
+                self._decompressor = None
+                if self._open_info is not None:
+                    self._open_info.compression = None
+                    self._open_info = None
+        self.uncompressed_size += len(self._buf)
+        if self._eof and self._open_info is not None:
+            self._open_info.uncompressed_size = self.uncompressed_size
+
+    def fileno(self) -> int:
+        return self._closers[-1].fileno()
+
+    def close(self) -> None:
+        if not self.closed:
+            for closer in self._closers:
+                closer.close()
+        super().close()
+
+
+def decompressing_stream(fp: IO, compression: str, open_info: Optional[Any] = None,
+                         fallback: bool = False) -> io.BufferedReader:
+    """
+    Wrap binary stream fp so that reads return decompressed content.  Closing the returned stream closes fp.
+    :param fp: compressed binary stream
+    :param compression: compression type -- see detect_compression
+    :param open_info: FileInfo to record the compression and uncompressed size in
+    :param fallback: compression was detected by magic number alone (see is_declared).  If fp turns out not to be
+    compressed after all, read it as is.  Zip archives are only unwrapped when they are declared -- docx, jar, epub
+    and friends are zip files too
+    :return: buffered binary stream
+    """
+    if compression == 'zip' and fallback:
+        return io.BufferedReader(_DecompressingReader(fp, None))
+    if open_info is not None:
+        open_info.compression = compression
+    if compression == 'zip':
+        import zipfile
+        # zip needs random access to the central directory at the end of the archive
+        seekable = getattr(fp, 'seekable', None)
+        source = fp if seekable and seekable() else io.BytesIO(fp.read())
+        start = source.tell()
+        try:
+            archive = zipfile.ZipFile(source)
+        except zipfile.BadZipFile:
+            if not fallback:
+                raise
+            source.seek(start)
+            if open_info is not None:
+                open_info.compression = None
+            return io.BufferedReader(_DecompressingReader(source, None, None, [fp] if source is not fp else None))
+        members = [m for m in archive.infolist() if not m.is_dir()]
+        if len(members) != 1:
+            archive.close()
+            fp.close()
+            raise ValueError(f"{getattr(fp, 'name', 'zip archive')}: expected exactly one member, "
+                             f"found {len(members)}")
+        raw = _DecompressingReader(archive.open(members[0]), None, open_info, [archive, fp])
+    else:
+        raw = _DecompressingReader(fp, compression, open_info, fallback=fallback)
+    return io.BufferedReader(raw)
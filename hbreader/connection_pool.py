@@ -0,0 +1,336 @@
+import http.client
+import socket
+import ssl
+import threading
+import time
+from io import BytesIO
+from typing import Optional, Dict, Tuple, List, Mapping, Callable
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit, urljoin
+from urllib.request import Request, urlopen, getproxies, proxy_bypass
+
+from hbreader.retry import RetryPolicy, RETRY_ERRORS
+
+__all__ = ['ConnectionPool', 'PooledResponse', 'default_pool', 'set_default_pool']
+
+# (scheme, host, port) -- the unit of connection reuse
+POOL_KEY = Tuple[str, str, int]
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+
+# Errors that indicate that a kept-alive connection was dropped by the server while it sat in the pool
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                           BrokenPipeError, ConnectionAbortedError)
+
+
+class PooledResponse:
+    """
+    Binary file-like wrapper around an http.client.HTTPResponse.  Closing it hands the underlying connection back
+    to the pool it came from if the body was completely consumed, otherwise the connection is discarded.
+    """
+    mode = 'rb'
+
+    def __init__(self, pool: 'ConnectionPool', key: POOL_KEY, conn: http.client.HTTPConnection,
+                 response: http.client.HTTPResponse, url: str) -> None:
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = self.name = url
+        self.headers = response.headers
+        self.status = self.code = response.status
+        self.reason = response.reason
+
+    def read(self, n: Optional[int] = None) -> bytes:
+        return self._response.read() if n is None or n < 0 else self._response.read(n)
+
+    def read1(self, n: int = -1) -> bytes:
+        return self._response.read1(n)
+
+    def readinto(self, b) -> int:
+        return self._response.readinto(b)
+
+    def readline(self, limit: int = -1) -> bytes:
+        return self._response.readline(limit)
+
+    def peek(self, n: int = 1) -> bytes:
+        return self._response.peek(n)
+
+    def readable(self) -> bool:
+        return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        line = self._response.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def geturl(self) -> str:
+        return self.url
+
+    def getcode(self) -> int:
+        return self.status
+
+    def info(self) -> http.client.HTTPMessage:
+        return self.headers
+
+    @property
+    def closed(self) -> bool:
+        return self._conn is None
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        # http.client marks the response closed once the entire body has been read.
+        reusable = self._response.isclosed() and not self._response.will_close
+        self._response.close()
+        self._pool._release(self._key, conn, reusable)
+
+    def __enter__(self) -> 'PooledResponse':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive HTTP(S) connections keyed by scheme, host and port.
+
+    At most max_per_host idle connections are kept for any one key.  A request never waits for a connection: when
+    none is idle a new one is opened, and connections released beyond the limit are closed rather than kept, so a
+    caller can hold any number of responses from one host open at once.  Connections that have sat idle longer
+    than idle_timeout seconds are closed rather than reused.
+    Schemes other than http/https, and hosts that have to go through a proxy, are passed through to urllib.
+    Timeouts, retries and circuit breaking are governed by a RetryPolicy, which can be replaced on any one request.
+    """
+    def __init__(self,
+                 max_per_host: int = 4,
+                 idle_timeout: Optional[float] = 30.0,
+                 ssl_context: Optional[ssl.SSLContext] = None,
+                 timeout: Optional[float] = None,
+                 retry: Optional[RetryPolicy] = None) -> None:
+        """
+        :param max_per_host: maximum number of idle connections kept for reuse per scheme/host/port
+        :param idle_timeout: seconds an unused connection is kept alive.  None means forever
+        :param ssl_context: context for https connections (default: unverified -- HB don't care)
+        :param timeout: connect and read timeout in seconds, if retry isn't supplied
+        :param retry: timeouts, retries and circuit breaker for requests (default: timeout, no retries)
+        """
+        if max_per_host < 1:
+            raise ValueError("max_per_host must be at least 1")
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.ssl_context = ssl_context if ssl_context is not None else ssl._create_unverified_context()
+        self.timeout = timeout
+        self.retry = retry if retry is not None else RetryPolicy(retries=0, connect_timeout=timeout,
+                                                                  read_timeout=timeout)
+        self._lock = threading.Lock()
+        self._idle: Dict[POOL_KEY, List[Tuple[http.client.HTTPConnection, float]]] = {}
+
+    def urlopen(self, url: str, headers: Optional[Mapping[str, str]] = None,
+                on_connect: Optional[Callable[[], None]] = None,
+                retry: Optional[RetryPolicy] = None) -> PooledResponse:
+        """
+        GET url, following redirects.  Behaves like urllib.request.urlopen: HTTP errors raise HTTPError and
+        connection failures raise URLError.  Non-error, non-redirect statuses (e.g. 304) are returned as is.
+        :param url: absolute, quoted URL
+        :param headers: additional request headers
+        :param on_connect: called once a connection to the server is available, before the request is sent
+        :param retry: timeouts, retries and circuit breaker for this request (default: self.retry)
+        :return: open binary response
+        """
+        policy = retry if retry is not None else self.retry
+        breaker = policy.breaker
+        host = self._key(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            if breaker:
+                breaker.before(host)
+            try:
+                response = self._urlopen(url, headers, on_connect, policy)
+            except URLError as e:
+                if breaker:
+                    (breaker.failure if policy.is_failure(e) else breaker.success)(host)
+                delay = policy.retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            else:
+                if breaker:
+                    breaker.success(host)
+                return response
+            time.sleep(delay)
+
+    def _urlopen(self, url: str, headers: Optional[Mapping[str, str]], on_connect: Optional[Callable[[], None]],
+                 policy: RetryPolicy) -> PooledResponse:
+        """ A single attempt at urlopen """
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme.lower() not in ('http', 'https') or self._proxied(parts.scheme, parts.netloc):
+                # urllib has a single timeout for everything
+                timeouts = [t for t in (policy.connect_timeout, policy.read_timeout) if t is not None]
+                try:
+                    return urlopen(Request(url, headers=headers), context=self.ssl_context,
+                                   **({'timeout': max(timeouts)} if timeouts else {}))
+                except RETRY_ERRORS as e:
+                    raise URLError(e)
+            response = self._get(url, headers, on_connect, policy)
+            location = response.headers.get('Location')
+            if response.status in REDIRECT_CODES and location:
+                response.read()
+                response.close()
+                url = urljoin(url, location)
+                continue
+            if response.status >= 400:
+                body = response.read()
+                response.close()
+                raise HTTPError(url, response.status, response.reason, response.headers, BytesIO(body))
+            return response
+        raise HTTPError(url, response.status, "Too many redirects", response.headers, None)
+
+    def close(self) -> None:
+        """ Close all idle connections.  Connections currently in use are closed when they are released. """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
+
+    def __enter__(self) -> 'ConnectionPool':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def idle_count(self, key: Optional[POOL_KEY] = None) -> int:
+        """ Number of idle connections for key, or across all keys if key is None """
+        with self._lock:
+            return len(self._idle.get(key, [])) if key else sum(len(v) for v in self._idle.values())
+
+    @staticmethod
+    def _proxied(scheme: str, netloc: str) -> bool:
+        return scheme.lower() in getproxies() and not proxy_bypass(netloc)
+
+    @staticmethod
+    def _key(url: str) -> POOL_KEY:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        return scheme, parts.hostname or '', parts.port or (443 if scheme == 'https' else 80)
+
+    def _get(self, url: str, headers: Dict[str, str], on_connect: Optional[Callable[[], None]],
+             policy: RetryPolicy) -> PooledResponse:
+        key = self._key(url)
+        parts = urlsplit(url)
+        target = (parts.path or '/') + (('?' + parts.query) if parts.query else '')
+        conn, reused = self._acquire(key)
+        try:
+            self._connect(conn, policy, reused)
+            if on_connect:
+                on_connect()
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # The server timed out the kept-alive connection -- one retry on a fresh one
+                conn.close()
+                conn = self._new_connection(key)
+                self._connect(conn, policy, False)
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._release(key, conn, False)
+            raise URLError(e)
+        except BaseException:
+            # e.g. an exception out of on_connect -- the connection still has to go back
+            conn.close()
+            self._release(key, conn, False)
+            raise
+        return PooledResponse(self, key, conn, response, url)
+
+    def _acquire(self, key: POOL_KEY) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            self._evict_idle()
+            idle = self._idle.get(key)
+            if idle:
+                conn, _ = idle.pop()
+                return conn, True
+        return self._new_connection(key), False
+
+    def _release(self, key: POOL_KEY, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            reusable = reusable and len(idle) < self.max_per_host
+            if reusable:
+                idle.append((conn, time.monotonic()))
+        if not reusable:
+            conn.close()
+
+    def _evict_idle(self) -> None:
+        # Must be called with self._lock held
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        for key, conns in list(self._idle.items()):
+            keep = [(c, t) for c, t in conns if t > cutoff]
+            for c, t in conns:
+                if t <= cutoff:
+                    c.close()
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    def _new_connection(self, key: POOL_KEY) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, context=self.ssl_context)
+        return http.client.HTTPConnection(host, port)
+
+    @staticmethod
+    def _connect(conn: http.client.HTTPConnection, policy: RetryPolicy, reused: bool) -> None:
+        """ Connect conn (unless it is a reused one) within the connect timeout, then apply the read timeout """
+        if not reused:
+            conn.timeout = policy.connect_timeout if policy.connect_timeout is not None else \
+                socket.getdefaulttimeout()
+            conn.connect()
+        if conn.sock is not None:
+            conn.sock.settimeout(policy.read_timeout if policy.read_timeout is not None else
+                                 socket.getdefaulttimeout())
+
+
+_default_pool: Optional[ConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def default_pool() -> ConnectionPool:
+    """ Return the pool that hbopen and hbread use when no pool is supplied, creating it on first use """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+def set_default_pool(pool: Optional[ConnectionPool]) -> None:
+    """
+    Replace the default pool, closing the previous one.
+    :param pool: new default pool.  None means create a default-sized pool on next use
+    """
+    global _default_pool
+    with _default_pool_lock:
+        old, _default_pool = _default_pool, pool
+    if old is not None and old is not pool:
+        old.close()
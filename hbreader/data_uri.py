@@ -0,0 +1,34 @@
+import re
+from typing import Optional, Tuple
+from urllib.parse import unquote_to_bytes
+
+__all__ = ['is_data_uri', 'decode_data_uri']
+
+# RFC 2397: data:[<mediatype>][;base64],<data>.  Only the part up to the comma is matched, so a test is cheap however
+# much data follows
+_TOKEN = r"[\w!#$&^.+-]+"
+DATA_URI_RE = re.compile(rf"data:(?P<type>{_TOKEN}/{_TOKEN})?(?P<params>(?:;{_TOKEN}=[^;,\s]*)*)(?P<base64>;base64)?,",
+                         re.IGNORECASE)
+_CHARSET_RE = re.compile(r";charset=([^;,\s]*)", re.IGNORECASE)
+
+
+def is_data_uri(s: str) -> bool:
+    """ Determine whether s is a data: URI.  Strings with line breaks are taken to be text that starts with 'data:' """
+    return s[:5].lower() == 'data:' and DATA_URI_RE.match(s) is not None and '\n' not in s and '\r' not in s
+
+
+def decode_data_uri(uri: str) -> Tuple[bytes, Optional[str]]:
+    """
+    Decode a data: URI in memory
+    :param uri: data URI (see is_data_uri)
+    :return: content and its charset, if the URI names one
+    """
+    m = DATA_URI_RE.match(uri)
+    if not m:
+        raise ValueError(f"Not a data URI: {uri[:40]}")
+    data = unquote_to_bytes(uri[m.end():])
+    if m.group('base64'):
+        import base64
+        data = base64.b64decode(data + b'=' * (-len(data) % 4))
+    charset = _CHARSET_RE.search(m.group('params'))
+    return data, charset.group(1).strip('"') if charset else None
@@ -0,0 +1,100 @@
+import io
+from typing import Union, Iterable, Dict, Any, IO
+
+__all__ = ['DIGEST', 'hashing_stream', 'hashing_text', 'record_digests']
+
+# A hashlib algorithm name, e.g. 'sha256', or several of them
+DIGEST = Union[str, Iterable[str]]
+
+
+def digest_names(digest: DIGEST) -> tuple:
+    return (digest, ) if isinstance(digest, str) else tuple(digest)
+
+
+def _hashers(digest: DIGEST) -> Dict[str, Any]:
+    # hashlib (and OpenSSL with it) is only loaded when a digest is asked for
+    import hashlib
+    return {name: hashlib.new(name) for name in digest_names(digest)}
+
+
+def _record(open_info: Any, hashers: Dict[str, Any], nbytes: int) -> None:
+    open_info.digests = {name: h.hexdigest() for name, h in hashers.items()}
+    open_info.bytes_read = nbytes
+
+
+class _HashingRaw(io.RawIOBase):
+    """ Raw stream over binary stream fp that hashes what passes through.  The digests are recorded at the end """
+    def __init__(self, fp: IO, digest: DIGEST, open_info: Any) -> None:
+        super().__init__()
+        self._fp = fp
+        self._hashers = _hashers(digest)
+        self._updates = [h.update for h in self._hashers.values()]
+        self._open_info = open_info
+        self._nbytes = 0
+        self._done = False
+        self.name = getattr(fp, 'name', None)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        readinto = getattr(self._fp, 'readinto', None)
+        if readinto:
+            n = readinto(b)
+        else:
+            data = self._fp.read(len(b))
+            n = len(data)
+            b[:n] = data
+        if n:
+            view = memoryview(b)[:n]
+            for update in self._updates:
+                update(view)
+            self._nbytes += n
+        elif not self._done:
+            self._done = True
+            _record(self._open_info, self._hashers, self._nbytes)
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fp.close()
+        super().close()
+
+
+def hashing_stream(fp: IO, digest: DIGEST, open_info: Any) -> io.BufferedReader:
+    """
+    Wrap binary stream fp so that the bytes read from it are hashed.  When the end is reached, open_info.digests is
+    set to an algorithm name to hex digest map and open_info.bytes_read to the number of bytes.  Closing the returned
+    stream closes fp.
+    """
+    return io.BufferedReader(_HashingRaw(fp, digest, open_info))
+
+
+def hashing_text(fp: IO, digest: DIGEST, open_info: Any) -> IO:
+    """ hashing_stream for text stream fp.  The text is hashed in the encoding of fp (default: utf-8) """
+    hashers = _hashers(digest)
+    encoding = getattr(fp, 'encoding', None) or 'utf-8'
+    native_read = fp.read
+    nbytes = 0
+
+    def read(*args) -> str:
+        nonlocal nbytes
+        text = native_read(*args)
+        data = text.encode(encoding)
+        for h in hashers.values():
+            h.update(data)
+        nbytes += len(data)
+        if not text or not args or args[0] is None or args[0] < 0:
+            _record(open_info, hashers, nbytes)
+            fp.read = native_read
+        return text
+    fp.read = read
+    return fp
+
+
+def record_digests(open_info: Any, data: bytes, digest: DIGEST) -> None:
+    """ Record the digests and size of data, which is in memory already """
+    hashers = _hashers(digest)
+    for h in hashers.values():
+        h.update(data)
+    _record(open_info, hashers, len(data))
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from http.client import HTTPMessage
+from typing import Optional, List, Tuple, Dict, IO, Mapping
+
+__all__ = ['HTTPCache', 'CacheEntry']
+
+# Response headers that are persisted with a cached body
+STORED_HEADERS = ('Content-Type', 'Content-Length', 'Content-Encoding', 'Last-Modified', 'Date', 'ETag',
+                  'Cache-Control', 'Age', 'Expires')
+
+ENTRY_SUFFIX = '.entry'
+BODY_SUFFIX = '.body'
+
+MAX_AGE_RE = re.compile(r'(?:^|[,\s])max-age\s*=\s*"?(\d+)"?', re.IGNORECASE)
+
+
+def _headers_message(headers: List[Tuple[str, str]]) -> HTTPMessage:
+    msg = HTTPMessage()
+    for k, v in headers:
+        msg[k] = v
+    return msg
+
+
+def validators(headers: Mapping[str, str]) -> Dict[str, str]:
+    """ Conditional request headers for revalidating a response with headers """
+    rval = {}
+    if headers.get('ETag'):
+        rval['If-None-Match'] = headers['ETag']
+    if headers.get('Last-Modified'):
+        rval['If-Modified-Since'] = headers['Last-Modified']
+    return rval
+
+
+class CacheEntry:
+    """
+    A cached response.  On disk an entry is two files: <key>.entry holds the JSON metadata and names the body file,
+    <key>.<unique>.body holds the raw body.  Body files are never rewritten -- a new body is a new file -- so
+    replacing the metadata file switches an entry over atomically, and a 304 rewrites the metadata alone.
+    """
+    def __init__(self, key: str, path: str, url: str, headers: List[Tuple[str, str]], stored_at: float) -> None:
+        self.key = key
+        self.path = path                # Body file
+        self.url = url
+        self.headers = _headers_message(headers)
+        self.stored_at = stored_at
+
+    @property
+    def cache_control(self) -> str:
+        return (self.headers.get('Cache-Control') or '').lower()
+
+    @property
+    def max_age(self) -> Optional[int]:
+        """ Seconds the entry may be served without revalidation, or None if it must always be revalidated """
+        if 'no-cache' in self.cache_control:
+            return None
+        m = MAX_AGE_RE.search(self.cache_control)
+        if not m:
+            return None
+        age = self.headers.get('Age')
+        return int(m.group(1)) - (int(age) if age and age.isdigit() else 0)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        max_age = self.max_age
+        return max_age is not None and (now if now is not None else time.time()) < self.stored_at + max_age
+
+    def validators(self) -> Dict[str, str]:
+        """ Conditional request headers for revalidating this entry """
+        return validators(self.headers)
+
+
+class CachedResponse:
+    """ Binary file-like view of a cache entry body that looks enough like an HTTP response for hbopen """
+    mode = 'rb'
+    status = code = 200
+
+    def __init__(self, entry: CacheEntry) -> None:
+        self.url = self.name = entry.url
+        self.headers = entry.headers
+        self._fp = open(entry.path, 'rb')
+
+    def read(self, n: Optional[int] = None) -> bytes:
+        return self._fp.read(-1 if n is None else n)
+
+    def readline(self, limit: int = -1) -> bytes:
+        return self._fp.readline(limit)
+
+    def peek(self, n: int = 1) -> bytes:
+        return self._fp.peek(n)
+
+    def readable(self) -> bool:
+        return True
+
+    def __iter__(self):
+        return iter(self._fp)
+
+    def geturl(self) -> str:
+        return self.url
+
+    def info(self) -> HTTPMessage:
+        return self.headers
+
+    @property
+    def closed(self) -> bool:
+        return self._fp.closed
+
+    def close(self) -> None:
+        self._fp.close()
+
+    def __enter__(self) -> 'CachedResponse':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class _CachingResponse:
+    """ Pass-through wrapper that copies the body into the cache as it is read, committing it on a complete read """
+    mode = 'rb'
+
+    def __init__(self, cache: 'HTTPCache', key: str, response, url: str) -> None:
+        self._cache = cache
+        self._key = key
+        self._response = response
+        self.url = self.name = url
+        self.headers = response.headers
+        self.status = self.code = response.status
+        fd, self._tmpname = tempfile.mkstemp(dir=cache.directory, prefix=key + '.', suffix='.tmp')
+        self._tmp = os.fdopen(fd, 'wb')
+        self._meta = dict(url=url, headers=[(k, v) for k, v in response.headers.items() if k in STORED_HEADERS],
+                          stored_at=time.time())
+        self._eof = False
+
+    def _tee(self, data: bytes, eof: bool) -> bytes:
+        if self._tmp:
+            self._tmp.write(data)
+        self._eof = self._eof or eof or not data
+        return data
+
+    def read(self, n: Optional[int] = None) -> bytes:
+        if n is None or n < 0:
+            return self._tee(self._response.read(), True)
+        return self._tee(self._response.read(n), False) if n else b''
+
+    def readline(self, limit: int = -1) -> bytes:
+        return self._tee(self._response.readline(limit), False) if limit else b''
+
+    def peek(self, n: int = 1) -> bytes:
+        peek = getattr(self._response, 'peek', None)
+        return peek(n) if callable(peek) else b''
+
+    def readable(self) -> bool:
+        return True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def geturl(self) -> str:
+        return self.url
+
+    def info(self) -> HTTPMessage:
+        return self.headers
+
+    @property
+    def closed(self) -> bool:
+        return self._tmp is None
+
+    def close(self) -> None:
+        if self._tmp is None:
+            return
+        tmp, self._tmp = self._tmp, None
+        tmp.close()
+        self._response.close()
+        if self._eof:
+            self._cache._commit(self._key, self._meta, self._tmpname)
+        else:
+            os.remove(self._tmpname)
+
+    def __enter__(self) -> '_CachingResponse':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class HTTPCache:
+    """
+    Opt-in on-disk cache of URL bodies.  Entries carry their validators (ETag / Last-Modified) so that stale
+    entries are revalidated with a conditional GET, and a 304 is served from disk.  Entries that are within their
+    Cache-Control max-age are served without going to the network at all.  The total size of the cache is capped,
+    with least recently used entries evicted first.
+    """
+    def __init__(self, directory: str, max_size: int = 256 * 1024 * 1024) -> None:
+        """
+        :param directory: directory to keep the cache in.  Created if necessary
+        :param max_size: maximum number of bytes the cache may occupy
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._index: 'OrderedDict[str, int]' = OrderedDict()          # key -> size, least recently used first
+        entries, bodies = [], set()
+        for fname in os.listdir(self.directory):
+            if fname.endswith(ENTRY_SUFFIX):
+                key = fname[:-len(ENTRY_SUFFIX)]
+                meta = self._read_meta(key)
+                try:
+                    st = os.stat(self._path(key))
+                    size = st.st_size + os.path.getsize(os.path.join(self.directory, meta['body']))
+                except (OSError, KeyError, TypeError):
+                    continue
+                bodies.add(meta['body'])
+                entries.append((st.st_mtime, key, size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+        # Bodies that were replaced while a reader still had them open
+        for fname in os.listdir(self.directory):
+            if fname.endswith(BODY_SUFFIX) and fname not in bodies:
+                self._remove_file(fname)
+
+    @staticmethod
+    def key(url: str, accept_header: Optional[str] = None) -> str:
+        """ Cache key -- the accept header is included because it can change what a URL returns """
+        return hashlib.sha256(f"{url}\n{accept_header or ''}".encode()).hexdigest()
+
+    @property
+    def size(self) -> int:
+        """ Number of bytes currently in the cache """
+        with self._lock:
+            return sum(self._index.values())
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def _read_meta(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: Dict) -> int:
+        """ Atomically replace the metadata of key, returning its size """
+        data = json.dumps(meta).encode()
+        fd, tmpname = tempfile.mkstemp(dir=self.directory, prefix=key + '.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmpname, self._path(key))
+        return len(data)
+
+    def _remove_file(self, fname: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, fname))
+        except OSError:
+            # Already gone, or (on Windows) still open.  Stray bodies are cleaned up when the cache is next opened
+            pass
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """ Return the entry for key, if any, and mark it as most recently used """
+        with self._lock:
+            if key not in self._index:
+                return None
+            meta = self._read_meta(key)
+            if meta is None:
+                self._index.pop(key, None)
+                return None
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+            self._index.move_to_end(key)
+        return CacheEntry(key, os.path.join(self.directory, meta['body']), meta['url'], meta['headers'],
+                          meta['stored_at'])
+
+    def open(self, entry: CacheEntry) -> CachedResponse:
+        """ Open the body of entry """
+        try:
+            return CachedResponse(entry)
+        except FileNotFoundError:
+            # The entry was replaced after it was looked up
+            current = self.lookup(entry.key)
+            if current is None or current.path == entry.path:
+                raise
+            return CachedResponse(current)
+
+    def revalidated(self, key: str, entry: CacheEntry, headers: Mapping[str, str]) -> CacheEntry:
+        """
+        Record a 304 response for entry -- merge in the refreshed headers and restart the freshness clock.  Only the
+        metadata is rewritten
+        :param key: cache key of entry
+        :param entry: entry that was revalidated
+        :param headers: headers of the 304 response
+        :return: updated entry
+        """
+        merged = {k: v for k, v in entry.headers.items()}
+        merged.update({k: v for k, v in headers.items() if k in STORED_HEADERS and k != 'Content-Length'})
+        with self._lock:
+            meta = self._read_meta(key)
+            if meta is None or os.path.join(self.directory, meta['body']) != entry.path:
+                # Replaced or evicted in the meantime -- the 304 was for a body we no longer have
+                return self.lookup(key) or entry
+            meta.update(headers=list(merged.items()), stored_at=time.time())
+            meta_size = self._write_meta(key, meta)
+            if key in self._index:
+                self._index[key] = meta_size + os.path.getsize(entry.path)
+        return self.lookup(key) or entry
+
+    def store(self, key: str, response) -> IO:
+        """
+        Wrap response so that its body is written to the cache as it is read.  Responses that can't usefully be
+        cached (no-store, or neither a max-age nor a validator) are returned unwrapped.
+        :param key: cache key
+        :param response: open 200 response
+        :return: response to read from
+        """
+        cache_control = (response.headers.get('Cache-Control') or '').lower()
+        if 'no-store' in cache_control or not (MAX_AGE_RE.search(cache_control) or
+                                               response.headers.get('ETag') or
+                                               response.headers.get('Last-Modified')):
+            return response
+        return _CachingResponse(self, key, response, response.url)
+
+    def clear(self) -> None:
+        """ Remove every entry """
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        self._index.pop(key, None)
+        meta = self._read_meta(key)
+        self._remove_file(key + ENTRY_SUFFIX)
+        if meta:
+            self._remove_file(meta['body'])
+
+    def _commit(self, key: str, meta: Dict, tmpname: str) -> None:
+        """ Make the body in tmpname, described by meta, the entry for key """
+        body = tmpname[:-len('.tmp')] + BODY_SUFFIX
+        with self._lock:
+            old = self._read_meta(key)
+            os.replace(tmpname, body)
+            size = os.path.getsize(body) + self._write_meta(key, dict(meta, body=os.path.basename(body)))
+            if old and old.get('body') != os.path.basename(body):
+                self._remove_file(old['body'])
+            self._index[key] = size
+            self._index.move_to_end(key)
+            total = sum(self._index.values())
+            while total > self.max_size and self._index:
+                old_key, old_size = next(iter(self._index.items()))
+                self._remove(old_key)
+                total -= old_size
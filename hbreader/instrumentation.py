@@ -0,0 +1,254 @@
+import bisect
+import io
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Callable, List, NamedTuple, Dict, Any, IO, Iterator
+from urllib.parse import urlsplit
+
+__all__ = ['ReadEvent', 'add_hook', 'remove_hook', 'instrumented', 'LatencyCollector', 'EVENTS']
+
+# Events in the order they occur.  'connected' and 'headers' only apply to URLs and files, 'error' replaces the rest
+EVENTS = ('start', 'resolved', 'connected', 'headers', 'first_byte', 'done', 'error')
+
+# FileInfo fields recorded by a ReadTimer, keyed by the event that sets them
+TIMING_FIELDS = {'connected': 'connect_time', 'headers': 'headers_time', 'first_byte': 'first_byte_time',
+                 'done': 'total_time', 'error': 'total_time'}
+
+
+class ReadEvent(NamedTuple):
+    """ What a hook is told """
+    event: str                                  # One of EVENTS
+    source_type: str                            # HBType value -- 'url', 'filename' or 'filehandle'
+    location: Optional[str]                     # Resolved URL or file name, once known
+    elapsed: float                              # Seconds since 'start'
+    nbytes: int                                 # Bytes delivered so far
+    error: Optional[BaseException] = None
+
+
+_hooks: List[Callable[[ReadEvent], None]] = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: Callable[[ReadEvent], None]) -> None:
+    """
+    Register hook to be called with a ReadEvent at each step of every file, URL and file handle read.  Reads are
+    only instrumented while at least one hook is registered.
+    """
+    global _hooks
+    with _hooks_lock:
+        # Copy on write, so that readers never need the lock
+        _hooks = _hooks + [hook]
+
+
+def remove_hook(hook: Callable[[ReadEvent], None]) -> None:
+    """ Unregister hook """
+    global _hooks
+    with _hooks_lock:
+        _hooks = [h for h in _hooks if h != hook]
+
+
+@contextmanager
+def instrumented(hook: Callable[[ReadEvent], None]) -> Iterator[Callable[[ReadEvent], None]]:
+    """ Register hook for the duration of a with block """
+    add_hook(hook)
+    try:
+        yield hook
+    finally:
+        remove_hook(hook)
+
+
+def hooks_active() -> bool:
+    return bool(_hooks)
+
+
+class ReadTimer:
+    """ Tracks a single read, firing events and recording timings and byte counts in open_info """
+    def __init__(self, source_type: str, open_info: Optional[Any] = None) -> None:
+        self.source_type = source_type
+        self.open_info = open_info
+        self.location: Optional[str] = None
+        self.nbytes = 0
+        self.finished = False
+        self._start = time.perf_counter()
+        self._fire('start')
+
+    def _fire(self, event: str, error: Optional[BaseException] = None) -> None:
+        elapsed = time.perf_counter() - self._start
+        if self.open_info is not None and event in TIMING_FIELDS:
+            setattr(self.open_info, TIMING_FIELDS[event], elapsed)
+        read_event = ReadEvent(event, self.source_type, self.location, elapsed, self.nbytes, error)
+        for hook in _hooks:
+            hook(read_event)
+
+    def resolved(self, location: str) -> None:
+        self.location = location
+        self._fire('resolved')
+
+    def connected(self) -> None:
+        self._fire('connected')
+
+    def headers(self) -> None:
+        self._fire('headers')
+
+    def data(self, n: int) -> None:
+        """ Record that n more bytes were read.  0 means end of stream """
+        if n:
+            self.nbytes += n
+            if self.nbytes == n:
+                self._fire('first_byte')
+        else:
+            self.done()
+
+    def done(self) -> None:
+        if not self.finished:
+            self.finished = True
+            if self.open_info is not None:
+                self.open_info.bytes_read = self.nbytes
+            self._fire('done')
+
+    def error(self, e: BaseException) -> None:
+        if not self.finished:
+            self.finished = True
+            if self.open_info is not None:
+                self.open_info.bytes_read = self.nbytes
+            self._fire('error', e)
+
+
+class _TimedRaw(io.RawIOBase):
+    """ Raw stream over binary stream fp that reports its progress to a ReadTimer """
+    def __init__(self, fp: IO, timer: ReadTimer) -> None:
+        super().__init__()
+        self._fp = fp
+        self._timer = timer
+        self.name = getattr(fp, 'name', None)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        try:
+            readinto = getattr(self._fp, 'readinto', None)
+            if readinto:
+                n = readinto(b)
+            else:
+                data = self._fp.read(len(b))
+                n = len(data)
+                b[:n] = data
+        except Exception as e:
+            self._timer.error(e)
+            raise
+        self._timer.data(n)
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fp.close()
+            # Abandoned before the end -- report what we got
+            self._timer.done()
+        super().close()
+
+
+def timed_stream(fp: IO, timer: ReadTimer) -> io.BufferedReader:
+    """ Wrap binary stream fp so that reads are reported to timer.  Closing the returned stream closes fp """
+    return io.BufferedReader(_TimedRaw(fp, timer))
+
+
+def timed_text(fp: IO, timer: ReadTimer) -> IO:
+    """ Report reads from text stream fp to timer, counting characters.  fp.read is restored at the end """
+    native_read = fp.read
+
+    def read(*args) -> str:
+        try:
+            text = native_read(*args)
+        except Exception as e:
+            timer.error(e)
+            raise
+        timer.data(len(text))
+        if not text or not args or args[0] is None or args[0] < 0:
+            timer.done()
+            fp.read = native_read
+        return text
+    fp.read = read
+    return fp
+
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, float('inf'))
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.n += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(count=self.n, mean=self.total / self.n if self.n else None, max=self.max,
+                    buckets={('inf' if b == float('inf') else str(b)): c for b, c in zip(BUCKETS, self.counts) if c})
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.latency = _Histogram()             # start to done
+        self.first_byte = _Histogram()          # start to first byte
+        self.errors = 0
+        self.nbytes = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(latency=self.latency.as_dict(), first_byte=self.first_byte.as_dict(), errors=self.errors,
+                    bytes=self.nbytes)
+
+
+class LatencyCollector:
+    """
+    Hook that aggregates latency and time-to-first-byte histograms per host and per source type.  Files and file
+    handles are grouped under their source type rather than a host.
+
+        collector = LatencyCollector()
+        with instrumented(collector):
+            ...
+        print(json.dumps(collector.dump(), indent=2))
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.by_host: Dict[str, _Stats] = {}
+        self.by_type: Dict[str, _Stats] = {}
+
+    @staticmethod
+    def host(event: ReadEvent) -> str:
+        if event.source_type == 'url' and event.location:
+            return urlsplit(event.location).netloc.lower()
+        return event.source_type
+
+    def __call__(self, event: ReadEvent) -> None:
+        if event.event not in ('first_byte', 'done', 'error'):
+            return
+        with self._lock:
+            for stats in (self.by_host.setdefault(self.host(event), _Stats()),
+                          self.by_type.setdefault(event.source_type, _Stats())):
+                if event.event == 'first_byte':
+                    stats.first_byte.add(event.elapsed)
+                elif event.event == 'done':
+                    stats.latency.add(event.elapsed)
+                    stats.nbytes += event.nbytes
+                else:
+                    stats.errors += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.by_host.clear()
+            self.by_type.clear()
+
+    def dump(self) -> Dict[str, Any]:
+        """ JSON-serializable snapshot of the histograms """
+        with self._lock:
+            return dict(hosts={k: v.as_dict() for k, v in self.by_host.items()},
+                        types={k: v.as_dict() for k, v in self.by_type.items()})
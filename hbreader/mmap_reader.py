@@ -0,0 +1,62 @@
+import io
+import mmap
+from typing import Optional, IO
+
+__all__ = ['map_file', 'mapped_stream']
+
+
+def map_file(fp: IO) -> Optional[mmap.mmap]:
+    """
+    Map an open file read-only.  The mapping is independent of fp, which can be closed once this returns.
+    :param fp: file opened in binary mode
+    :return: memory map of the whole file, or None if it can't be mapped (e.g. it is empty or not a regular file)
+    """
+    try:
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError, io.UnsupportedOperation):
+        return None
+
+
+class _MappedRaw(io.RawIOBase):
+    """ Raw stream over a memory map.  Pages are only touched as the content is read """
+    def __init__(self, mapped: mmap.mmap, name: Optional[str] = None) -> None:
+        super().__init__()
+        self._mmap = mapped
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self._mmap.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        self._mmap.seek(pos, whence)
+        return self._mmap.tell()
+
+    def tell(self) -> int:
+        return self._mmap.tell()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._mmap.close()
+        super().close()
+
+
+def mapped_stream(fp: IO) -> Optional[io.BufferedReader]:
+    """
+    Return a buffered binary stream that reads fp through a memory map, closing fp.
+    :param fp: file opened in binary mode
+    :return: stream or None if fp can't be mapped, in which case fp is left open
+    """
+    mapped = map_file(fp)
+    if mapped is None:
+        return None
+    name = getattr(fp, 'name', None)
+    fp.close()
+    return io.BufferedReader(_MappedRaw(mapped, name))
@@ -0,0 +1,194 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Iterable, Optional, Dict, Set, Tuple
+
+from hbreader import HB_TYPE, HBType, FileInfo, detect_type, default_str_tester, hbread, _resolve_url, \
+    _resolve_filename, _replay_info
+
+__all__ = ['PrefetchingReader']
+
+# Given the text of a document and what was learned reading it, return the locations it refers to.  Relative
+# locations are resolved against FileInfo.base_path
+EXTRACT_REFERENCES = Callable[[str, FileInfo], Iterable[str]]
+
+
+class _Prefetch:
+    """ A speculative read.  size is the number of bytes held against the budget once it has completed """
+    __slots__ = ('future', 'size')
+
+    def __init__(self) -> None:
+        self.future: Optional[Future] = None
+        self.size = 0
+
+
+class PrefetchingReader:
+    """
+    Reader for documents that refer to other documents -- imports, includes, $refs.  Every document read is handed
+    to extract_references, and the files and URLs it refers to are read on a thread pool while the caller is still
+    busy with the current one.  The documents those refer to are prefetched in turn, so a chain of reads that would
+    otherwise wait on one another overlaps.  When the caller gets to a reference, read answers it from the prefetched
+    text and replays its FileInfo.
+
+    Prefetching stops while the prefetched but not yet read text exceeds max_bytes, or max_pending reads are
+    queued or running.  References that were skipped are picked up again when the document that holds them is
+    read.  Each location is prefetched at most once.  The text is what the source held at the time it was prefetched.
+    """
+    def __init__(self,
+                 extract_references: EXTRACT_REFERENCES,
+                 max_workers: int = 8,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 max_pending: Optional[int] = None,
+                 is_actual_data: Optional[Callable[[str], bool]] = default_str_tester,
+                 **kwargs) -> None:
+        """
+        :param extract_references: returns the locations a document refers to.  Called on the reader threads
+        :param max_workers: number of reader threads
+        :param max_bytes: memory budget for prefetched text that hasn't been read yet
+        :param max_pending: maximum number of prefetches queued or running (default: 4 * max_workers)
+        :param is_actual_data: Function to differentiate plain text from URL or file name
+        :param kwargs: additional hbread arguments, e.g. pool, resolver or cache
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.extract_references = extract_references
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending if max_pending is not None else 4 * max_workers
+        self.is_actual_data = is_actual_data
+        self.kwargs = kwargs
+        self.hits = self.misses = 0
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='hbreader-prefetch')
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Prefetch] = {}
+        self._seen: Set[str] = set()
+        self._pending = 0
+        self._held = 0
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        """ Approximate number of bytes of prefetched text held """
+        return self._held
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(source: HB_TYPE, source_type: HBType, base_path: Optional[str]) -> Optional[str]:
+        if source_type is HBType.FILENAME:
+            return _resolve_filename(source, base_path)
+        if source_type is HBType.URL:
+            return _resolve_url(source, base_path)
+        return None
+
+    def read(self, source: HB_TYPE, open_info: Optional[FileInfo] = None, base_path: Optional[str] = None) -> str:
+        """
+        hbread(source, open_info, base_path, ...), answered from the prefetched text when there is some.  The
+        references of source are prefetched
+        :param source: anything that can be construed to be a string, a URL, a file name or an open file handle
+        :param open_info: what we learned about source in the process of converting it
+        :param base_path: Base to use if source is a relative URL or file name
+        :return: String represented by the source
+        """
+        source_type = detect_type(source, base_path, self.is_actual_data)
+        key = self._key(source, source_type, base_path)
+        result = None
+        if key is not None:
+            with self._lock:
+                self._seen.add(key)
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._held -= entry.size
+            if entry is not None and entry.future is not None:
+                try:
+                    result = entry.future.result()
+                except Exception:
+                    # Read it again below, so that the error (if it persists) is raised here
+                    result = None
+        if result is not None:
+            self.hits += 1
+            text, info, expanded = result
+        else:
+            self.misses += 1
+            read_info = FileInfo()
+            text = hbread(source, read_info, base_path, is_actual_data=self.is_actual_data, source_type=source_type,
+                          **self.kwargs)
+            info, expanded = read_info.values(), False
+        if not expanded:
+            read_info = FileInfo()
+            _replay_info(read_info, info)
+            self._prefetch(self.extract_references(text, read_info), read_info.base_path)
+        _replay_info(open_info, info)
+        return text
+
+    def prefetch(self, sources: Iterable[HB_TYPE], base_path: Optional[str] = None) -> None:
+        """ Start reading sources (and what they refer to) in the background """
+        self._prefetch(sources, base_path)
+
+    def _prefetch(self, sources: Iterable[HB_TYPE], base_path: Optional[str]) -> bool:
+        """ Prefetch sources, returning False if we had to stop short of the end because of the limits """
+        for source in sources:
+            source_type = detect_type(source, base_path, self.is_actual_data)
+            key = self._key(source, source_type, base_path)
+            if key is None:
+                continue
+            with self._lock:
+                if self._closed or self._held >= self.max_bytes or self._pending >= self.max_pending:
+                    return False
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                entry = self._entries[key] = _Prefetch()
+                self._pending += 1
+                entry.future = self._executor.submit(self._fetch, key, entry, source, source_type, base_path)
+        return True
+
+    def _fetch(self, key: str, entry: _Prefetch, source: HB_TYPE, source_type: HBType,
+               base_path: Optional[str]) -> Optional[Tuple[str, tuple, bool]]:
+        try:
+            if self._closed:
+                return None
+            info = FileInfo()
+            text = hbread(source, info, base_path, is_actual_data=self.is_actual_data, source_type=source_type,
+                          **self.kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        size = sys.getsizeof(text)
+        with self._lock:
+            if self._entries.get(key) is entry:
+                if self._held + size > self.max_bytes:
+                    # Over budget -- let the caller read it when it gets there
+                    del self._entries[key]
+                    self._seen.discard(key)
+                    return None
+                entry.size = size
+                self._held += size
+        try:
+            # If some references were skipped, read goes through them again
+            expanded = self._prefetch(self.extract_references(text, info), info.base_path)
+        except Exception:
+            # read calls extract_references again, and it can raise there
+            expanded = False
+        return text, info.values(), expanded
+
+    def clear(self) -> None:
+        """ Drop all prefetched text, and forget which locations have been prefetched """
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+            self._seen = set()
+            self._held = 0
+        for entry in entries:
+            entry.future.cancel()
+
+    def close(self) -> None:
+        """ Stop prefetching and release the reader threads """
+        self._closed = True
+        self.clear()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'PrefetchingReader':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
@@ -0,0 +1,145 @@
+import io
+import threading
+import time
+from typing import Optional, Callable, IO
+
+__all__ = ['RateLimiter', 'PROGRESS', 'METER', 'stream_meter', 'range_meter', 'metered_stream', 'metered_text']
+
+# Called with the number of bytes read so far and the total size of the source, if known
+PROGRESS = Callable[[int, Optional[int]], None]
+
+# Wraps a binary stream and its size, if known, in a metered stream
+METER = Callable[[IO, Optional[int]], IO]
+
+# Metered streams read from the source this much at a time, so the per-read overhead is paid per 64K, not per line
+METER_CHUNK = 64 * 1024
+
+
+class RateLimiter:
+    """
+    Token bucket that limits the rate at which bytes are read.  Share one between reads (e.g. all of the reads of
+    a tenant) to give them a common budget.  Readers that overdraw it sleep until the bytes they read are paid for.
+    """
+    def __init__(self, bytes_per_second: float, burst: Optional[int] = None) -> None:
+        """
+        :param bytes_per_second: sustained rate
+        :param burst: bytes that can be read at once after an idle period (default: one second's worth, but at least
+        METER_CHUNK).  Also the largest single read
+        """
+        if bytes_per_second <= 0:
+            raise ValueError("bytes_per_second must be positive")
+        self.rate = bytes_per_second
+        self.burst = burst if burst else max(int(bytes_per_second), METER_CHUNK)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int) -> float:
+        """
+        Account for n bytes, sleeping if the budget is overdrawn
+        :return: seconds slept
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate) - n
+            self._last = now
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+
+class _MeteredRaw(io.RawIOBase):
+    """ Raw stream over binary stream fp that reports progress and/or is rate limited """
+    def __init__(self, fp: IO, total: Optional[int], progress: Optional[PROGRESS],
+                 limiter: Optional[RateLimiter]) -> None:
+        super().__init__()
+        self._fp = fp
+        self._total = total
+        self._progress = progress
+        self._limiter = limiter
+        self._max_read = limiter.burst if limiter else None
+        self.nbytes = 0
+        self.name = getattr(fp, 'name', None)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._max_read and len(b) > self._max_read:
+            b = memoryview(b)[:self._max_read]
+        readinto = getattr(self._fp, 'readinto', None)
+        if readinto:
+            n = readinto(b)
+        else:
+            data = self._fp.read(len(b))
+            n = len(data)
+            b[:n] = data
+        if n:
+            self.nbytes += n
+            if self._limiter:
+                self._limiter.consume(n)
+            if self._progress:
+                self._progress(self.nbytes, self._total)
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fp.close()
+        super().close()
+
+
+def metered_stream(fp: IO, total: Optional[int], progress: Optional[PROGRESS] = None,
+                   limiter: Optional[RateLimiter] = None) -> io.BufferedReader:
+    """
+    Wrap binary stream fp so that progress is called after every read, and reads are held to limiter's rate.
+    Closing the returned stream closes fp.
+    :param fp: binary stream
+    :param total: size of fp in bytes, if known
+    :param progress: called with bytes read so far and total
+    :param limiter: rate limit
+    :return: buffered binary stream
+    """
+    return io.BufferedReader(_MeteredRaw(fp, total, progress, limiter), METER_CHUNK)
+
+
+def metered_text(fp: IO, total: Optional[int], progress: Optional[PROGRESS] = None,
+                 limiter: Optional[RateLimiter] = None) -> IO:
+    """ metered_stream for text stream fp.  Bytes are counted in the encoding of fp (default: utf-8) """
+    encoding = getattr(fp, 'encoding', None) or 'utf-8'
+    native_read = fp.read
+    nbytes = 0
+
+    def read(*args) -> str:
+        nonlocal nbytes
+        text = native_read(*args)
+        if text:
+            n = len(text.encode(encoding)) if not text.isascii() else len(text)
+            nbytes += n
+            if limiter:
+                limiter.consume(n)
+            if progress:
+                progress(nbytes, total)
+        if not text or not args or args[0] is None or args[0] < 0:
+            fp.read = native_read
+        return text
+    fp.read = read
+    return fp
+
+
+def stream_meter(progress: Optional[PROGRESS], limiter: Optional[RateLimiter]) -> Optional[METER]:
+    """ Return a function that meters a binary stream with progress and limiter, or None if there is nothing to do """
+    if progress is None and limiter is None:
+        return None
+    return lambda fp, total: metered_stream(fp, total, progress, limiter)
+
+
+def range_meter(progress: Optional[PROGRESS], limiter: Optional[RateLimiter]) -> Optional[METER]:
+    """
+    stream_meter for byte ranges.  The metered stream isn't buffered, so no more than the range is read -- or paid
+    for -- from a source that holds more
+    """
+    if progress is None and limiter is None:
+        return None
+    return lambda fp, total: _MeteredRaw(fp, total, progress, limiter)
@@ -0,0 +1,182 @@
+import http.client
+import random
+import socket
+import threading
+import time
+from typing import Optional, Dict, Hashable, Mapping, Collection
+from urllib.error import URLError, HTTPError
+
+__all__ = ['RetryPolicy', 'CircuitBreaker', 'CircuitOpenError']
+
+# Statuses that are worth another try -- the server is overloaded or something between us and it is
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Connection failures (URLError reasons) that are worth another try
+RETRY_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError,
+                ConnectionAbortedError, socket.timeout, TimeoutError)
+
+
+class CircuitOpenError(URLError):
+    """ Raised instead of making a request to a host whose circuit breaker is open """
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"Circuit open for {host} -- retry in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.  After failure_threshold consecutive failures the circuit for a host opens, and
+    requests to it fail immediately with CircuitOpenError.  Once reset_timeout seconds have passed, one trial
+    request is let through -- if it succeeds the circuit closes again, if it fails it stays open for another
+    reset_timeout.  Share one breaker between pools (or calls) to share what is known about a host.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        """
+        :param failure_threshold: consecutive failures that open the circuit
+        :param reset_timeout: seconds an open circuit waits before letting a trial request through
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures: Dict[Hashable, int] = {}
+        self._opened: Dict[Hashable, float] = {}          # host -> time.monotonic() the circuit opened
+        self._trials: Dict[Hashable, bool] = {}           # host -> a trial request is in flight
+
+    def before(self, host: Hashable) -> None:
+        """ Called before a request to host.  Raises CircuitOpenError if it shouldn't be made """
+        with self._lock:
+            opened = self._opened.get(host)
+            if opened is None:
+                return
+            retry_in = opened + self.reset_timeout - time.monotonic()
+            if retry_in > 0 or self._trials.get(host):
+                raise CircuitOpenError(self._name(host), max(retry_in, 0.0))
+            self._trials[host] = True
+
+    def success(self, host: Hashable) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened.pop(host, None)
+            self._trials.pop(host, None)
+
+    def failure(self, host: Hashable) -> None:
+        with self._lock:
+            self._failures[host] = n = self._failures.get(host, 0) + 1
+            trial = self._trials.pop(host, False)
+            if n >= self.failure_threshold or trial:
+                self._opened[host] = time.monotonic()
+
+    def is_open(self, host: Hashable) -> bool:
+        """ True if requests to host are currently being refused """
+        with self._lock:
+            opened = self._opened.get(host)
+            return opened is not None and (opened + self.reset_timeout > time.monotonic() or
+                                           bool(self._trials.get(host)))
+
+    def reset(self) -> None:
+        """ Forget everything """
+        with self._lock:
+            self._failures.clear()
+            self._opened.clear()
+            self._trials.clear()
+
+    @staticmethod
+    def _name(host: Hashable) -> str:
+        if isinstance(host, tuple) and len(host) == 3:
+            scheme, hostname, port = host
+            return f"{scheme}://{hostname}:{port}"
+        return str(host)
+
+
+class RetryPolicy:
+    """
+    How hard to try when fetching a URL -- timeouts, retries and an optional circuit breaker.
+
+    A request is retried, up to retries more times, when it fails with a status in retry_statuses, a connection
+    reset or a timeout.  The wait before attempt n (n = 1, 2, ...) is a random time between 0 and
+    min(max_backoff, backoff * 2 ** (n - 1)) ("full jitter"), or the upper bound itself if jitter is off.  A
+    Retry-After header on the failed response is honored in place of the backoff, unless it asks for more than
+    max_retry_after seconds, in which case the error is raised.
+    """
+    def __init__(self,
+                 retries: int = 2,
+                 backoff: float = 0.25,
+                 max_backoff: float = 10.0,
+                 jitter: bool = True,
+                 retry_statuses: Collection[int] = RETRY_STATUSES,
+                 max_retry_after: float = 60.0,
+                 connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        """
+        :param retries: number of additional attempts.  0 means try once
+        :param backoff: upper bound of the wait before the first retry, in seconds.  Doubles for each retry after that
+        :param max_backoff: largest upper bound for the wait between attempts
+        :param jitter: pick a random wait up to the bound rather than the bound itself
+        :param retry_statuses: HTTP statuses that are retried
+        :param max_retry_after: longest Retry-After that is waited out
+        :param connect_timeout: seconds to wait for a connection to be established.  None means wait forever
+        :param read_timeout: seconds to wait for the server to send something.  None means wait forever
+        :param breaker: circuit breaker that requests are checked against and reported to (default: none)
+        """
+        if retries < 0:
+            raise ValueError("retries must not be negative")
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.max_retry_after = max_retry_after
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker = breaker
+
+    def delay(self, attempt: int, headers: Optional[Mapping[str, str]] = None) -> Optional[float]:
+        """
+        Seconds to wait before retrying a request that has failed attempt times
+        :param attempt: number of attempts made so far
+        :param headers: headers of the failed response, if there was one
+        :return: wait time, or None if there should be no further attempt
+        """
+        if attempt > self.retries:
+            return None
+        retry_after = parse_retry_after(headers.get('Retry-After')) if headers is not None else None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        bound = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, bound) if self.jitter else bound
+
+    def is_failure(self, e: URLError) -> bool:
+        """ True if e counts against the host with the circuit breaker.  Other HTTP errors mean the host is up """
+        return not isinstance(e, HTTPError) or e.code in self.retry_statuses
+
+    def retry_delay(self, attempt: int, e: URLError) -> Optional[float]:
+        """
+        Seconds to wait before retrying a request that has failed attempt times, the last time with e
+        :return: wait time, or None if e should be raised
+        """
+        if isinstance(e, HTTPError):
+            return self.delay(attempt, e.headers) if e.code in self.retry_statuses else None
+        return self.delay(attempt) if isinstance(e.reason, RETRY_ERRORS) else None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in vars(self).items())})"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """ Seconds from now that a Retry-After header value (delta seconds or an HTTP date) refers to """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    from email.utils import parsedate_to_datetime
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
@@ -0,0 +1,69 @@
+import threading
+from typing import Callable, Dict, Hashable, Tuple, TypeVar, Any
+
+__all__ = ['SingleFlight']
+
+T = TypeVar('T')
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that have the same key into one.  The first caller for a key does the work -- anyone
+    who asks for the same key while it is in progress waits for it and gets the same result (or exception).  Nothing
+    is remembered once the call completes, so this is not a cache.  Pass one to hbread as coalesce=... to share
+    concurrent reads of the same file or URL.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Call fn, unless a call for key is already in flight
+        :param key: identifies the work
+        :param fn: does the work
+        :return: result of fn, and whether it was shared with (i.e. computed by) another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def waiting(self, key: Hashable) -> int:
+        """ Number of callers waiting on the in-flight call for key """
+        with self._lock:
+            call = self._calls.get(key)
+            return call.waiters if call else 0
+
+    def in_flight(self) -> int:
+        """ Number of keys currently being worked on """
+        with self._lock:
+            return len(self._calls)
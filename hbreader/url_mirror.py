@@ -0,0 +1,127 @@
+import os
+from typing import Optional, Dict, Tuple, Callable, Mapping, Iterable, Union, List
+from urllib.parse import quote, unquote, urlsplit
+
+__all__ = ['URLMirror', 'default_resolver', 'set_default_resolver']
+
+# A resolver maps an absolute, quoted URL to the file name or (unquoted) URL that should be read in its place, or None
+RESOLVER = Callable[[str], Optional[str]]
+
+
+def _authority(url: str) -> Optional[str]:
+    """ scheme://host[:port]/ part of url, or None if url doesn't have one all the way to the slash """
+    start = url.find('://')
+    end = url.find('/', start + 3) if start >= 0 else -1
+    return url[:end + 1] if end >= 0 else None
+
+
+def _is_file_url(location: str) -> bool:
+    return location[:7].lower() == 'file://'
+
+
+def _is_url(location: str) -> bool:
+    """ file:// URLs are file names -- they are opened directly rather than through urllib """
+    return '://' in location and not _is_file_url(location)
+
+
+class URLMirror:
+    """
+    Resolver that maps URL prefixes onto local directories or other URLs, e.g.
+
+        mirror = URLMirror({'https://w3id.org/biolink/': '/data/mirror/biolink',
+                            'https://raw.githubusercontent.com/': 'http://artifacts.internal/github/'})
+
+    The longest matching prefix wins.  The rest of the URL is unquoted and then taken as a path below the
+    directory, or appended to the URL.  Prefixes are indexed by their scheme://host/ part, then by length, so a
+    lookup costs a dictionary probe per distinct prefix length on the host, however many rules there are.
+    """
+    def __init__(self, rules: Optional[Union[Mapping[str, str], Iterable[Tuple[str, str]]]] = None,
+                 fallback: bool = False) -> None:
+        """
+        :param rules: URL prefix to directory, file name or URL map
+        :param fallback: read from the original URL if the file a URL maps to doesn't exist (default: fail)
+        """
+        self.fallback = fallback
+        # authority -> (prefix lengths, longest first, prefix -> target).  None holds prefixes without a full
+        # authority, which are shorter than any prefix that has one
+        self._index: Dict[Optional[str], Tuple[Tuple[int, ...], Dict[str, str]]] = {}
+        if rules:
+            for prefix, target in (rules.items() if isinstance(rules, Mapping) else rules):
+                self.add(prefix, target)
+
+    def add(self, prefix: str, target: str) -> None:
+        """
+        Map URLs starting with prefix to target
+        :param prefix: URL prefix.  Quoted the same way hbopen quotes URLs
+        :param target: local directory or file name, file:// URL, or URL
+        """
+        prefix = quote(prefix, '/:')
+        if target.lower().startswith('file://'):
+            target = unquote(urlsplit(target).path)
+        if not _is_url(target):
+            target = os.path.abspath(target)
+        authority = _authority(prefix)
+        _, rules = self._index.get(authority, ((), {}))
+        rules[prefix] = target
+        self._index[authority] = tuple(sorted({len(p) for p in rules}, reverse=True)), rules
+
+    def rules(self) -> List[Tuple[str, str]]:
+        """ All (prefix, target) pairs """
+        return [(p, t) for _, rules in self._index.values() for p, t in rules.items()]
+
+    def match(self, url: str) -> Optional[Tuple[str, str]]:
+        """ Longest (prefix, target) rule that url starts with, if any """
+        for authority in (_authority(url), None):
+            entry = self._index.get(authority)
+            if entry:
+                lengths, rules = entry
+                for n in lengths:
+                    target = rules.get(url[:n])
+                    if target is not None:
+                        return url[:n], target
+        return None
+
+    def resolve(self, url: str) -> Optional[str]:
+        """
+        Location to read in place of url
+        :param url: absolute, quoted URL
+        :return: file name or URL, or None if url isn't mirrored
+        """
+        rule = self.match(url)
+        if rule is None:
+            return None
+        prefix, target = rule
+        rest = url[len(prefix):]
+        if _is_url(target):
+            # Unquoted, as hbopen expects it
+            return target + unquote(rest)
+        if not rest:
+            path = target
+        else:
+            path = os.path.normpath(os.path.join(target, unquote(rest).lstrip('/')))
+            if os.path.commonpath([target, path]) != target:
+                # ../ out of the mirror
+                return None
+        return None if self.fallback and not os.path.exists(path) else path
+
+    __call__ = resolve
+
+    def __len__(self) -> int:
+        return sum(len(rules) for _, rules in self._index.values())
+
+
+_default_resolver: Optional[RESOLVER] = None
+
+
+def default_resolver() -> Optional[RESOLVER]:
+    """ The resolver that URL reads go through when none is supplied """
+    return _default_resolver
+
+
+def set_default_resolver(resolver: Optional[RESOLVER]) -> None:
+    """
+    Set the resolver that URL reads go through when none is supplied
+    :param resolver: URLMirror or any function from a URL to a file name, URL or None.  None means no resolver
+    """
+    global _default_resolver
+    _default_resolver = resolver
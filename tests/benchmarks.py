@@ -0,0 +1,193 @@
+"""
+Benchmarks for the hbreader dispatch paths.  Fixtures are generated in a temporary directory and URLs are served by
+a local HTTP server, so results are reproducible and don't depend on the network.
+
+    python -m tests.benchmarks -o results.json                  # run and save
+    python -m tests.benchmarks --compare results.json           # run and report regressions against a saved run
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, List, Optional, Any
+
+from hbreader import FileInfo, detect_type, default_str_tester, hbread, _to_textio
+from tests.local_server import LocalServer
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fixture sizes in characters
+SIZES = (1024, 64 * 1024, 1024 * 1024)
+QUICK_SIZES = (1024,)
+
+LINE = "<http://example.org/subject> <http://example.org/predicate> \"Some friendly test data é\" .\n"
+
+# A result is flagged as a regression when its median is this much slower than the baseline
+DEFAULT_THRESHOLD = 1.25
+
+
+def _text(size: int) -> str:
+    return (LINE * (size // len(LINE) + 1))[:size]
+
+
+def _inline(size: int) -> str:
+    """ A long inline string with nothing in it that default_str_tester keys on until the very end """
+    return ('x' * (size - 1)) + '\n'
+
+
+def generate_fixtures(directory: str, sizes=SIZES) -> Dict[str, str]:
+    """
+    Write the benchmark input files
+    :param directory: where to write them
+    :param sizes: fixture sizes in characters
+    :return: fixture name to file name map
+    """
+    fixtures = {}
+    for size in sizes:
+        text = _text(size)
+        for name, codec in ((f'utf8_{size}', 'utf-8'), (f'utf16_{size}', 'utf-16')):
+            fname = os.path.join(directory, name + '.txt')
+            with open(fname, 'wb') as f:
+                f.write(text.encode(codec))
+            fixtures[name] = fname
+    return fixtures
+
+
+def _measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time and number < 1_000_000:
+        number *= 10
+    times = [t / number for t in timer.repeat(repeat, number)]
+    return dict(min=min(times), median=statistics.median(times), mean=statistics.mean(times),
+                number=number, repeat=repeat)
+
+
+def _read_io(fname: str) -> Callable[[], str]:
+    def read() -> str:
+        with open(fname, 'rb') as f:
+            return hbread(f)
+    return read
+
+
+def _decode(data: bytes) -> Callable[[], str]:
+    # The text wrapper routes read() through _auto_decode
+    return lambda: _to_textio(io.BytesIO(data), 'rb', None).read()
+
+
+def _run_python(code: str) -> Callable[[], Any]:
+    # A fresh interpreter each time -- these measure cold start.  Run from the package root so that it is this
+    # hbreader that gets imported, not whatever happens to be installed
+    return lambda: subprocess.run([sys.executable, '-c', code], check=True, cwd=PACKAGE_ROOT)
+
+
+def benchmarks(fixtures: Dict[str, str], base_url: str, sizes=SIZES) -> Dict[str, Callable[[], Any]]:
+    """ Name to callable map of everything that is timed """
+    benches = {
+        'startup/python': _run_python('pass'),
+        'startup/import hbreader': _run_python('import hbreader'),
+        'FileInfo()': FileInfo,
+        'FileInfo.clear': FileInfo(source_file='x', source_file_size=1).clear,
+    }
+    for size in sizes:
+        inline = _inline(size)
+        benches[f'default_str_tester/inline_{size}'] = lambda s=inline: default_str_tester(s)
+        benches[f'detect_type/inline_{size}'] = lambda s=inline: detect_type(s)
+        text = _text(size)
+        benches[f'hbread/STRING_{size}'] = lambda s=text: hbread(s)
+        data = text.encode()
+        benches[f'hbread/DECODABLE_{size}'] = lambda d=data: hbread(d)
+        utf8, utf16 = fixtures[f'utf8_{size}'], fixtures[f'utf16_{size}']
+        benches[f'hbread/FILENAME_{size}'] = lambda f=utf8: hbread(f)
+        benches[f'hbread/IO_{size}'] = _read_io(utf8)
+        benches[f'hbread/URL_{size}'] = lambda f=os.path.basename(utf8): hbread(base_url + f)
+        with open(utf8, 'rb') as f:
+            benches[f'_auto_decode/utf-8_{size}'] = _decode(f.read())
+        with open(utf16, 'rb') as f:
+            benches[f'_auto_decode/utf-16-bom_{size}'] = _decode(f.read())
+    return benches
+
+
+def run(sizes=SIZES, repeat: int = 5, min_time: float = 0.2, only: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the benchmarks
+    :param sizes: fixture sizes in characters
+    :param repeat: number of timing runs per benchmark
+    :param min_time: approximate seconds per timing run
+    :param only: substring of the benchmark names to run (default: all)
+    :return: JSON-serializable results, including the environment they were obtained in
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fixtures = generate_fixtures(tmpdir, sizes)
+        with LocalServer(tmpdir) as server:
+            results = {name: _measure(fn, repeat, min_time)
+                       for name, fn in benchmarks(fixtures, server.base_url, sizes).items()
+                       if not only or only in name}
+    return dict(timestamp=datetime.datetime.now().isoformat(timespec='seconds'),
+                python=platform.python_version(),
+                implementation=platform.python_implementation(),
+                platform=platform.platform(),
+                results=results)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Compare two runs
+    :param results: current run
+    :param baseline: earlier run
+    :param threshold: slowdown ratio (current / baseline median) that counts as a regression
+    :return: names of the benchmarks that regressed
+    """
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous and previous['median'] and current['median'] / previous['median'] > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def _report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    for name, r in results['results'].items():
+        line = f"{name:40} {r['median'] * 1e6:12.2f} us"
+        if baseline and name in baseline['results'] and baseline['results'][name]['median']:
+            line += f"  x{r['median'] / baseline['results'][name]['median']:.2f}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="hbreader benchmarks")
+    parser.add_argument('-o', '--output', help="File to save the results in (JSON)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Slowdown ratio that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing runs per benchmark (default: 5)")
+    parser.add_argument('--quick', action='store_true', help="Smallest fixture size only, short timing runs")
+    parser.add_argument('-k', dest='only', help="Only run benchmarks whose name contains this string")
+    opts = parser.parse_args(argv)
+
+    results = run(QUICK_SIZES if opts.quick else SIZES, opts.repeat, 0.01 if opts.quick else 0.2, opts.only)
+    baseline = None
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+    _report(results, baseline)
+    if opts.output:
+        with open(opts.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        regressions = compare(results, baseline, opts.threshold)
+        if regressions:
+            print(f"Regressions (> x{opts.threshold}): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'data'))
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes -- without this every response waits out a delayed ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+        super().do_GET()
+
+    def end_headers(self):
+        for k, v in self.server.extra_headers.items():
+            self.send_header(k, v)
+        super().end_headers()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class LocalServer:
+    """ Keep-alive HTTP server that serves a directory (default: tests/data) on a free localhost port """
+    def __init__(self, directory: str = DATA_DIR, handler: type = _Handler) -> None:
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=directory))
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.connections = 0
+        self.httpd.requests = []
+        self.httpd.extra_headers = {}
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+
+    @property
+    def connections(self) -> int:
+        """ Number of TCP connections accepted so far """
+        return self.httpd.connections
+
+    @property
+    def requests(self) -> list:
+        """ (path, headers) for every GET received so far """
+        return self.httpd.requests
+
+    @property
+    def extra_headers(self) -> dict:
+        """ Headers added to every response """
+        return self.httpd.extra_headers
+
+    def __enter__(self) -> 'LocalServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,120 @@
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from hbreader import hbread, hbopen, hbread_bytes, FileInfo, ArchiveCache, CachingReader, set_default_archive_cache, \
+    default_archive_cache
+from hbreader.archive_reader import split_member
+
+
+class ArchiveReaderTestCase(unittest.TestCase):
+    nfiles = 5000
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.zip = os.path.join(self.tmpdir.name, 'bundle.zip')
+        with zipfile.ZipFile(self.zip, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for i in range(self.nfiles):
+                zf.writestr(f'schemas/s{i}.yaml', self.text(i))
+            zf.writestr('schemas/common/types.yaml', 'types: é\n')
+            zf.writestr('compressed.txt.gz', gzip.compress(b'Inside a zip\n'))
+        self.tar = os.path.join(self.tmpdir.name, 'bundle.tar.gz')
+        with tarfile.open(self.tar, 'w:gz') as tf:
+            for i in range(100):
+                data = self.text(i).encode()
+                info = tarfile.TarInfo(f'./schemas/s{i}.yaml')
+                info.size = len(data)
+                info.mtime = 1600000000
+                tf.addfile(info, io.BytesIO(data))
+        self.archives = ArchiveCache()
+        set_default_archive_cache(self.archives)
+
+    def tearDown(self) -> None:
+        set_default_archive_cache(None)
+        self.tmpdir.cleanup()
+
+    @staticmethod
+    def text(i: int) -> str:
+        return f"id: s{i}\nimports:\n  - common/types\n"
+
+    def test_split(self):
+        self.assertEqual(('/a/b.zip', 'c/d.yaml'), split_member('/a/b.zip!/c/d.yaml'))
+        self.assertEqual(('/a!/b.tar.gz', 'c'), split_member('/a!/b.tar.gz!/c'))
+        self.assertIsNone(split_member('/a/b.yaml'))
+        self.assertIsNone(split_member('/a/b!/c.yaml'))
+
+    def test_zip(self):
+        metadata = FileInfo()
+        location = self.zip + '!/schemas/s42.yaml'
+        self.assertEqual(self.text(42), hbread(location, metadata))
+        self.assertEqual(location, metadata.source_file)
+        self.assertEqual(self.zip + '!/schemas', metadata.base_path)
+        self.assertEqual(len(self.text(42)), metadata.source_file_size)
+        self.assertIsNotNone(metadata.source_file_date)
+
+        # Relative to a member
+        self.assertEqual('types: é\n', hbread('common/types.yaml', base_path=metadata.base_path))
+        self.assertEqual('types: é\n', hbread('../schemas/common/types.yaml', base_path=metadata.base_path))
+        self.assertEqual('Inside a zip\n', hbread('compressed.txt.gz', metadata.clear(), base_path=self.zip + '!'))
+        self.assertEqual('gzip', metadata.compression)
+        self.assertEqual(b'id: s7', hbread_bytes(self.zip + '!/schemas/s7.yaml', length=6))
+        with hbopen(self.zip + '!/schemas/s8.yaml') as f:
+            self.assertEqual('id: s8\n', f.readline())
+        with self.assertRaises(FileNotFoundError):
+            hbread(self.zip + '!/schemas/missing.yaml')
+
+    def test_one_open(self):
+        """ Reading every member of a large bundle opens and indexes the archive once """
+        for i in range(self.nfiles):
+            self.assertEqual(self.text(i), hbread(f'schemas/s{i}.yaml', base_path=self.zip + '!'))
+        self.assertEqual(1, self.archives.misses)
+        self.assertEqual(self.nfiles - 1, self.archives.hits)
+        self.assertEqual(1, len(self.archives))
+
+    def test_tar(self):
+        metadata = FileInfo()
+        self.assertEqual(self.text(3), hbread(self.tar + '!/schemas/s3.yaml', metadata))
+        self.assertEqual(self.tar + '!/schemas', metadata.base_path)
+        results = {}
+
+        def read(i: int) -> None:
+            results[i] = hbread(f's{i}.yaml', base_path=metadata.base_path)
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(100)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual({i: self.text(i) for i in range(100)}, results)
+        self.assertEqual(1, self.archives.misses)
+
+    def test_lru(self):
+        set_default_archive_cache(ArchiveCache(max_open=1))
+        archives = default_archive_cache()
+        f = hbopen(self.zip + '!/schemas/s1.yaml')
+        self.assertEqual(self.text(2), hbread(self.tar + '!/schemas/s2.yaml'))
+        # The zip has been evicted, but stays usable until its open member is closed
+        self.assertEqual(self.text(1), f.read())
+        f.close()
+        self.assertEqual(self.text(1), hbread(self.zip + '!/schemas/s1.yaml'))
+        self.assertEqual(3, archives.misses)
+
+    def test_changed(self):
+        cache = CachingReader()
+        location = self.zip + '!/schemas/s1.yaml'
+        self.assertEqual(self.text(1), hbread(location, cache=cache))
+        self.assertEqual(self.text(1), hbread(location, cache=cache))
+        self.assertEqual(1, cache.hits)
+        with zipfile.ZipFile(self.zip, 'w') as zf:
+            zf.writestr('schemas/s1.yaml', 'changed\n')
+        os.utime(self.zip, ns=(0, 0))
+        self.assertEqual('changed\n', hbread(location, cache=cache))
+        self.assertEqual(2, self.archives.misses)
+
+
+if __name__ == '__main__':
+    unittest.main()
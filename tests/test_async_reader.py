@@ -0,0 +1,104 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+import zipfile
+from urllib.error import HTTPError
+
+from hbreader import hbread_async, hbopen_async, hbread_many_async, bounded_gather, FileInfo, hbread, AsyncTextIO
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class AsyncReaderTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_non_url(self):
+        async def run():
+            self.assertEqual("Some\ntext", await hbread_async("Some\ntext"))
+            self.assertEqual("Some\ntext", await hbread_async(b"Some\ntext"))
+            metadata = FileInfo()
+            self.assertEqual(self.expected, await hbread_async('test data 1.txt', metadata, base_path=DATA_DIR))
+            self.assertEqual(28, metadata.source_file_size)
+            async with await hbopen_async(os.path.join(DATA_DIR, 'test data 1.txt')) as f:
+                self.assertEqual([self.expected], [line async for line in f])
+        asyncio.run(run())
+        # Subclasses supply _chunk
+        with self.assertRaises(TypeError):
+            AsyncTextIO()
+
+    def test_url(self):
+        async def run(base_url: str):
+            live = FileInfo()
+            hbread(base_url + 'test data 1.txt', live)
+            metadata = FileInfo()
+            self.assertEqual(self.expected, await hbread_async(base_url + 'test data 1.txt', metadata))
+            self.assertEqual(live, metadata)
+            self.assertEqual('a,é', await hbread_async('test_utf8.txt', base_path=metadata.base_path))
+            async with await hbopen_async('test_8859.txt', base_path=metadata.base_path, read_codec='latin-1') as f:
+                self.assertEqual('Some', await f.read(4))
+                self.assertEqual(' Text', await f.read(5))
+            with self.assertRaises(HTTPError) as e:
+                await hbread_async(base_url + 'missing.txt')
+            self.assertEqual(404, e.exception.code)
+        with LocalServer() as server:
+            asyncio.run(run(server.base_url))
+
+    def test_compressed(self):
+        """ Compressed URLs are decompressed the same way hbread does it """
+        async def run(base_url: str):
+            metadata = FileInfo()
+            self.assertEqual("hello gz\n", await hbread_async(base_url + 'hello.txt.gz', metadata))
+            self.assertEqual('gzip', metadata.compression)
+            self.assertEqual(9, metadata.uncompressed_size)
+            self.assertEqual("hello gz\n", await hbread_async(base_url + 'no_extension'))
+            self.assertEqual("BZh91 is my license plate\n", await hbread_async(base_url + 'plate.txt'))
+            self.assertEqual(hbread(base_url + 'two.jar', read_codec='latin-1'),
+                             await hbread_async(base_url + 'two.jar', read_codec='latin-1'))
+            results = await hbread_many_async([base_url + 'hello.txt.gz'] * 3)
+            self.assertEqual(["hello gz\n"] * 3, [r.text for r in results])
+            self.assertEqual(hbread(base_url + 'hello.txt.gz'), results[0].text)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for fname, data in (('hello.txt.gz', gzip.compress(b"hello gz\n")),
+                                ('no_extension', gzip.compress(b"hello gz\n")),
+                                ('plate.txt', b"BZh91 is my license plate\n")):
+                with open(os.path.join(tmpdir, fname), 'wb') as f:
+                    f.write(data)
+            with zipfile.ZipFile(os.path.join(tmpdir, 'two.jar'), 'w') as z:
+                z.writestr('a.txt', 'a')
+                z.writestr('b.txt', 'b')
+            with LocalServer(tmpdir) as server:
+                asyncio.run(run(server.base_url))
+
+    def test_many(self):
+        async def run(base_url: str):
+            sources = [base_url + 'test data 1.txt', 'test_utf8.txt', "Inline\ntext", base_url + 'missing.txt'] * 10
+            results = await hbread_many_async(sources, base_path=DATA_DIR, max_concurrency=4)
+            self.assertEqual(40, len(results))
+            utf8_text = hbread('test_utf8.txt', base_path=DATA_DIR)
+            self.assertEqual([self.expected, utf8_text, "Inline\ntext", None] * 10, [r.text for r in results])
+            self.assertEqual(sources, [r.source for r in results])
+            self.assertTrue(results[1].info.source_file.endswith('test_utf8.txt'))
+            self.assertIsInstance(results[3].error, HTTPError)
+            self.assertIsNone(results[0].error)
+        with LocalServer() as server:
+            asyncio.run(run(server.base_url))
+
+    def test_bounded_gather(self):
+        async def run():
+            running = peak = 0
+
+            async def task(i: int) -> int:
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.001)
+                running -= 1
+                return i
+            self.assertEqual(list(range(20)), await bounded_gather([task(i) for i in range(20)], 3))
+            self.assertEqual(3, peak)
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import time
+import unittest
+from urllib.error import HTTPError
+
+from hbreader import hbread_many, ConnectionPool
+from tests.local_server import LocalServer, DATA_DIR, _Handler
+
+
+class _SlowHandler(_Handler):
+    """ Tracks the number of simultaneous requests """
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+        time.sleep(0.02)
+        try:
+            super().do_GET()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+
+class BatchReaderTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_mixed_sources(self):
+        with LocalServer() as server, ConnectionPool() as pool:
+            sources = [server.base_url + 'test data 1.txt', 'test data 1.txt', "Inline\ntext", b'bytes',
+                       'test_missing.txt', server.base_url + 'missing.txt']
+            results = list(hbread_many(sources, base_path=DATA_DIR, pool=pool))
+            self.assertEqual(sources, [r.source for r in results])
+            self.assertEqual([self.expected, self.expected, "Inline\ntext", "bytes", None, None],
+                             [r.text for r in results])
+            self.assertEqual('28', results[0].info.source_file_size)
+            self.assertEqual(28, results[1].info.source_file_size)
+            self.assertIsInstance(results[4].error, FileNotFoundError)
+            self.assertIsInstance(results[5].error, HTTPError)
+
+            completed = list(hbread_many(sources, base_path=DATA_DIR, pool=pool, as_completed=True))
+            self.assertEqual(sorted(map(repr, sources)), sorted(repr(r.source) for r in completed))
+            # In-memory sources don't wait on the pool
+            self.assertEqual(["Inline\ntext", b'bytes'], [r.source for r in completed[:2]])
+
+    def test_per_host_limit(self):
+        with LocalServer(handler=_SlowHandler) as server, ConnectionPool(max_per_host=10) as pool:
+            server.httpd.active = server.httpd.peak = 0
+            sources = [server.base_url + 'test data 1.txt'] * 12
+            results = list(hbread_many(sources, max_workers=8, per_host_limit=2, pool=pool))
+            self.assertEqual([self.expected] * 12, [r.text for r in results])
+            self.assertEqual(2, server.httpd.peak)
+
+    def test_no_head_of_line_blocking(self):
+        """ Reads queued for a busy host don't hold up reads from other hosts """
+        with LocalServer(handler=_SlowHandler) as slow, LocalServer() as fast, ConnectionPool() as pool:
+            slow.httpd.active = slow.httpd.peak = 0
+            sources = [slow.base_url + 'test data 1.txt'] * 8 + [fast.base_url + 'test data 1.txt']
+            results = list(hbread_many(sources, max_workers=2, per_host_limit=1, as_completed=True, pool=pool))
+            self.assertEqual(sources[-1], results[0].source)
+            self.assertEqual([self.expected] * 9, [r.text for r in results])
+            self.assertEqual(1, slow.httpd.peak)
+
+
+if __name__ == '__main__':
+    unittest.main()
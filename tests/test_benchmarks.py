@@ -0,0 +1,33 @@
+import json
+import tempfile
+import unittest
+
+from tests import benchmarks
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    def test_run(self):
+        results = benchmarks.run(benchmarks.QUICK_SIZES, repeat=1, min_time=0)
+        for name in ('FileInfo()', 'detect_type/inline_1024', 'hbread/URL_1024', 'hbread/FILENAME_1024',
+                     'hbread/IO_1024', 'hbread/DECODABLE_1024', '_auto_decode/utf-16-bom_1024'):
+            self.assertIn(name, results['results'])
+        self.assertEqual(1, results['results']['FileInfo()']['repeat'])
+        json.dumps(results)
+
+    def test_fixtures(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fixtures = benchmarks.generate_fixtures(tmpdir, (100,))
+            with open(fixtures['utf8_100'], encoding='utf-8') as f:
+                self.assertEqual(100, len(f.read()))
+            with open(fixtures['utf16_100'], 'rb') as f:
+                self.assertTrue(f.read(2) in (b'\xff\xfe', b'\xfe\xff'))
+
+    def test_compare(self):
+        baseline = dict(results=dict(a=dict(median=1.0), b=dict(median=1.0), c=dict(median=0)))
+        current = dict(results=dict(a=dict(median=1.1), b=dict(median=2.0), c=dict(median=1.0), d=dict(median=1.0)))
+        self.assertEqual(['b'], benchmarks.compare(current, baseline))
+        self.assertEqual(['a', 'b'], benchmarks.compare(current, baseline, 1.05))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import gzip
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from hbreader import hbopen_binary, hbread_bytes, hbread, FileInfo
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class BytesTestCase(unittest.TestCase):
+    expected = b"I'm some friendly test data\n"
+
+    def test_in_memory(self):
+        data = b"Some\nbytes"
+        metadata = FileInfo()
+        self.assertIs(data, hbread_bytes(data, metadata))
+        self.assertEqual(10, metadata.source_file_size)
+        self.assertEqual('utf-8', metadata.encoding)
+        self.assertEqual(data, hbread_bytes(bytearray(data)))
+
+        self.assertEqual("Some\ntext".encode(), hbread_bytes("Some\ntext"))
+        metadata = FileInfo()
+        self.assertEqual("a,\né".encode('utf-16'), hbread_bytes("a,\né", metadata, read_codec='utf-16'))
+        self.assertEqual('utf-16', metadata.encoding)
+
+        metadata = FileInfo()
+        self.assertEqual(b'\xff\xfea\x00', hbread_bytes(b'\xff\xfea\x00', metadata))
+        self.assertEqual('utf-16', metadata.encoding)
+
+    def test_file(self):
+        metadata = FileInfo()
+        with hbopen_binary('test_utf8.txt', metadata, base_path=DATA_DIR) as f:
+            self.assertEqual(b'\xef\xbb\xbf', f.read(3))
+            self.assertEqual('a,é'.encode(), f.read())
+        self.assertEqual('utf-8-sig', metadata.encoding)
+        self.assertTrue(metadata.source_file.endswith('test_utf8.txt'))
+
+        metadata = FileInfo()
+        self.assertEqual(self.expected, hbread_bytes(os.path.join(DATA_DIR, 'test data 1.txt'), metadata))
+        text_metadata = FileInfo()
+        hbread(os.path.join(DATA_DIR, 'test data 1.txt'), text_metadata)
+        text_metadata.encoding = 'utf-8'
+        self.assertEqual(text_metadata, metadata)
+
+        # read_codec is reported, not applied
+        metadata = FileInfo()
+        raw = hbread_bytes('test_8859.txt', metadata, base_path=DATA_DIR, read_codec='latin-1')
+        self.assertEqual('latin-1', metadata.encoding)
+        self.assertEqual(hbread('test_8859.txt', base_path=DATA_DIR, read_codec='latin-1'), raw.decode('latin-1'))
+
+    def test_io(self):
+        fname = os.path.join(DATA_DIR, 'test data 1.txt')
+        with open(fname, 'rb') as f:
+            metadata = FileInfo()
+            self.assertEqual(self.expected, hbread_bytes(f, metadata))
+            self.assertEqual(fname, metadata.source_file)
+        with open(os.path.join(DATA_DIR, 'test_8859.txt'), encoding='latin-1') as f:
+            metadata = FileInfo()
+            text = f.read()
+            f.seek(0)
+            self.assertEqual(text.encode('latin-1'), hbread_bytes(f, metadata))
+            self.assertEqual('latin-1', metadata.encoding)
+
+        # In memory streams have no name, mode or file number
+        metadata = FileInfo()
+        self.assertEqual(b'abc', hbread_bytes(io.BytesIO(b'abc'), metadata))
+        self.assertIsNone(metadata.source_file)
+        self.assertIsNone(metadata.base_path)
+        self.assertEqual('a,é'.encode(), hbread_bytes(io.StringIO('a,é')))
+        metadata = FileInfo()
+        self.assertEqual('a,é', hbread(io.BytesIO('a,é'.encode()), metadata))
+        self.assertIsNone(metadata.source_file)
+        self.assertEqual('a,é', hbread(io.StringIO('a,é')))
+
+    def test_url(self):
+        with LocalServer() as server:
+            metadata = FileInfo()
+            with hbopen_binary(server.base_url + 'test data 1.txt', metadata) as f:
+                self.assertEqual(self.expected, f.read())
+            self.assertEqual(server.base_url + 'test%20data%201.txt', metadata.source_file)
+            self.assertEqual('utf-8', metadata.encoding)
+
+    def test_compressed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'data.txt.gz')
+            with gzip.open(fname, 'wb') as f:
+                f.write(self.expected)
+            metadata = FileInfo()
+            self.assertEqual(self.expected, hbread_bytes(fname, metadata, decompress=True))
+            self.assertEqual('gzip', metadata.compression)
+            self.assertEqual(len(self.expected), metadata.uncompressed_size)
+
+            # By default the bytes are returned as stored, and the compression is only reported
+            with open(fname, 'rb') as f:
+                stored = f.read()
+            metadata = FileInfo()
+            self.assertEqual(stored, hbread_bytes(fname, metadata))
+            self.assertEqual('gzip', metadata.compression)
+            self.assertIsNone(metadata.uncompressed_size)
+            with open(fname, 'rb') as f:
+                self.assertEqual(stored, hbread_bytes(f))
+
+            # Zip files that aren't declared as such are not unwrapped either way
+            docx = os.path.join(tmpdir, 'report.docx')
+            with zipfile.ZipFile(docx, 'w') as z:
+                z.writestr('word/document.xml', '<doc/>')
+                z.writestr('[Content_Types].xml', '<types/>')
+            with open(docx, 'rb') as f:
+                stored = f.read()
+            metadata = FileInfo()
+            self.assertEqual(stored, hbread_bytes(docx, metadata))
+            self.assertIsNone(metadata.compression)
+            self.assertEqual(stored, hbread_bytes(docx, decompress=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
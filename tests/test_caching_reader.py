@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from hbreader import hbread, FileInfo, CachingReader, ConnectionPool
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class CachingReaderTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_file_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test data 1.txt')
+            shutil.copy(os.path.join(DATA_DIR, 'test data 1.txt'), fname)
+            cache = CachingReader()
+            live = FileInfo()
+            self.assertEqual(self.expected, hbread(fname, live, cache=cache))
+            self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+            # Relative name through base_path resolves to the same entry and replays the FileInfo
+            replayed = FileInfo()
+            self.assertEqual(self.expected, cache.read('test data 1.txt', replayed, base_path=tmpdir))
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+            self.assertEqual(live, replayed)
+
+            # A change in the file invalidates the entry
+            with open(fname, 'w') as f:
+                f.write("Something else entirely\n")
+            os.utime(fname, ns=(0, os.stat(fname).st_mtime_ns + 1000000))
+            self.assertEqual("Something else entirely\n", hbread(fname, replayed.clear(), cache=cache))
+            self.assertEqual((1, 2), (cache.hits, cache.misses))
+            self.assertEqual(24, replayed.source_file_size)
+            self.assertEqual(1, len(cache))
+
+    def test_byte_budget(self):
+        cache = CachingReader(max_bytes=100)
+        for fname in ('test data 1.txt', 'test_utf8.txt', 'test data 1.txt'):
+            hbread(fname, base_path=DATA_DIR, cache=cache)
+        self.assertLessEqual(cache.size, 100)
+        self.assertEqual(1, len(cache))
+        self.assertEqual((0, 3), (cache.hits, cache.misses))
+
+    def test_strings_not_cached(self):
+        cache = CachingReader()
+        self.assertEqual("Some\ntext", hbread("Some\ntext", cache=cache))
+        self.assertEqual(0, len(cache))
+
+    def test_url_cache(self):
+        """ URL entries are revalidated with a conditional GET """
+        with LocalServer() as server, ConnectionPool() as pool:
+            cache = CachingReader()
+            live = FileInfo()
+            replayed = FileInfo()
+            self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', live, pool=pool, cache=cache))
+            self.assertEqual(self.expected, hbread('test data 1.txt', replayed, base_path=live.base_path, pool=pool,
+                                                   cache=cache))
+            self.assertEqual(live, replayed)
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+            self.assertIn('If-Modified-Since', server.requests[1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+import unittest
+import zipfile
+
+from hbreader import hbread, hbopen, hbread_bytes, FileInfo, ConnectionPool, HTTPCache
+from tests.local_server import LocalServer, _Handler
+
+
+class _GzipHandler(_Handler):
+    """ Sends every file with Content-Encoding: gzip """
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+        with open(self.translate_path(self.path), 'rb') as f:
+            body = gzip.compress(f.read())
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Last-Modified', 'Wed, 17 Feb 2021 17:01:09 GMT')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CompressionTestCase(unittest.TestCase):
+    text = "Some text that compresses\n" * 100 + "ÒtextÓ\n"
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        raw = self.text.encode()
+        with gzip.open(self.path('data.txt.gz'), 'wb') as f:
+            f.write(raw)
+        # Concatenated members
+        with open(self.path('multi.gz'), 'wb') as f:
+            f.write(gzip.compress(raw[:1000]) + gzip.compress(raw[1000:]))
+        with bz2.open(self.path('data.bz2'), 'wb') as f:
+            f.write(raw)
+        with lzma.open(self.path('data.xz'), 'wb') as f:
+            f.write(raw)
+        with zipfile.ZipFile(self.path('data.zip'), 'w', zipfile.ZIP_DEFLATED) as z:
+            z.writestr('inner/data.txt', raw)
+        with zipfile.ZipFile(self.path('two.zip'), 'w') as z:
+            z.writestr('a.txt', raw)
+            z.writestr('b.txt', raw)
+        # Compressed, but with no telltale extension
+        with open(self.path('no_extension'), 'wb') as f:
+            f.write(gzip.compress(raw))
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def path(self, fname: str) -> str:
+        return os.path.join(self.tmpdir.name, fname)
+
+    def test_files(self):
+        for fname, compression in (('data.txt.gz', 'gzip'), ('multi.gz', 'gzip'), ('data.bz2', 'bzip2'),
+                                   ('data.xz', 'xz'), ('data.zip', 'zip'), ('no_extension', 'gzip')):
+            metadata = FileInfo()
+            self.assertEqual(self.text, hbread(fname, metadata, base_path=self.tmpdir.name), fname)
+            self.assertEqual(compression, metadata.compression)
+            self.assertEqual(os.path.getsize(self.path(fname)), metadata.source_file_size)
+            self.assertEqual(len(self.text.encode()), metadata.uncompressed_size)
+            self.assertEqual(self.path(fname), metadata.source_file)
+            with hbopen(self.path(fname)) as f:
+                self.assertEqual(self.text.splitlines(True)[:2], [next(f), next(f)])
+            with open(self.path(fname), 'rb') as fp:
+                self.assertEqual(self.text, hbread(fp))
+        with self.assertRaises(ValueError):
+            hbread(self.path('two.zip'))
+
+    def test_lookalikes(self):
+        """ Plain data that happens to start with a magic number is read as is """
+        for fname, data in (('plate.txt', b'BZh91 is my license plate\n'), ('pk.txt', b'PK\x03\x04 and then some\n'),
+                            ('short', b'BZh9')):
+            with open(self.path(fname), 'wb') as f:
+                f.write(data)
+            metadata = FileInfo()
+            self.assertEqual(data.decode(), hbread(fname, metadata, base_path=self.tmpdir.name), fname)
+            self.assertIsNone(metadata.compression)
+            self.assertIsNone(metadata.uncompressed_size)
+            with open(self.path(fname), 'rb') as fp:
+                self.assertEqual(data.decode(), hbread(fp))
+            self.assertEqual(data, hbread_bytes(self.path(fname)))
+        # Zip is only unwrapped when declared, however many members it has
+        for fname, members in (('report.docx', ('word/document.xml', '[Content_Types].xml')), ('one.jar', ('a.txt',))):
+            with zipfile.ZipFile(self.path(fname), 'w') as z:
+                for member in members:
+                    z.writestr(member, 'member')
+            with open(self.path(fname), 'rb') as f:
+                stored = f.read()
+            metadata = FileInfo()
+            with hbopen(self.path(fname), metadata, read_codec='latin-1') as f:
+                self.assertEqual(stored.decode('latin-1'), f.read())
+            self.assertIsNone(metadata.compression)
+            with open(self.path(fname), 'rb') as fp:
+                self.assertEqual(stored.decode('latin-1'), hbread(fp, read_codec='latin-1'))
+        # When the extension says it is compressed, bad data is an error
+        with open(self.path('plate.bz2'), 'wb') as f:
+            f.write(b'BZh91 is my license plate\n')
+        with self.assertRaises(OSError):
+            hbread(self.path('plate.bz2'))
+
+    def test_uncompressed(self):
+        metadata = FileInfo()
+        hbread('test data 1.txt', metadata, base_path=os.path.join(os.path.dirname(__file__), 'data'))
+        self.assertIsNone(metadata.compression)
+        self.assertIsNone(metadata.uncompressed_size)
+
+    def test_url(self):
+        """ Compressed files served as is are decompressed too """
+        with LocalServer(self.tmpdir.name) as server, ConnectionPool() as pool:
+            metadata = FileInfo()
+            self.assertEqual(self.text, hbread(server.base_url + 'data.xz', metadata, pool=pool))
+            self.assertEqual('xz', metadata.compression)
+            self.assertEqual(str(os.path.getsize(self.path('data.xz'))), metadata.source_file_size)
+            self.assertEqual(len(self.text.encode()), metadata.uncompressed_size)
+            self.assertEqual('gzip', server.requests[0][1]['Accept-Encoding'])
+            # Connection goes back to the pool after a compressed read
+            self.assertEqual(self.text, hbread(server.base_url + 'data.txt.gz', pool=pool))
+            self.assertEqual(1, server.connections)
+
+    def test_content_encoding(self):
+        with open(self.path('plain.txt'), 'w') as f:
+            f.write(self.text)
+        with LocalServer(self.tmpdir.name, _GzipHandler) as server, ConnectionPool() as pool:
+            server.extra_headers['Cache-Control'] = 'max-age=60'
+            cache = HTTPCache(self.path('cache'))
+            for _ in range(2):
+                metadata = FileInfo()
+                self.assertEqual(self.text, hbread(server.base_url + 'plain.txt', metadata, pool=pool,
+                                                   http_cache=cache))
+                self.assertEqual('gzip', metadata.compression)
+                self.assertEqual(len(self.text.encode()), metadata.uncompressed_size)
+                self.assertLess(int(metadata.source_file_size), metadata.uncompressed_size)
+            # The second read came out of the cache, still compressed
+            self.assertEqual(1, len(server.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
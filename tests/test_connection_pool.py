@@ -0,0 +1,67 @@
+import unittest
+from urllib.error import HTTPError, URLError
+
+from hbreader import hbread, hbopen, FileInfo, ConnectionPool
+from tests.local_server import LocalServer
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_keep_alive(self):
+        """ Repeated reads from the same host reuse a single connection """
+        with LocalServer() as server, ConnectionPool() as pool:
+            metadata = FileInfo()
+            for _ in range(5):
+                self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', metadata.clear(),
+                                                       pool=pool))
+            self.assertEqual(self.expected, hbread('test data 1.txt', base_path=metadata.base_path, pool=pool))
+            self.assertEqual(1, server.connections)
+            self.assertEqual(1, pool.idle_count())
+            self.assertEqual(server.base_url + 'test%20data%201.txt', metadata.source_file)
+            self.assertEqual('28', metadata.source_file_size)
+            pool.close()
+            self.assertEqual(0, pool.idle_count())
+
+    def test_partial_read(self):
+        """ A response that isn't read to the end can't be reused """
+        with LocalServer() as server, ConnectionPool() as pool:
+            with hbopen(server.base_url + 'test data 1.txt', pool=pool) as f:
+                self.assertEqual("I'm", f.read(3))
+            self.assertEqual(0, pool.idle_count())
+            self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', pool=pool))
+            self.assertEqual(2, server.connections)
+
+    def test_idle_eviction(self):
+        with LocalServer() as server, ConnectionPool(idle_timeout=0) as pool:
+            for _ in range(3):
+                hbread(server.base_url + 'test data 1.txt', pool=pool)
+            self.assertEqual(3, server.connections)
+
+    def test_max_per_host(self):
+        """ Holding more than max_per_host responses open never waits.  Only max_per_host are kept for reuse """
+        with LocalServer() as server, ConnectionPool(max_per_host=2) as pool:
+            handles = [hbopen(server.base_url + 'test data 1.txt', pool=pool) for _ in range(5)]
+            self.assertEqual([self.expected] * 5, [f.read() for f in handles])
+            for f in handles:
+                f.close()
+            self.assertEqual(5, server.connections)
+            self.assertEqual(2, pool.idle_count())
+            for _ in range(3):
+                self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', pool=pool))
+            self.assertEqual(5, server.connections)
+
+    def test_errors(self):
+        with LocalServer() as server, ConnectionPool() as pool:
+            with self.assertRaises(HTTPError) as e:
+                hbread(server.base_url + 'missing.txt', pool=pool)
+            self.assertEqual(404, e.exception.code)
+            self.assertIn('missing.txt', str(e.exception))
+            self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', pool=pool))
+            port = server.httpd.server_address[1]
+        with self.assertRaises(URLError):
+            hbread(f'http://127.0.0.1:{port}/test data 1.txt', pool=ConnectionPool())
+
+
+if __name__ == '__main__':
+    unittest.main()
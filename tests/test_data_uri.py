@@ -0,0 +1,84 @@
+import base64
+import os
+import pathlib
+import unittest
+
+from hbreader import hbread, hbopen, hbopen_binary, hbread_bytes, hbread_buffer, detect_type, default_str_tester, \
+    HBType, FileInfo, MAX_LOCATION_LEN
+from hbreader.data_uri import is_data_uri, decode_data_uri
+from tests.local_server import DATA_DIR
+from tests.test_lazy_imports import loaded_after
+
+
+class DataURITestCase(unittest.TestCase):
+    def test_detect(self):
+        for uri in ['data:,Hello', 'data:text/plain,Hello%20World', 'data:text/plain;charset=utf-8;base64,SGk=',
+                    'data:;base64,SGk=', 'DATA:application/json,{}']:
+            self.assertTrue(is_data_uri(uri), uri)
+            self.assertIs(HBType.DATA_URI, detect_type(uri))
+        for s in ['data: some yaml', 'data:\n  - a', 'data:,first\nsecond', 'data.txt', 'data:text/plain']:
+            self.assertFalse(is_data_uri(s), s)
+            self.assertIsNot(HBType.DATA_URI, detect_type(s))
+        # Data URIs are data, however long they are
+        self.assertIs(HBType.DATA_URI, detect_type('data:,' + 'x' * MAX_LOCATION_LEN))
+        # The caller's classifier has the last word
+        self.assertIs(HBType.STRING, detect_type('data:,Hello', is_actual_data=lambda _: True))
+        self.assertEqual('data:text/plain,hello', hbread('data:text/plain,hello', is_actual_data=lambda _: True))
+        self.assertFalse(default_str_tester('data:,' + 'x' * MAX_LOCATION_LEN))
+
+    def test_decode(self):
+        self.assertEqual((b'Hello World', None), decode_data_uri('data:text/plain,Hello%20World'))
+        self.assertEqual((b'Hi', 'utf-8'), decode_data_uri('data:text/plain;charset=utf-8;base64,SGk='))
+        self.assertEqual((b'Hi', None), decode_data_uri('data:;base64,SGk'))
+        with self.assertRaises(ValueError):
+            decode_data_uri('data:text/plain')
+
+    def test_read(self):
+        text = 'id: é\nimports:\n  - types\n'
+        uri = 'data:text/yaml;base64,' + base64.b64encode(text.encode()).decode()
+        metadata = FileInfo()
+        self.assertEqual(text, hbread(uri, metadata))
+        self.assertEqual(len(text.encode()), metadata.source_file_size)
+        with hbopen(uri) as f:
+            self.assertEqual(text, f.read())
+        self.assertEqual('', hbread('data:,'))
+        self.assertEqual('café', hbread('data:text/plain;charset=latin-1,caf%E9'))
+        self.assertEqual(text.encode(), hbopen_binary(uri).read())
+        self.assertEqual(b'imports', hbread_bytes(uri, offset=7, length=7))
+        self.assertEqual(text.encode(), bytes(hbread_buffer(uri)))
+        big = 'data:,' + 'x' * 2 * MAX_LOCATION_LEN
+        self.assertEqual(2 * MAX_LOCATION_LEN, len(hbread(big)))
+
+
+class FileURLTestCase(unittest.TestCase):
+    fname = os.path.join(DATA_DIR, 'test data 1.txt')
+
+    def test_file_url(self):
+        url = pathlib.Path(self.fname).as_uri()
+        self.assertIs(HBType.FILENAME, detect_type(url))
+        metadata = FileInfo()
+        self.assertEqual("I'm some friendly test data\n", hbread(url, metadata))
+        self.assertEqual(self.fname, metadata.source_file)
+        self.assertEqual(DATA_DIR, metadata.base_path)
+        self.assertEqual(os.path.getsize(self.fname), metadata.source_file_size)
+
+    def test_base_path(self):
+        base = pathlib.Path(DATA_DIR).as_uri()
+        self.assertIs(HBType.FILENAME, detect_type('test data 1.txt', base))
+        self.assertIs(HBType.URL, detect_type('http://example.org/a', base))
+        self.assertEqual("I'm some friendly test data\n", hbread('test data 1.txt', base_path=base))
+        self.assertEqual("I'm some friendly test data\n", hbread('test data 1.txt', base_path=base + '/'))
+
+    def test_no_network_stack(self):
+        code = f"""
+import pathlib
+from hbreader import hbread
+hbread(pathlib.Path({self.fname!r}).as_uri())
+hbread('test data 1.txt', base_path=pathlib.Path({DATA_DIR!r}).as_uri())
+hbread('data:text/plain;base64,SGk=')
+"""
+        self.assertEqual([], loaded_after(code))
+
+
+if __name__ == '__main__':
+    unittest.main()
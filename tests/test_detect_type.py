@@ -0,0 +1,52 @@
+import os
+import unittest
+from unittest import mock
+
+from hbreader import detect_type, default_str_tester, hbread, hbopen, hbread_many, HBType, FileInfo, \
+    MAX_LOCATION_LEN
+from tests.local_server import DATA_DIR
+
+
+def _original_str_tester(s: str) -> bool:
+    return not s.strip() or any(c in s for c in ['\r', '\n', '\t', '  ', '"', "'"])
+
+
+class DetectTypeTestCase(unittest.TestCase):
+    def test_str_tester(self):
+        for s in ['', ' ', '\n', ' \t ', 'abc', 'a b', 'a  b', 'a\nb', 'a\rb', 'a\tb', 'say "hi"', "it's",
+                  'test data 1.txt', 'https://example.org/a b', '　', 'x' * 1000 + '\n', 'a b', ' x ']:
+            self.assertEqual(_original_str_tester(s), default_str_tester(s), repr(s))
+
+    def test_bounded(self):
+        self.assertFalse(default_str_tester('x' * MAX_LOCATION_LEN))
+        self.assertTrue(default_str_tester('x' * (MAX_LOCATION_LEN + 1)))
+        self.assertIs(HBType.STRING, detect_type('http://' + 'x' * MAX_LOCATION_LEN))
+        self.assertIs(HBType.URL, detect_type('http://example.org/' + 'x' * 1000))
+
+    def test_precomputed_type(self):
+        tester = mock.Mock(side_effect=default_str_tester)
+        self.assertEqual("I'm some friendly test data\n",
+                         hbread('test data 1.txt', base_path=DATA_DIR, is_actual_data=tester))
+        self.assertEqual(1, tester.call_count)
+
+        tester.reset_mock()
+        metadata = FileInfo()
+        self.assertEqual("I'm some friendly test data\n",
+                         hbread('test data 1.txt', metadata, base_path=DATA_DIR, is_actual_data=tester,
+                                source_type=HBType.FILENAME))
+        self.assertEqual(0, tester.call_count)
+        self.assertEqual(os.path.join(DATA_DIR, 'test data 1.txt'), metadata.source_file)
+
+        # The caller's classification wins
+        with hbopen('abc', source_type=HBType.STRING) as f:
+            self.assertEqual('abc', f.read())
+
+    def test_many_classifies_once(self):
+        tester = mock.Mock(side_effect=default_str_tester)
+        results = list(hbread_many(['test data 1.txt', 'a\nb'], base_path=DATA_DIR, is_actual_data=tester))
+        self.assertEqual(["I'm some friendly test data\n", 'a\nb'], [r.text for r in results])
+        self.assertEqual(2, tester.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import unittest
+
+from hbreader import hbread, hbopen, FileInfo, CachingReader
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class DigestTestCase(unittest.TestCase):
+    fname = os.path.join(DATA_DIR, 'test data 1.txt')
+
+    def setUp(self) -> None:
+        with open(self.fname, 'rb') as f:
+            self.data = f.read()
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+
+    def check(self, metadata: FileInfo, data: bytes = None) -> None:
+        data = self.data if data is None else data
+        self.assertEqual({'sha256': hashlib.sha256(data).hexdigest()}, metadata.digests)
+        self.assertEqual(len(data), metadata.bytes_read)
+
+    def test_file(self):
+        metadata = FileInfo()
+        self.assertEqual(self.data.decode(), hbread(self.fname, metadata, digest='sha256'))
+        self.check(metadata)
+        hbread(self.fname, metadata.clear(), digest=('sha256', 'md5'))
+        self.assertEqual({'sha256': self.sha256, 'md5': hashlib.md5(self.data).hexdigest()}, metadata.digests)
+        hbread(self.fname, metadata.clear())
+        self.assertIsNone(metadata.digests)
+        with hbopen(self.fname, metadata.clear(), mmap=True, digest='sha256') as f:
+            f.read()
+        self.check(metadata)
+        hbread(self.fname, digest='sha256')
+
+        with hbopen(self.fname, metadata.clear(), digest='sha256') as f:
+            f.read(3)
+            self.assertIsNone(metadata.digests)
+            f.read()
+        self.check(metadata)
+
+        hbread(self.fname, metadata.clear(), offset=4, length=10, digest='sha256')
+        self.check(metadata, self.data[4:14])
+
+    def test_compressed(self):
+        """ The digest is of the content, not of its compressed form """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            gz = os.path.join(tmpdir, 'data.txt.gz')
+            with open(gz, 'wb') as f:
+                f.write(gzip.compress(self.data))
+            metadata = FileInfo()
+            hbread(gz, metadata, digest='sha256')
+            self.check(metadata)
+            self.assertEqual('gzip', metadata.compression)
+
+    def test_url(self):
+        with LocalServer() as server:
+            metadata = FileInfo()
+            hbread(server.base_url + 'test data 1.txt', metadata, digest='sha256')
+            self.check(metadata)
+            server.extra_headers['Cache-Control'] = 'max-age=0'
+            server.extra_headers['ETag'] = '"abc"'
+            cache = CachingReader()
+            hbread(server.base_url + 'test data 1.txt', metadata.clear(), cache=cache)
+            self.assertIsNone(metadata.digests)
+            for _ in range(2):
+                hbread(server.base_url + 'test data 1.txt', metadata.clear(), cache=cache, digest='sha256')
+                self.check(metadata)
+
+    def test_cache(self):
+        cache = CachingReader()
+        metadata = FileInfo()
+        hbread(self.fname, metadata, cache=cache)
+        self.assertIsNone(metadata.digests)
+        for _ in range(2):
+            hbread(self.fname, metadata.clear(), cache=cache, digest='sha256')
+            self.check(metadata)
+        self.assertEqual(1, cache.hits)
+
+    def test_in_memory(self):
+        metadata = FileInfo()
+        hbread("Some\ntext é", metadata, digest='sha256')
+        self.check(metadata, "Some\ntext é".encode())
+        hbread(b"Some\nbytes", metadata.clear(), digest='sha256')
+        self.check(metadata, b"Some\nbytes")
+        with hbopen("Some\ntext", metadata.clear(), digest='sha256') as f:
+            f.read()
+        self.check(metadata, b"Some\ntext")
+
+    def test_io(self):
+        metadata = FileInfo()
+        with open(self.fname, 'rb') as f:
+            hbread(f, metadata, digest='sha256')
+        self.check(metadata)
+        with open(self.fname, encoding='utf-8') as f:
+            hbread(f, metadata.clear(), digest='sha256')
+        self.check(metadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import dataclasses
+import gc
+import os
+import pickle
+import unittest
+
+from hbreader import FileInfo, Pathilizer
+
+
+class FileInfoTestCase(unittest.TestCase):
+    def tearDown(self):
+        FileInfo.rel_offset = None
+
+    def test_locked(self):
+        info = FileInfo()
+        with self.assertRaises(AttributeError):
+            info.source_fil = 'x'
+        with self.assertRaises(AttributeError):
+            info.rel_offset = '/'
+        self.assertFalse(hasattr(info, '__dict__'))
+
+    def test_fields(self):
+        info = FileInfo('/a/b/c.txt', 'today', 17, '/a/b')
+        self.assertEqual(('/a/b/c.txt', 'today', 17, '/a/b') + (None,) * (len(FileInfo.field_names) - 4), info.values())
+        self.assertEqual(len(FileInfo.field_names), len(info.values()))
+        self.assertTrue(repr(info).startswith("FileInfo(source_file='/a/b/c.txt', source_file_date='today', "
+                                              "source_file_size=17, base_path='/a/b', compression=None"))
+        self.assertEqual(FileInfo('/a/b/c.txt', 'today', 17, '/a/b'), info)
+        self.assertNotEqual(FileInfo('/a/b/c.txt'), info)
+        self.assertEqual(info, pickle.loads(pickle.dumps(info)))
+        self.assertIs(info, info.clear())
+        self.assertEqual(FileInfo(), info)
+
+    def test_dataclass(self):
+        info = FileInfo('/a/b/c.txt', base_path='/a/b', encoding='utf-8')
+        self.assertTrue(dataclasses.is_dataclass(info))
+        self.assertEqual(FileInfo.field_names, tuple(f.name for f in dataclasses.fields(info)))
+        self.assertEqual(dict(zip(FileInfo.field_names, info.values())), dataclasses.asdict(info))
+        other = dataclasses.replace(info, encoding='latin-1')
+        self.assertEqual('latin-1', other.encoding)
+        self.assertIsInstance(other.base_path, Pathilizer)
+        self.assertEqual(info.values()[:6], other.values()[:6])
+
+    def test_paths(self):
+        info = FileInfo(source_file=os.path.join('/a', 'b', 'c.txt'), base_path=os.path.join('/a', 'b'))
+        self.assertIsInstance(info.source_file, Pathilizer)
+        self.assertEqual(os.path.join('/a', 'b', 'c.txt'), str(info.source_file))
+        self.assertIs(str, type(str(info.source_file)))
+        FileInfo.rel_offset = '/a'
+        self.assertEqual(os.path.join('b', 'c.txt'), str(info.source_file))
+        self.assertEqual('b', str(info.base_path))
+        # The value itself is untouched
+        self.assertEqual(os.path.join('/a', 'b', 'c.txt'), info.source_file)
+        FileInfo.rel_offset = None
+        self.assertEqual(os.path.join('/a', 'b'), str(info.base_path))
+
+        # Paths are shared, not re-wrapped
+        other = FileInfo()
+        other.source_file = info.source_file
+        self.assertIs(info.source_file, other.source_file)
+
+    def test_no_cycles(self):
+        gc.collect()
+        gc.disable()
+        try:
+            for i in range(100):
+                FileInfo(source_file=f'/data/{i}.txt', base_path='/data')
+            self.assertEqual(0, gc.collect())
+        finally:
+            gc.enable()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from hbreader import hbread, hbopen, FileInfo, HTTPCache, ConnectionPool
+from tests.local_server import LocalServer
+
+
+class HTTPCacheTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmpdir.name, 'cache')
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_revalidation(self):
+        """ A repeat read sends a conditional GET and serves the 304 from disk """
+        with LocalServer() as server, ConnectionPool() as pool:
+            cache = HTTPCache(self.cache_dir)
+            url = server.base_url + 'test data 1.txt'
+            live = FileInfo()
+            self.assertEqual(self.expected, hbread(url, live, pool=pool, http_cache=cache))
+            self.assertEqual(1, len(cache))
+            cached = FileInfo()
+            self.assertEqual(self.expected, hbread(url, cached, pool=pool, http_cache=cache))
+            self.assertEqual(live, cached)
+            self.assertEqual(2, len(server.requests))
+            self.assertNotIn('If-Modified-Since', server.requests[0][1])
+            self.assertIn('If-Modified-Since', server.requests[1][1])
+
+            # The cache persists across instances
+            self.assertEqual(self.expected, hbread(url, pool=pool, http_cache=HTTPCache(self.cache_dir)))
+            self.assertIn('If-Modified-Since', server.requests[2][1])
+
+    def test_body_files(self):
+        """ A 304 rewrites the metadata and leaves the body alone.  A new body replaces the old one """
+        fname = os.path.join(self.tmpdir.name, 'data.txt')
+        with open(fname, 'w') as f:
+            f.write(self.expected)
+        with LocalServer(self.tmpdir.name) as server, ConnectionPool() as pool:
+            cache = HTTPCache(self.cache_dir)
+            url = server.base_url + 'data.txt'
+            hbread(url, pool=pool, http_cache=cache)
+            entry = cache.lookup(cache.key(url))
+            body_stat = os.stat(entry.path)
+            hbread(url, pool=pool, http_cache=cache)
+            revalidated = cache.lookup(entry.key)
+            self.assertEqual(entry.path, revalidated.path)
+            self.assertEqual(body_stat, os.stat(entry.path))
+            self.assertGreater(revalidated.stored_at, entry.stored_at)
+
+            with open(fname, 'w') as f:
+                f.write("Changed\n")
+            os.utime(fname, (body_stat.st_mtime + 3600, body_stat.st_mtime + 3600))
+            self.assertEqual("Changed\n", hbread(url, pool=pool, http_cache=cache))
+            self.assertNotEqual(entry.path, cache.lookup(entry.key).path)
+            self.assertFalse(os.path.exists(entry.path))
+            self.assertEqual(2, len(os.listdir(self.cache_dir)))
+            self.assertEqual("Changed\n", hbread(url, pool=pool, http_cache=HTTPCache(self.cache_dir)))
+
+    def test_max_age(self):
+        """ Fresh entries are served without touching the network """
+        with LocalServer() as server, ConnectionPool() as pool:
+            server.extra_headers['Cache-Control'] = 'public, max-age=60'
+            cache = HTTPCache(self.cache_dir)
+            url = server.base_url + 'test data 1.txt'
+            for _ in range(3):
+                self.assertEqual(self.expected, hbread(url, pool=pool, http_cache=cache))
+            self.assertEqual(1, len(server.requests))
+            # A different accept header is a different entry
+            self.assertEqual(self.expected, hbread(url, accept_header='text/plain', pool=pool, http_cache=cache))
+            self.assertEqual(2, len(server.requests))
+
+    def test_no_store(self):
+        with LocalServer() as server, ConnectionPool() as pool:
+            server.extra_headers['Cache-Control'] = 'no-store'
+            cache = HTTPCache(self.cache_dir)
+            self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', pool=pool, http_cache=cache))
+            self.assertEqual(0, len(cache))
+
+    def test_partial_read(self):
+        """ Incomplete bodies are not cached """
+        with LocalServer() as server, ConnectionPool() as pool:
+            cache = HTTPCache(self.cache_dir)
+            with hbopen(server.base_url + 'test data 1.txt', pool=pool, http_cache=cache) as f:
+                f.read(5)
+            self.assertEqual(0, len(cache))
+            self.assertEqual([], [f for f in os.listdir(self.cache_dir)])
+
+    def test_lru_eviction(self):
+        with LocalServer() as server, ConnectionPool() as pool:
+            cache = HTTPCache(self.cache_dir, max_size=700)
+            for fname in ('test data 1.txt', 'test_utf8.txt', 'test data 1.txt', 'test_8859.txt'):
+                hbread(server.base_url + fname, pool=pool, http_cache=cache, read_codec='latin-1')
+            self.assertLessEqual(cache.size, 700)
+            self.assertEqual(2, len(cache))
+            self.assertIsNotNone(cache.lookup(cache.key(server.base_url + 'test%20data%201.txt')))
+            self.assertIsNone(cache.lookup(cache.key(server.base_url + 'test_utf8.txt')))
+            self.assertIsNotNone(cache.lookup(cache.key(server.base_url + 'test_8859.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
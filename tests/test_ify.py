@@ -109,9 +109,9 @@ class HBReaderTestCase(unittest.TestCase):
             self.assertEqual('a,é', f.read())
         with hbopen(open(os.path.join(self.data_dir, 'test_empty.txt'), 'rb')) as f:
             self.assertEqual('', f.read())
-        with self.assertRaises(UnicodeDecodeError):
-            with hbopen(open(os.path.join(self.data_dir, 'test_utf8.txt'), 'rb')) as f:
-                self.assertEqual('Some Text	With weird  ÒtextÓ	And single ÔquotesÕ', f.read(2))
+        # Partial reads carry the BOM and split characters over from one read to the next
+        with hbopen(open(os.path.join(self.data_dir, 'test_utf8.txt'), 'rb')) as f:
+            self.assertEqual(['a', ',', 'é'], list(iter(lambda: f.read(2), '')))
 
     def test_non_with(self):
         """ Test the non-with branches of the process """
@@ -0,0 +1,120 @@
+import gzip
+import os
+import tempfile
+import unittest
+from urllib.error import HTTPError
+
+from hbreader import hbread, hbopen, FileInfo, LatencyCollector, ReadEvent, add_hook, remove_hook, instrumented
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_url(self):
+        events = []
+        with LocalServer() as server, instrumented(events.append):
+            metadata = FileInfo()
+            self.assertEqual(self.expected, hbread(server.base_url + 'test data 1.txt', metadata))
+        self.assertEqual(['start', 'resolved', 'connected', 'headers', 'first_byte', 'done'],
+                         [e.event for e in events])
+        self.assertEqual(server.base_url + 'test%20data%201.txt', events[-1].location)
+        self.assertEqual({'url'}, {e.source_type for e in events})
+        self.assertEqual(28, events[-1].nbytes)
+        self.assertEqual(sorted(e.elapsed for e in events), [e.elapsed for e in events])
+        self.assertEqual(28, metadata.bytes_read)
+        self.assertTrue(0 < metadata.connect_time <= metadata.headers_time <= metadata.first_byte_time <=
+                        metadata.total_time)
+
+    def test_error(self):
+        events = []
+        with LocalServer() as server, instrumented(events.append):
+            with self.assertRaises(HTTPError):
+                hbread(server.base_url + 'missing.txt')
+            with self.assertRaises(FileNotFoundError):
+                hbread('missing.txt', base_path=DATA_DIR)
+        errors = [e for e in events if e.event == 'error']
+        self.assertEqual(2, len(errors))
+        self.assertIsInstance(errors[0].error, HTTPError)
+        self.assertEqual(os.path.join(DATA_DIR, 'missing.txt'), errors[1].location)
+        self.assertNotIn('done', [e.event for e in events])
+
+    def test_file_and_io(self):
+        events = []
+        with instrumented(events.append):
+            metadata = FileInfo()
+            self.assertEqual(self.expected, hbread('test data 1.txt', metadata, base_path=DATA_DIR))
+            self.assertEqual(28, metadata.bytes_read)
+            self.assertEqual(['start', 'resolved', 'connected', 'headers', 'first_byte', 'done'],
+                             [e.event for e in events])
+            events.clear()
+            with open(os.path.join(DATA_DIR, 'test_utf8.txt'), 'rb') as f:
+                self.assertEqual('a,é', hbread(f))
+            self.assertEqual(['start', 'resolved', 'first_byte', 'done'], [e.event for e in events])
+            self.assertEqual(7, events[-1].nbytes)
+            events.clear()
+            # Text handles are counted in characters
+            with open(os.path.join(DATA_DIR, 'test data 1.txt')) as f:
+                with hbopen(f) as tf:
+                    self.assertEqual("I'm", tf.read(3))
+                    self.assertEqual(self.expected[3:], tf.read())
+                self.assertEqual('done', events[-1].event)
+                self.assertEqual(28, events[-1].nbytes)
+            events.clear()
+            # Compressed content is counted after decompression
+            with tempfile.TemporaryDirectory() as tmpdir:
+                fname = os.path.join(tmpdir, 'data.gz')
+                with gzip.open(fname, 'wb') as f:
+                    f.write(self.expected.encode())
+                with open(fname, 'rb') as f:
+                    self.assertEqual(self.expected, hbread(f))
+            self.assertEqual(28, events[-1].nbytes)
+            events.clear()
+            # In-memory sources aren't instrumented
+            hbread("Some\ntext")
+            self.assertEqual([], events)
+
+    def test_abandoned(self):
+        events = []
+        with instrumented(events.append):
+            with hbopen('test data 1.txt', base_path=DATA_DIR) as f:
+                f.read(1)
+        self.assertEqual('done', events[-1].event)
+
+    def test_no_hooks(self):
+        events = []
+        add_hook(events.append)
+        remove_hook(events.append)
+        metadata = FileInfo()
+        hbread('test data 1.txt', metadata, base_path=DATA_DIR)
+        self.assertEqual([], events)
+        self.assertIsNone(metadata.total_time)
+        self.assertIsNone(metadata.bytes_read)
+
+    def test_collector(self):
+        collector = LatencyCollector()
+        with LocalServer() as server, instrumented(collector):
+            for _ in range(3):
+                hbread(server.base_url + 'test data 1.txt')
+            hbread('test data 1.txt', base_path=DATA_DIR)
+            with self.assertRaises(HTTPError):
+                hbread(server.base_url + 'missing.txt')
+        stats = collector.dump()
+        host = server.base_url.split('/')[2]
+        self.assertEqual({host, 'filename'}, set(stats['hosts']))
+        self.assertEqual({'url', 'filename'}, set(stats['types']))
+        self.assertEqual(3, stats['hosts'][host]['latency']['count'])
+        self.assertEqual(3, sum(stats['hosts'][host]['latency']['buckets'].values()))
+        self.assertEqual(3, stats['hosts'][host]['first_byte']['count'])
+        self.assertEqual(1, stats['hosts'][host]['errors'])
+        self.assertEqual(84, stats['types']['url']['bytes'])
+        self.assertEqual(1, stats['types']['filename']['latency']['count'])
+
+        collector(ReadEvent('done', 'url', 'http://Example.ORG/x', 12.0, 1))
+        self.assertEqual({'inf': 1}, collector.dump()['hosts']['example.org']['latency']['buckets'])
+        collector.clear()
+        self.assertEqual(dict(hosts={}, types={}), collector.dump())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import hbreader
+from tests.local_server import DATA_DIR
+
+# Modules that a plain `import hbreader` -- and reading local files -- must not drag in
+DEFERRED = ['ssl', 'http.client', 'urllib.request', 'urllib.error', 'asyncio', 'concurrent.futures', 'json',
+            'email', 'zipfile', 'bz2', 'lzma', 'hashlib', 'tempfile']
+
+
+def loaded_after(code: str) -> list:
+    """ DEFERRED modules that are loaded after running code in a fresh interpreter """
+    check = f"import sys\n{code}\nprint(' '.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', check], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return result.stdout.split()
+
+
+class LazyImportTestCase(unittest.TestCase):
+    def test_import(self):
+        self.assertEqual([], loaded_after("import hbreader"))
+        self.assertEqual([], loaded_after("from hbreader import hbread, hbopen, FileInfo, HBType"))
+
+    def test_local_reads(self):
+        code = f"""
+import os
+from hbreader import hbread, hbopen
+hbread("Some\\ntext")
+hbread(b"Some\\nbytes")
+hbread('test data 1.txt', base_path={DATA_DIR!r})
+with open(os.path.join({DATA_DIR!r}, 'test data 1.txt')) as f:
+    hbread(f)
+"""
+        self.assertEqual([], loaded_after(code))
+
+    def test_lazy_names(self):
+        from hbreader.connection_pool import ConnectionPool
+        from hbreader.batch_reader import hbread_many
+        from hbreader.async_reader import hbread_async
+        self.assertIs(ConnectionPool, hbreader.ConnectionPool)
+        self.assertIs(hbread_many, hbreader.hbread_many)
+        self.assertIs(hbread_async, hbreader.hbread_async)
+        for name in hbreader.__all__:
+            self.assertTrue(hasattr(hbreader, name), name)
+        with self.assertRaises(AttributeError):
+            hbreader.no_such_thing
+        self.assertIn('ssl', loaded_after("from hbreader import ConnectionPool"))
+
+
+if __name__ == '__main__':
+    unittest.main()
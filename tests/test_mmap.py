@@ -0,0 +1,55 @@
+import gzip
+import mmap
+import os
+import tempfile
+import unittest
+
+from hbreader import hbopen, hbread_buffer, hbread, FileInfo
+from tests.local_server import DATA_DIR
+
+
+class MMapTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_buffer(self):
+        metadata = FileInfo()
+        with hbread_buffer('test data 1.txt', metadata, base_path=DATA_DIR) as buf:
+            self.assertIsInstance(buf, mmap.mmap)
+            self.assertEqual(self.expected.encode(), buf[:])
+            self.assertEqual(4, buf.find(b'some'))
+            self.assertEqual(b'some', bytes(memoryview(buf)[4:8]))
+        self.assertEqual('utf-8', metadata.encoding)
+        file_metadata = FileInfo()
+        hbread('test data 1.txt', file_metadata, base_path=DATA_DIR)
+        file_metadata.encoding = 'utf-8'
+        self.assertEqual(file_metadata, metadata)
+
+        self.assertEqual(b'', hbread_buffer(os.path.join(DATA_DIR, 'test_empty.txt')))
+        data = b"Some\nbytes"
+        self.assertIs(data, hbread_buffer(data).obj)
+        self.assertEqual("Some\ntext".encode('utf-16'), hbread_buffer("Some\ntext", read_codec='utf-16'))
+
+    def test_compressed_buffer(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'data.gz')
+            with gzip.open(fname, 'wb') as f:
+                f.write(self.expected.encode())
+            self.assertEqual(self.expected.encode(), hbread_buffer(fname, decompress=True))
+            with open(fname, 'rb') as f, hbread_buffer(fname) as buf:
+                self.assertEqual(f.read(), buf[:])
+
+    def test_mapped_text(self):
+        metadata = FileInfo()
+        with hbopen('test data 1.txt', metadata, base_path=DATA_DIR, mmap=True) as f:
+            self.assertEqual("I'm", f.read(3))
+            self.assertEqual(" some friendly test data\n", f.readline())
+            self.assertEqual('', f.read())
+        self.assertEqual(28, metadata.source_file_size)
+        with hbopen(os.path.join(DATA_DIR, 'test_8859.txt'), read_codec='latin-1', mmap=True) as f:
+            self.assertEqual(hbread(os.path.join(DATA_DIR, 'test_8859.txt'), read_codec='latin-1'), f.read())
+        with hbopen(os.path.join(DATA_DIR, 'test_empty.txt'), mmap=True) as f:
+            self.assertEqual('', f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
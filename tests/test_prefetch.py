@@ -0,0 +1,106 @@
+import os
+import re
+import tempfile
+import time
+import unittest
+from collections import Counter
+
+from hbreader import PrefetchingReader, FileInfo, ConnectionPool
+from tests.local_server import LocalServer, _Handler
+
+IMPORT_RE = re.compile(r'^  - (.+)$', re.MULTILINE)
+
+
+def imports(text: str, _: FileInfo) -> list:
+    return IMPORT_RE.findall(text)
+
+
+class _SlowHandler(_Handler):
+    """ Every GET takes a tenth of a second """
+    def do_GET(self):
+        time.sleep(0.1)
+        super().do_GET()
+
+
+class PrefetchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # root imports a chain of 8 documents in subdirectories, plus a cycle
+        self.write('root.yaml', ['chain/d0.yaml', 'cycle/a.yaml'])
+        for i in range(8):
+            self.write(f'chain/d{i}.yaml', [f'd{i + 1}.yaml'] if i < 7 else [])
+        self.write('cycle/a.yaml', ['b.yaml'])
+        self.write('cycle/b.yaml', ['a.yaml', '../root.yaml'])
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def write(self, name: str, refs: list) -> None:
+        fname = os.path.join(self.tmpdir.name, name)
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        with open(fname, 'w') as f:
+            f.write(f"id: {name}\nimports:\n" + ''.join(f"  - {r}\n" for r in refs))
+
+    def walk(self, reader: PrefetchingReader, source: str, base_path: str = None, delay: float = 0) -> Counter:
+        """ Depth first read of the import graph, like a schema loader would do it """
+        seen = Counter()
+        todo = [(source, base_path)]
+        while todo:
+            source, base_path = todo.pop()
+            info = FileInfo()
+            text = reader.read(source, info, base_path)
+            if info.source_file in seen:
+                continue
+            seen[info.source_file] += 1
+            time.sleep(delay)
+            self.assertTrue(text.startswith('id: '))
+            todo += [(r, info.base_path) for r in reversed(imports(text, info))]
+        return seen
+
+    def test_files(self):
+        with PrefetchingReader(imports) as reader:
+            seen = self.walk(reader, 'root.yaml', self.tmpdir.name)
+            self.assertEqual(11, len(seen))
+            metadata = FileInfo()
+            reader.read('d3.yaml', metadata, os.path.join(self.tmpdir.name, 'chain'))
+            self.assertEqual(os.path.join(self.tmpdir.name, 'chain', 'd3.yaml'), metadata.source_file)
+            self.assertEqual(os.path.join(self.tmpdir.name, 'chain'), metadata.base_path)
+        self.assertEqual(0, len(reader))
+        with PrefetchingReader(imports) as reader, self.assertRaises(FileNotFoundError):
+            reader.read('missing.yaml', base_path=self.tmpdir.name)
+
+    def test_overlap(self):
+        """ The next document is fetched while the caller is working on the current one """
+        with LocalServer(self.tmpdir.name, _SlowHandler) as server, ConnectionPool() as pool:
+            with PrefetchingReader(imports, pool=pool) as reader:
+                start = time.monotonic()
+                self.walk(reader, server.base_url + 'root.yaml', delay=0.1)
+                elapsed = time.monotonic() - start
+            # Serially, 11 fetches and 11 documents' worth of work would take 2.2 seconds
+            self.assertLess(elapsed, 1.8)
+            self.assertEqual(10, reader.hits)
+            # Nothing was prefetched twice.  The walk itself reads the targets of the cycle again
+            fetches = Counter(path for path, _ in server.requests)
+            self.assertEqual(11, len(fetches))
+            self.assertEqual({'/root.yaml': 2, '/cycle/a.yaml': 2}, {p: n for p, n in fetches.items() if n > 1})
+
+    def test_budget(self):
+        with PrefetchingReader(imports, max_bytes=1) as reader:
+            self.assertEqual(11, len(self.walk(reader, 'root.yaml', self.tmpdir.name)))
+            self.assertLessEqual(reader.size, 1)
+        with PrefetchingReader(imports, max_workers=1, max_pending=1) as reader:
+            self.assertEqual(11, len(self.walk(reader, 'root.yaml', self.tmpdir.name)))
+        # References skipped for lack of budget are prefetched once the document that holds them is read
+        self.write('fan.yaml', ['fan/a.yaml'])
+        self.write('fan/a.yaml', ['b.yaml', 'c.yaml'])
+        self.write('fan/b.yaml', [])
+        self.write('fan/c.yaml', [])
+        with PrefetchingReader(imports, max_workers=1, max_pending=1) as reader:
+            self.assertEqual(4, len(self.walk(reader, 'fan.yaml', self.tmpdir.name, delay=0.1)))
+            self.assertEqual(3, reader.hits)
+        with self.assertRaises(ValueError):
+            PrefetchingReader(imports, max_workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import gzip
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from hbreader import hbread, hbopen, FileInfo, RateLimiter, CachingReader
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class Progress:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __call__(self, done: int, total) -> None:
+        self.calls.append((done, total))
+
+
+class ProgressTestCase(unittest.TestCase):
+    fname = os.path.join(DATA_DIR, 'test data 1.txt')
+
+    def setUp(self) -> None:
+        with open(self.fname, 'rb') as f:
+            self.data = f.read()
+        self.size = len(self.data)
+
+    def test_file(self):
+        progress = Progress()
+        self.assertEqual(self.data.decode(), hbread(self.fname, progress=progress))
+        self.assertEqual((self.size, self.size), progress.calls[-1])
+
+        progress = Progress()
+        with hbopen(self.fname, mmap=True, progress=progress) as f:
+            f.read()
+        self.assertEqual((self.size, self.size), progress.calls[-1])
+
+        # Ranges are reported against the size of the source, and only count the bytes that are read
+        progress = Progress()
+        hbread(self.fname, offset=4, length=10, progress=progress)
+        self.assertEqual([(10, self.size)], progress.calls)
+        progress = Progress()
+        with open(self.fname, 'rb') as f:
+            hbread(f, offset=4, length=10, progress=progress)
+        self.assertEqual([(10, self.size)], progress.calls)
+
+    def test_compressed(self):
+        """ Progress is of the bytes transferred, against the size of the file """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            gz = os.path.join(tmpdir, 'data.txt.gz')
+            with open(gz, 'wb') as f:
+                f.write(gzip.compress(self.data * 100))
+            progress = Progress()
+            metadata = FileInfo()
+            self.assertEqual(self.data.decode() * 100, hbread(gz, metadata, progress=progress))
+            size = os.path.getsize(gz)
+            self.assertEqual((size, size), progress.calls[-1])
+            self.assertEqual('gzip', metadata.compression)
+
+    def test_url(self):
+        with LocalServer() as server:
+            progress = Progress()
+            hbread(server.base_url + 'test data 1.txt', progress=progress)
+            self.assertEqual((self.size, self.size), progress.calls[-1])
+            progress = Progress()
+            self.assertEqual('some frien', hbread(server.base_url + 'test data 1.txt', offset=4, length=10,
+                                                  progress=progress))
+            self.assertEqual(self.size, progress.calls[-1][1])
+
+            cache = CachingReader()
+            for _ in range(2):
+                progress = Progress()
+                hbread(server.base_url + 'test data 1.txt', cache=cache, progress=progress)
+            # The second read was a 304 -- nothing transferred
+            self.assertEqual([], progress.calls)
+            self.assertEqual(1, cache.hits)
+
+    def test_io(self):
+        progress = Progress()
+        with open(self.fname, 'rb') as f:
+            hbread(f, progress=progress)
+        self.assertEqual((self.size, self.size), progress.calls[-1])
+        progress = Progress()
+        with open(self.fname, encoding='utf-8') as f:
+            hbread(f, progress=progress)
+        self.assertEqual((self.size, self.size), progress.calls[-1])
+
+    def test_chunks(self):
+        """ Progress is reported per chunk, not per line """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'big.txt')
+            with open(fname, 'w') as f:
+                f.write('line\n' * 100000)
+            progress = Progress()
+            with hbopen(fname, progress=progress) as f:
+                self.assertEqual(100000, sum(1 for _ in f))
+            self.assertEqual(500000, progress.calls[-1][0])
+            self.assertLess(len(progress.calls), 100)
+
+    def test_rate_limit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, 'big.txt')
+            with open(fname, 'w') as f:
+                f.write('x' * 300000)
+            # 100K/sec with a 100K burst: the first 100K is free, the rest takes 2 seconds
+            limiter = RateLimiter(100000)
+            start = time.monotonic()
+            self.assertEqual(300000, len(hbread(fname, rate_limit=limiter)))
+            self.assertGreater(time.monotonic() - start, 1.8)
+
+            # Ranges draw on the limiter as they are read.  Bytes that are seeked past are free
+            limiter = RateLimiter(100000)
+            start = time.monotonic()
+            self.assertEqual(200000, len(hbread(fname, offset=50000, length=200000, rate_limit=limiter)))
+            self.assertGreater(time.monotonic() - start, 0.9)
+            limiter = RateLimiter(100000)
+            start = time.monotonic()
+            self.assertEqual(10, len(hbread(fname, offset=250000, length=10, rate_limit=limiter)))
+            self.assertEqual(10, len(hbread(fname, offset=200000, length=10, rate_limit=limiter)))
+            self.assertLess(time.monotonic() - start, 0.5)
+
+            # A shared limiter is a shared budget
+            limiter = RateLimiter(200000)
+            threads = [threading.Thread(target=hbread, args=(fname, ), kwargs=dict(rate_limit=limiter))
+                       for _ in range(2)]
+            start = time.monotonic()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertGreater(time.monotonic() - start, 1.8)
+
+    def test_limiter(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+        limiter = RateLimiter(1000000, burst=1000)
+        self.assertEqual(0, limiter.consume(1000))
+        self.assertGreater(limiter.consume(1000), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
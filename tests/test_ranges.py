@@ -0,0 +1,159 @@
+import codecs
+import gzip
+import os
+import re
+import tempfile
+import unittest
+
+from hbreader import hbread, hbread_bytes, hbhead, FileInfo
+from tests.local_server import LocalServer, _Handler
+
+
+class _RangeHandler(_Handler):
+    """ Honors single byte ranges and keeps count of the body bytes sent """
+    def do_GET(self):
+        m = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+        if not m:
+            with self.server.lock:
+                self.server.sent += os.path.getsize(self.translate_path(self.path))
+            return super().do_GET()
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+        with open(self.translate_path(self.path), 'rb') as f:
+            data = f.read()
+        first = int(m.group(1))
+        last = min(int(m.group(2)) if m.group(2) else len(data) - 1, len(data) - 1)
+        body = data[first:last + 1]
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {first}-{last}/{len(data)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        # Counted before the client can see the body, so the test never checks ahead of the count
+        with self.server.lock:
+            self.server.sent += len(body)
+        self.wfile.write(body)
+
+
+class RangeTestCase(unittest.TestCase):
+    text = ''.join(f"Line {i:05} ÒtextÓ\n" for i in range(5000))
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = self.text.encode()
+        with open(self.path('big.txt'), 'wb') as f:
+            f.write(self.data)
+        with gzip.open(self.path('big.txt.gz'), 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def path(self, fname: str) -> str:
+        return os.path.join(self.tmpdir.name, fname)
+
+    def test_file(self):
+        metadata = FileInfo()
+        self.assertEqual(self.data[1000:1100], hbread_bytes(self.path('big.txt'), metadata, offset=1000, length=100))
+        self.assertEqual(len(self.data), metadata.source_file_size)
+        self.assertEqual((1000, 100), (metadata.read_offset, metadata.read_length))
+        self.assertEqual(self.data[-10:], hbread_bytes(self.path('big.txt'), offset=len(self.data) - 10))
+        self.assertEqual(b'', hbread_bytes(self.path('big.txt'), offset=len(self.data) + 10, length=5))
+        self.assertEqual(self.data[:7], hbread_bytes(self.path('big.txt.gz'), length=7, decompress=True))
+        self.assertEqual(self.data[500:520], hbread_bytes(self.path('big.txt.gz'), offset=500, length=20,
+                                                          decompress=True))
+        with open(self.path('big.txt.gz'), 'rb') as f:
+            self.assertEqual(f.read()[10:20], hbread_bytes(self.path('big.txt.gz'), offset=10, length=10))
+        with self.assertRaises(ValueError):
+            hbread_bytes(self.path('big.txt'), offset=-1)
+
+    def test_text(self):
+        # 'Line 00000 ÒtextÓ\n' is 20 bytes -- Ò is bytes 11 and 12, Ó 17 and 18
+        self.assertEqual('Line 00000', hbread(self.path('big.txt'), length=10))
+        self.assertEqual('text', hbread(self.path('big.txt'), offset=12, length=6))
+        self.assertEqual(' ', hbread(self.path('big.txt'), offset=10, length=2))
+        self.assertEqual(self.data[:100].decode(), hbhead(self.path('big.txt'), 100))
+        self.assertEqual(self.data[:4096].decode(), hbhead(self.path('big.txt')))
+        self.assertEqual('ome\ntext', hbread('Some\ntext', offset=1))
+        self.assertEqual('me', hbread(b'Some\ntext', offset=2, length=2))
+        with open(self.path('utf16.txt'), 'w', encoding='utf-16') as f:
+            f.write("Some\ntext")
+        metadata = FileInfo()
+        self.assertEqual('Some', hbhead(self.path('utf16.txt'), 10, metadata))
+        self.assertEqual('utf-16', metadata.encoding)
+        # Ranges that are no more than a BOM
+        with open(self.path('bom.txt'), 'w', encoding='utf-8-sig') as f:
+            f.write("Some\ntext")
+        self.assertEqual('', hbread(self.path('bom.txt'), length=3))
+        self.assertEqual('', hbread(self.path('utf16.txt'), length=2))
+        self.assertEqual('', hbread(self.path('utf16.txt'), length=3))
+        # Ranges in the middle of a UTF-16 source are decoded with the encoding its BOM gives away
+        metadata = FileInfo()
+        self.assertEqual('So', hbread(self.path('utf16.txt'), metadata, offset=2, length=4))
+        self.assertEqual('utf-16', metadata.encoding)
+        self.assertEqual('om', hbread(self.path('utf16.txt'), offset=3, length=5))
+        with open(self.path('utf16be.txt'), 'w', encoding='utf-16') as f:
+            f.write("ab😀cd")
+        with open(self.path('utf16be.txt'), 'rb') as f:
+            data = f.read()
+        with open(self.path('utf16be.txt'), 'wb') as f:
+            f.write(codecs.BOM_UTF16_BE + data[2:].decode('utf-16').encode('utf-16-be'))
+        self.assertEqual('😀cd', hbread(self.path('utf16be.txt'), offset=5))
+        self.assertEqual('cd', hbread(self.path('utf16be.txt'), offset=8))
+        with open(self.path('utf16.txt'), 'rb') as f:
+            f.read(1)
+            self.assertEqual('me', hbread(f, offset=5, length=4))
+
+    def test_io(self):
+        with open(self.path('big.txt'), 'rb') as f:
+            f.read(10)
+            self.assertEqual(self.data[20:30], hbread_bytes(f, offset=10, length=10))
+        # Compressed handles are decompressed and skipped through
+        with open(self.path('big.txt.gz'), 'rb') as f:
+            self.assertEqual(self.data[30:40], hbread_bytes(f, offset=30, length=10, decompress=True))
+
+    def test_url_range(self):
+        with LocalServer(self.tmpdir.name, _RangeHandler) as server:
+            server.httpd.sent = 0
+            metadata = FileInfo()
+            self.assertEqual(self.data[1000:1100], hbread_bytes(server.base_url + 'big.txt', metadata, offset=1000,
+                                                                length=100))
+            self.assertEqual('bytes=1000-1099', server.requests[-1][1]['Range'])
+            self.assertEqual('identity', server.requests[-1][1]['Accept-Encoding'])
+            self.assertEqual(str(len(self.data)), metadata.source_file_size)
+            self.assertEqual(100, metadata.read_length)
+
+            # Sniffing many remote files only transfers their heads
+            for _ in range(20):
+                self.assertEqual(self.data[:100].decode(), hbhead(server.base_url + 'big.txt', 100))
+            self.assertEqual(100 + 20 * 100, server.httpd.sent)
+
+            # The encoding of a range in the middle of a URL comes from a request for its first bytes
+            with open(self.path('utf16.txt'), 'w', encoding='utf-16') as f:
+                f.write("Some\ntext")
+            metadata = FileInfo()
+            self.assertEqual('me\nt', hbread(server.base_url + 'utf16.txt', metadata, offset=6, length=8))
+            self.assertEqual('utf-16', metadata.encoding)
+            self.assertEqual(['bytes=0-3', 'bytes=6-13'], [h['Range'] for _, h in server.requests[-2:]])
+
+            # A compressed resource is read from the start and decompressed
+            self.assertEqual(self.data[500:520], hbread_bytes(server.base_url + 'big.txt.gz', offset=500, length=20,
+                                                              decompress=True))
+            self.assertNotIn('Range', server.requests[-1][1])
+            # ... unless it is the stored bytes that are wanted
+            with open(self.path('big.txt.gz'), 'rb') as f:
+                self.assertEqual(f.read()[10:20], hbread_bytes(server.base_url + 'big.txt.gz', offset=10, length=10))
+            self.assertEqual('bytes=10-19', server.requests[-1][1]['Range'])
+
+    def test_url_no_range(self):
+        # The server ignores Range -- the content is skipped over
+        with LocalServer(self.tmpdir.name) as server:
+            metadata = FileInfo()
+            self.assertEqual(self.data[1000:1100], hbread_bytes(server.base_url + 'big.txt', metadata, offset=1000,
+                                                                length=100))
+            self.assertEqual(str(len(self.data)), metadata.source_file_size)
+            self.assertEqual((1000, 100), (metadata.read_offset, metadata.read_length))
+            self.assertEqual(self.data[:100].decode(), hbhead(server.base_url + 'big.txt', 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import asyncio
+import email.utils
+import socket
+import struct
+import time
+import unittest
+from http.server import SimpleHTTPRequestHandler
+from urllib.error import HTTPError, URLError
+
+from hbreader import hbread, hbread_async, ConnectionPool, RetryPolicy, CircuitBreaker, CircuitOpenError, \
+    set_default_pool
+from tests.local_server import LocalServer, _Handler
+
+
+class _FlakyHandler(_Handler):
+    """ Works through server.script -- a list of statuses, 'reset' and 'hang' -- before serving files normally """
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+            action = self.server.script.pop(0) if self.server.script else None
+        if action == 'reset':
+            # Close with an RST rather than a FIN
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.close_connection = True
+            return
+        if action == 'hang':
+            time.sleep(0.5)
+        elif action:
+            self.send_response(action)
+            if action == 429:
+                self.send_header('Retry-After', self.server.retry_after)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        SimpleHTTPRequestHandler.do_GET(self)
+
+
+class RetryTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def setUp(self) -> None:
+        self.server = LocalServer(handler=_FlakyHandler).__enter__()
+        self.server.httpd.script = []
+        self.server.httpd.retry_after = '0'
+        self.url = self.server.base_url + 'test data 1.txt'
+        self.pool = ConnectionPool()
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.server.__exit__()
+
+    def read(self, **kwargs) -> str:
+        return hbread(self.url, pool=self.pool, **kwargs)
+
+    def test_delay(self):
+        policy = RetryPolicy(retries=3, backoff=1, max_backoff=3, jitter=False)
+        self.assertEqual([1, 2, 3, None], [policy.delay(n) for n in range(1, 5)])
+        self.assertEqual(7, policy.delay(1, {'Retry-After': '7'}))
+        self.assertIsNone(policy.delay(1, {'Retry-After': '61'}))
+        later = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(30, policy.delay(1, {'Retry-After': later}), delta=2)
+        policy = RetryPolicy(retries=100, backoff=1, max_backoff=3)
+        for n in range(1, 100):
+            self.assertTrue(0 <= policy.delay(n) <= min(3, 2 ** (n - 1)))
+
+    def test_statuses(self):
+        """ 5xx and 429 are retried, other errors aren't """
+        self.server.httpd.script = [503, 500, 429]
+        self.assertEqual(self.expected, self.read(retry=RetryPolicy(retries=3, backoff=0.01)))
+        self.assertEqual(4, len(self.server.requests))
+
+        self.server.httpd.script = [503, 503, 503]
+        with self.assertRaises(HTTPError) as e:
+            self.read(retry=RetryPolicy(retries=2, backoff=0.01))
+        self.assertEqual(503, e.exception.code)
+        self.assertEqual(7, len(self.server.requests))
+
+        with self.assertRaises(HTTPError):
+            hbread(self.server.base_url + 'no such file', pool=self.pool, retry=RetryPolicy(retries=2))
+        self.assertEqual(8, len(self.server.requests))
+
+    def test_retry_after(self):
+        self.server.httpd.retry_after = '1'
+        self.server.httpd.script = [429]
+        with self.assertRaises(HTTPError):
+            self.read(retry=RetryPolicy(max_retry_after=0.5))
+        self.server.httpd.script = [429]
+        start = time.perf_counter()
+        self.assertEqual(self.expected, self.read(retry=RetryPolicy(backoff=0)))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.9)
+
+    def test_reset(self):
+        self.server.httpd.script = ['reset']
+        with self.assertRaises(URLError):
+            self.read()
+        self.server.httpd.script = ['reset']
+        self.assertEqual(self.expected, self.read(retry=RetryPolicy(backoff=0.01)))
+
+    def test_timeout(self):
+        self.server.httpd.script = ['hang']
+        start = time.perf_counter()
+        with self.assertRaises(URLError) as e:
+            self.read(retry=RetryPolicy(retries=0, read_timeout=0.1))
+        self.assertIsInstance(e.exception.reason, TimeoutError)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.server.httpd.script = ['hang']
+        self.assertEqual(self.expected, self.read(retry=RetryPolicy(read_timeout=0.1, backoff=0.01)))
+
+    def test_pool_policy(self):
+        """ The pool's policy applies unless one is passed to the call """
+        self.server.httpd.script = [503]
+        with ConnectionPool(retry=RetryPolicy(backoff=0.01)) as pool:
+            self.assertEqual(self.expected, hbread(self.url, pool=pool))
+            self.server.httpd.script = [503]
+            with self.assertRaises(HTTPError):
+                hbread(self.url, pool=pool, retry=RetryPolicy(retries=0))
+        self.server.httpd.script = [503]
+        set_default_pool(ConnectionPool(retry=RetryPolicy(backoff=0.01)))
+        try:
+            self.assertEqual(self.expected, hbread(self.url))
+        finally:
+            set_default_pool(None)
+
+    def test_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        policy = RetryPolicy(retries=0, breaker=breaker)
+        self.server.httpd.script = [503, 503, 503]
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                self.read(retry=policy)
+        self.assertTrue(breaker.is_open(('http', '127.0.0.1', self.server.httpd.server_address[1])))
+        with self.assertRaises(CircuitOpenError):
+            self.read(retry=policy)
+        self.assertEqual(2, len(self.server.requests))
+
+        # The trial request fails -- open for another reset_timeout
+        time.sleep(0.25)
+        with self.assertRaises(HTTPError):
+            self.read(retry=policy)
+        with self.assertRaises(CircuitOpenError):
+            self.read(retry=policy)
+
+        # The trial request succeeds
+        time.sleep(0.25)
+        self.assertEqual(self.expected, self.read(retry=policy))
+        self.assertEqual(self.expected, self.read(retry=policy))
+
+        # Errors that say nothing about the health of the host don't count
+        for _ in range(3):
+            with self.assertRaises(HTTPError):
+                hbread(self.server.base_url + 'no such file', pool=self.pool, retry=policy)
+        self.assertEqual(self.expected, self.read(retry=policy))
+
+    def test_async(self):
+        self.server.httpd.script = [503, 'reset', 'hang']
+        text = asyncio.run(hbread_async(self.url, retry=RetryPolicy(retries=3, backoff=0.01, read_timeout=0.1)))
+        self.assertEqual(self.expected, text)
+        self.assertEqual(4, len(self.server.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
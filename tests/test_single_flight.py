@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+
+from hbreader import hbread, hbread_many, FileInfo, SingleFlight, CachingReader
+from tests.local_server import LocalServer, DATA_DIR, _Handler
+
+
+class _SlowHandler(_Handler):
+    def do_GET(self):
+        time.sleep(0.1)
+        super().do_GET()
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+
+    def test_do(self):
+        group = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work() -> int:
+            calls.append(1)
+            release.wait()
+            return 42
+
+        with ThreadPoolExecutor(5) as executor:
+            futures = [executor.submit(group.do, 'k', work) for _ in range(5)]
+            while group.waiting('k') < 4:
+                time.sleep(0.001)
+            self.assertEqual(1, group.in_flight())
+            release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(1, len(calls))
+        self.assertEqual([42] * 5, [r for r, _ in results])
+        self.assertEqual(4, sum(shared for _, shared in results))
+        self.assertEqual(0, group.in_flight())
+        # Nothing is remembered
+        self.assertEqual((42, False), group.do('k', lambda: 42))
+
+    def test_error(self):
+        group = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait()
+            raise ValueError("nope")
+
+        with ThreadPoolExecutor(3) as executor:
+            futures = [executor.submit(group.do, 'k', fail) for _ in range(3)]
+            while group.waiting('k') < 2:
+                time.sleep(0.001)
+            release.set()
+            for f in futures:
+                with self.assertRaises(ValueError):
+                    f.result()
+        self.assertEqual(0, group.in_flight())
+
+    def test_url(self):
+        group = SingleFlight()
+        with LocalServer(handler=_SlowHandler) as server:
+            url = server.base_url + 'test data 1.txt'
+            infos = [FileInfo() for _ in range(10)]
+            with ThreadPoolExecutor(10) as executor:
+                texts = list(executor.map(lambda i: hbread(url, i, coalesce=group), infos))
+            self.assertEqual([self.expected] * 10, texts)
+            self.assertEqual(1, len(server.requests))
+            self.assertEqual([infos[0]] * 10, infos)
+            self.assertEqual(server.base_url + 'test%20data%201.txt', infos[0].source_file)
+            self.assertIsNot(infos[0], infos[1])
+
+            # Different resolutions of the same URL share, different URLs don't
+            sources = [url, 'test data 1.txt', 'test_utf8.txt'] * 3
+            results = list(hbread_many(sources, base_path=server.base_url, max_workers=9, coalesce=group))
+            self.assertEqual([self.expected, self.expected, 'a,é'] * 3,
+                             [r.text for r in results])
+            self.assertEqual(3, len(server.requests))
+
+            with self.assertRaises(HTTPError):
+                hbread(server.base_url + 'missing.txt', coalesce=group)
+
+    def test_file(self):
+        group = SingleFlight()
+        cache = CachingReader()
+        metadata = FileInfo()
+        self.assertEqual(self.expected, hbread('test data 1.txt', metadata, base_path=DATA_DIR, coalesce=group,
+                                               cache=cache))
+        self.assertTrue(metadata.source_file.endswith('test data 1.txt'))
+        self.assertEqual(1, len(cache))
+        # In-memory sources are never coalesced
+        self.assertEqual("Some\ntext", hbread("Some\ntext", coalesce=group))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import io
+import os
+import tempfile
+import unittest
+
+from hbreader import hbiter, hblines, hbopen, ConnectionPool
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class StreamingTestCase(unittest.TestCase):
+    text = "Line one é\nLine two ü€\n\nLast line without newline"
+
+    def binary_file(self, encoding: str) -> str:
+        fname = os.path.join(self.tmpdir.name, encoding)
+        with open(fname, 'wb') as f:
+            f.write(self.text.encode(encoding))
+        return fname
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_incremental_decode(self):
+        """ BOM detection and multi-byte characters survive arbitrary chunk boundaries """
+        for encoding in ('utf-8', 'utf-8-sig', 'utf-16', 'utf-32'):
+            fname = self.binary_file(encoding)
+            for chunk_size in (1, 2, 3, 5, 1024):
+                with open(fname, 'rb') as fp:
+                    chunks = list(hbiter(fp, chunk_size=chunk_size))
+                self.assertEqual(self.text, ''.join(chunks), f"{encoding} / {chunk_size}")
+                self.assertTrue(all(len(c) <= chunk_size for c in chunks))
+                with open(fname, 'rb') as fp:
+                    self.assertEqual(self.text.splitlines(True), list(hblines(fp, chunk_size=chunk_size)))
+            with open(fname, 'rb') as fp:
+                self.assertEqual(self.text, hbopen(fp).read())
+
+        # An empty read doesn't settle the encoding
+        with hbopen(io.BytesIO('x'.encode('utf-16'))) as f:
+            self.assertEqual('', f.read(0))
+            self.assertEqual('x', f.read())
+
+    def test_sources(self):
+        lines = self.text.splitlines(True)
+        self.assertEqual(lines, list(hblines(self.text, chunk_size=4)))
+        self.assertEqual(lines, list(hblines(self.text.encode())))
+        self.assertEqual(["I'm some friendly test data\n"], list(hblines('test data 1.txt', base_path=DATA_DIR)))
+        with LocalServer() as server, ConnectionPool() as pool:
+            self.assertEqual(['Some', ' Tex'], list(hbiter(server.base_url + 'test_8859.txt', read_codec='latin-1',
+                                                          pool=pool, chunk_size=4))[:2])
+            self.assertEqual(['a,é'], list(hblines(server.base_url + 'test_utf8.txt', pool=pool, chunk_size=2)))
+        self.assertEqual([], list(hbiter(os.path.join(DATA_DIR, 'test_empty.txt'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from hbreader import hbread, hbopen, hbread_bytes, hbread_async, FileInfo, URLMirror, CachingReader, \
+    set_default_resolver, default_resolver
+from tests.local_server import LocalServer, DATA_DIR
+
+
+class URLMirrorTestCase(unittest.TestCase):
+    expected = "I'm some friendly test data\n"
+    url = 'https://example.org/data/test data 1.txt'
+    quoted_url = 'https://example.org/data/test%20data%201.txt'
+
+    def setUp(self) -> None:
+        self.mirror = URLMirror({'https://example.org/data/': DATA_DIR})
+
+    def test_match(self):
+        mirror = URLMirror([('https://example.org/', '/a'),
+                            ('https://example.org/x/y/', '/b'),
+                            ('https://example.org/x/', 'http://example.com/c/'),
+                            ('https://ex', '/d')])
+        mirror.add('https://example.org/x/y/z z', '/e')
+        self.assertEqual(5, len(mirror))
+        self.assertEqual(('https://example.org/', '/a'), mirror.match('https://example.org/q'))
+        self.assertEqual(('https://example.org/x/y/', '/b'), mirror.match('https://example.org/x/y/q'))
+        self.assertEqual(('https://example.org/x/y/z%20z', '/e'), mirror.match('https://example.org/x/y/z%20z'))
+        self.assertEqual('http://example.com/c/q r', mirror('https://example.org/x/q%20r'))
+        self.assertEqual('/d', mirror('https://ex'))
+        self.assertEqual(os.path.join('/d', 'ample.com/q r'), mirror('https://example.com/q%20r'))
+        self.assertIsNone(mirror('http://example.org/x/'))
+        self.assertIsNone(mirror('https://example.org/../../etc/passwd'))
+
+    def test_many_rules(self):
+        mirror = URLMirror({f'https://host{i % 10}.org/{"p/" * (i % 50)}{i}/': f'/m/{i}' for i in range(5000)})
+        for i in range(0, 5000, 7):
+            url = f'https://host{i % 10}.org/{"p/" * (i % 50)}{i}/file.txt'
+            self.assertEqual(os.path.join(f'/m/{i}', 'file.txt'), mirror(url))
+
+    def test_file(self):
+        metadata = FileInfo()
+        self.assertEqual(self.expected, hbread(self.url, metadata, resolver=self.mirror))
+        self.assertEqual(os.path.join(DATA_DIR, 'test data 1.txt'), metadata.source_file)
+        self.assertEqual(self.quoted_url, metadata.logical_location)
+        self.assertEqual('https://example.org/data', metadata.base_path)
+        # Relative references go through the mirror as well
+        self.assertEqual(self.expected, hbread('test data 1.txt', base_path=metadata.base_path,
+                                               resolver=self.mirror))
+        with hbopen(self.url, metadata.clear(), resolver=self.mirror) as f:
+            self.assertEqual(self.expected, f.read())
+        self.assertEqual(self.quoted_url, metadata.logical_location)
+        self.assertEqual(self.expected[4:8].encode(), hbread_bytes(self.url, metadata.clear(), offset=4, length=4,
+                                                                   resolver=self.mirror))
+        self.assertEqual((self.quoted_url, 4), (metadata.logical_location, metadata.read_offset))
+        cache = CachingReader()
+        for _ in range(2):
+            self.assertEqual(self.expected, hbread(self.url, metadata.clear(), cache=cache, resolver=self.mirror))
+            self.assertEqual(self.quoted_url, metadata.logical_location)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(self.expected, asyncio.run(hbread_async(self.url, resolver=self.mirror)))
+
+    def test_default_resolver(self):
+        self.assertIsNone(default_resolver())
+        set_default_resolver(self.mirror)
+        try:
+            self.assertEqual(self.expected, hbread(self.url))
+        finally:
+            set_default_resolver(None)
+
+    def test_url(self):
+        with LocalServer() as server:
+            metadata = FileInfo()
+            mirror = URLMirror({'https://example.org/data/': server.base_url})
+            self.assertEqual(self.expected, hbread(self.url, metadata, resolver=mirror))
+            self.assertEqual(server.base_url + 'test%20data%201.txt', metadata.source_file)
+            self.assertEqual(self.quoted_url, metadata.logical_location)
+            self.assertEqual(1, len(server.requests))
+
+    def test_fallback(self):
+        with LocalServer() as server, tempfile.TemporaryDirectory() as tmpdir:
+            url = server.base_url + 'test data 1.txt'
+            with self.assertRaises(FileNotFoundError):
+                hbread(url, resolver=URLMirror({server.base_url: tmpdir}))
+            metadata = FileInfo()
+            self.assertEqual(self.expected, hbread(url, metadata, resolver=URLMirror({server.base_url: tmpdir},
+                                                                                     fallback=True)))
+            self.assertEqual(server.base_url + 'test%20data%201.txt', metadata.source_file)
+            self.assertIsNone(metadata.logical_location)
+            self.assertEqual(1, len(server.requests))
+
+    def test_custom_resolver(self):
+        def resolver(url: str):
+            return 'file://' + DATA_DIR.replace(' ', '%20') + '/test%20data%201.txt' if url.endswith('.txt') else None
+        self.assertEqual(self.expected, hbread('https://example.org/anything.txt', resolver=resolver))
+
+
+if __name__ == '__main__':
+    unittest.main()